@@ -1,28 +1,26 @@
 # scripts/00_ingest_pdfs.py
-import argparse, json, sys
+import argparse, json, os, sys, time, uuid
 from pathlib import Path
-from typing import List, Iterable
+from typing import List, Iterable, Tuple
 import numpy as np
 from pypdf import PdfReader
 from sentence_transformers import SentenceTransformer
 
-def chunk_text(text: str, max_chars: int, overlap: int) -> Iterable[str]:
-    if not text:
-        return
-    start = 0
-    n = len(text)
-    if max_chars <= 0:
-        max_chars = 800
-    if overlap < 0:
-        overlap = 0
-    while start < n:
-        end = min(start + max_chars, n)
-        yield text[start:end].strip()
-        if end >= n:
-            break
-        start = max(0, end - overlap)
-
-def iter_pdf_chunks(pdf_path: Path, max_pages: int, max_chars: int, overlap: int) -> Iterable[str]:
+# --- ensure project root on sys.path ---
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.pipeline.encoders import ENCODER_BACKENDS, load_encoder, parity_check
+from src.pipeline.chunker import CHUNK_META_DTYPE, chunk_by_chars, chunk_by_tokens, tokenizer_counter
+from src.pipeline.lexical import build_bm25, save_bm25
+from src.pipeline.shards import SHARD_MANIFEST, write_shards
+from src.pipeline.versions import prune_versions, publish_version, version_dir
+
+# (chunk_text, page, char_start, char_end)
+Chunk = Tuple[str, int, int, int]
+
+def iter_pdf_chunks(pdf_path: Path, max_pages: int, chunk_fn) -> Iterable[Chunk]:
     reader = PdfReader(str(pdf_path))
     pages = reader.pages[:max_pages] if max_pages > 0 else reader.pages
     for i, pg in enumerate(pages, 1):
@@ -30,24 +28,38 @@ def iter_pdf_chunks(pdf_path: Path, max_pages: int, max_chars: int, overlap: int
             txt = pg.extract_text() or ""
         except Exception:
             txt = ""
-        for ch in chunk_text(txt, max_chars=max_chars, overlap=overlap):
+        for ch, start, end in chunk_fn(txt):
             if ch:
-                yield ch
+                yield ch, i, start, end
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--pdf_dir", required=True, help="Folder with PDFs")
-    ap.add_argument("--out_dir", required=True, help="Folder to write index files")
+    ap.add_argument("--out_dir", required=True,
+                    help="Index root: each run writes versions/<version>/ and then flips CURRENT")
     ap.add_argument("--embed_model", default="sentence-transformers/all-MiniLM-L6-v2")
     ap.add_argument("--batch_size", type=int, default=64, help="Embedding batch size")
+    ap.add_argument("--encoder", choices=ENCODER_BACKENDS, default=os.getenv("ENCODER_BACKEND", "torch"),
+                    help="torch, onnx, or onnx-int8 (exported once to ONNX_CACHE_DIR, run with onnxruntime)")
+    ap.add_argument("--parity_samples", type=int, default=64,
+                    help="Chunks re-encoded with torch to record ONNX cosine parity in meta.json (0 = skip)")
     ap.add_argument("--max_pages", type=int, default=40, help="Limit pages per PDF (0 = no limit)")
-    ap.add_argument("--max_chars", type=int, default=600, help="Chunk size")
-    ap.add_argument("--overlap", type=int, default=60, help="Chunk overlap")
+    ap.add_argument("--chunker", choices=["tokens", "chars"], default="tokens",
+                    help="tokens: sentence-aware, sized by the embed model's tokenizer; chars: fixed windows")
+    ap.add_argument("--max_tokens", type=int, default=0,
+                    help="Chunk size in tokens (0 = model max_seq_length minus special tokens)")
+    ap.add_argument("--overlap_tokens", type=int, default=32, help="Sentence overlap between chunks, in tokens")
+    ap.add_argument("--max_chars", type=int, default=600, help="Chunk size (--chunker chars)")
+    ap.add_argument("--overlap", type=int, default=60, help="Chunk overlap (--chunker chars)")
+    ap.add_argument("--shards", type=int, default=1,
+                    help="Split embeddings into N shards searched in parallel (1 = single embeddings.npy)")
+    ap.add_argument("--keep_versions", type=int, default=3,
+                    help="Index versions kept after publishing (older ones are deleted; 0 = keep all)")
     args = ap.parse_args()
 
     pdf_dir = Path(args.pdf_dir)
-    out = Path(args.out_dir)
-    out.mkdir(parents=True, exist_ok=True)
+    root = Path(args.out_dir)
+    root.mkdir(parents=True, exist_ok=True)
 
     pdfs = sorted(pdf_dir.glob("*.pdf"))
     if not pdfs:
@@ -57,24 +69,39 @@ def main():
 
     print(f"[ingest] PDFs: {len(pdfs)} | model: {args.embed_model}", flush=True)
     model = SentenceTransformer(args.embed_model)
+    encoder = load_encoder(args.embed_model, args.encoder, st_model=model)
+    print(f"[ingest] encoder: {args.encoder}", flush=True)
+
+    if args.chunker == "tokens":
+        # Leave room for [CLS]/[SEP] so nothing is silently truncated at encode time.
+        max_tokens = args.max_tokens or max(16, int(model.max_seq_length) - 2)
+        count = tokenizer_counter(model.tokenizer)
+        chunk_fn = lambda txt: chunk_by_tokens(txt, count, max_tokens, args.overlap_tokens)
+        print(f"[ingest] chunker: tokens | max_tokens={max_tokens} overlap_tokens={args.overlap_tokens}", flush=True)
+    else:
+        max_tokens = 0
+        chunk_fn = lambda txt: chunk_by_chars(txt, args.max_chars, args.overlap)
 
     all_texts: List[str] = []
     all_embs: List[np.ndarray] = []
+    all_meta: List[Tuple[int, int, int, int, int]] = []
 
     batch: List[str] = []
-    for p in pdfs:
+    for pdf_id, p in enumerate(pdfs):
         print(f"[ingest] Reading {p.name}", flush=True)
-        for ch in iter_pdf_chunks(p, max_pages=args.max_pages, max_chars=args.max_chars, overlap=args.overlap):
+        ingested = int(time.time())
+        for ch, page, start, end in iter_pdf_chunks(p, max_pages=args.max_pages, chunk_fn=chunk_fn):
             batch.append(ch)
+            all_meta.append((pdf_id, page, start, end, ingested))
             if len(batch) >= args.batch_size:
-                em = model.encode(batch, normalize_embeddings=True)
+                em = encoder.encode(batch, normalize_embeddings=True, batch_size=args.batch_size)
                 all_embs.append(em.astype(np.float32))
                 all_texts.extend(batch)
                 print(f"[ingest]  embedded +{len(batch)} (total {len(all_texts)})", flush=True)
                 batch = []
 
     if batch:
-        em = model.encode(batch, normalize_embeddings=True)
+        em = encoder.encode(batch, normalize_embeddings=True, batch_size=args.batch_size)
         all_embs.append(em.astype(np.float32))
         all_texts.extend(batch)
         print(f"[ingest]  embedded +{len(batch)} (total {len(all_texts)})", flush=True)
@@ -84,21 +111,54 @@ def main():
         return
 
     embs = np.vstack(all_embs)
+    # Changes on every ingest; names the version dir and keys semantic-cache entries
+    version = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    # Readers keep serving CURRENT until the new version is complete
+    out = version_dir(str(root), version)
+    out.mkdir(parents=True)
     meta = {
+        "version": version,
         "embed_model": args.embed_model,
         "dim": int(embs.shape[1]),
         "count": int(embs.shape[0]),
         "batch_size": args.batch_size,
         "max_pages": args.max_pages,
+        "chunker": args.chunker,
+        "max_tokens": max_tokens,
+        "overlap_tokens": args.overlap_tokens if args.chunker == "tokens" else 0,
         "max_chars": args.max_chars,
         "overlap": args.overlap,
+        "pdfs": [p.name for p in pdfs],
+        "shards": 1,
+        "encoder": {"backend": args.encoder},
     }
+    if args.encoder != "torch" and args.parity_samples > 0:
+        # Evenly spaced chunks, so parity covers short and long texts alike
+        step = max(1, len(all_texts) // args.parity_samples)
+        parity = parity_check(model, encoder, all_texts[::step][:args.parity_samples])
+        meta["encoder"]["parity"] = parity
+        print(f"[ingest] parity vs torch: mean cos {parity['mean_cos']} min {parity['min_cos']}", flush=True)
 
-    (out / "embeddings.npy").write_bytes(embs.astype(np.float32).tobytes())
+    if args.shards > 1:
+        manifest = write_shards(out, embs, args.shards)
+        meta["shards"] = len(manifest["shards"])
+        print(f"[ingest] wrote {meta['shards']} shards ({SHARD_MANIFEST})", flush=True)
+    else:
+        (out / "embeddings.npy").write_bytes(embs.astype(np.float32).tobytes())
     (out / "texts.json").write_text(json.dumps(all_texts, ensure_ascii=False, indent=2), encoding="utf-8")
+    np.save(out / "chunks.npy", np.array(all_meta, dtype=CHUNK_META_DTYPE))
+    bm25 = build_bm25(all_texts)
+    save_bm25(out, bm25)
+    print(f"[ingest] BM25 postings: {len(bm25['vocab'])} terms, {bm25['docs'].shape[0]} entries", flush=True)
     (out / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    publish_version(str(root), out)
+    print(f"[ingest] published {version} ({root / 'CURRENT'})", flush=True)
+    if args.keep_versions > 0:
+        for p in prune_versions(str(root), args.keep_versions):
+            print(f"[ingest] pruned {p.name}", flush=True)
 
-    print(json.dumps({"status":"ok","indexed_chunks":meta["count"],"dim":meta["dim"]}, indent=2), flush=True)
+    print(json.dumps({"status":"ok","indexed_chunks":meta["count"],"dim":meta["dim"],"version":version},
+                     indent=2), flush=True)
 
 if __name__ == "__main__":
     main()
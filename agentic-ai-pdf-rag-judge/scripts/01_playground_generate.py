@@ -17,15 +17,33 @@ if str(ROOT) not in sys.path:
 from dotenv import load_dotenv
 load_dotenv()
 
-# project modules
-from src.pipeline.retriever import retrieve
-from src.pipeline.generator import generate_answer
-
-# Langfuse (optional)
-try:
-    from langfuse import Langfuse
-except Exception:
-    Langfuse = None
+from src.pipeline.filters import add_filter_args, filters_from_args
+
+
+def load_backend(service_url: str | None):
+    """RAGClient when a resident service is given, else the in-process pipeline."""
+    if service_url:
+        from src.service.client import RAGClient
+        return RAGClient(service_url)
+    from types import SimpleNamespace
+    from src.pipeline.retriever import retrieve, retrieve_with_sources, chunk_sources
+    from src.pipeline.generator import generate_answer
+    return SimpleNamespace(retrieve=retrieve, retrieve_with_sources=retrieve_with_sources,
+                           chunk_sources=chunk_sources, generate_answer=generate_answer)
+
+def langfuse_client(host_default: str):
+    """Langfuse client when keys are set (imported only then), else None."""
+    if not (os.getenv("LANGFUSE_PUBLIC_KEY") and os.getenv("LANGFUSE_SECRET_KEY")):
+        return None
+    try:
+        from langfuse import Langfuse
+    except Exception:
+        return None
+    return Langfuse(
+        public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
+        secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
+        host=os.getenv("LANGFUSE_HOST", host_default),
+    )
 
 
 def main():
@@ -34,19 +52,21 @@ def main():
     ap.add_argument("--index_dir", default="data/index", help="Vector index directory")
     ap.add_argument("--top_k", type=int, default=int(os.getenv("TOP_K", "3")))
     ap.add_argument("--embed_model", default=os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+    ap.add_argument("--retrieval", choices=["dense", "bm25", "hybrid"], default=os.getenv("RETRIEVAL_MODE", "hybrid"),
+                    help="dense, BM25 or hybrid (RRF-fused) retrieval")
+    ap.add_argument("--service", default=os.getenv("RAG_SERVICE_URL"),
+                    help="Resident RAG service URL (http://host:port or unix:///path.sock)")
+    add_filter_args(ap)
     args = ap.parse_args()
+    rag = load_backend(args.service)
+    filters = filters_from_args(args)
 
     manual_tag = os.getenv("TRACE_TAG", "provider:groq")
 
     # ---- Langfuse top-level trace ----
-    lf = None
+    lf = langfuse_client("https://us.cloud.langfuse.com")
     trace = None
-    if Langfuse and os.getenv("LANGFUSE_PUBLIC_KEY") and os.getenv("LANGFUSE_SECRET_KEY"):
-        lf = Langfuse(
-            public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
-            secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
-            host=os.getenv("LANGFUSE_HOST", "https://us.cloud.langfuse.com"),
-        )
+    if lf:
         trace = lf.trace(name="playground_generate", metadata={"top_k": args.top_k})
         # attach manual tag (shows in UI Tags)
         trace.update(tags=[manual_tag])
@@ -54,11 +74,15 @@ def main():
         trace.update(input={
             "question": args.question,
             "index_dir": args.index_dir,
-            "top_k": args.top_k
+            "top_k": args.top_k,
+            "filters": filters,
         })
 
     # ---- Retrieve contexts ----
-    results = retrieve(query=args.question, index_dir=args.index_dir, top_k=args.top_k, embed_model=args.embed_model)
+    # sources come from the same index version as the results, even mid re-ingest
+    results, ctx_sources = rag.retrieve_with_sources(query=args.question, index_dir=args.index_dir, top_k=args.top_k,
+                                                     embed_model=args.embed_model, mode=args.retrieval,
+                                                     filters=filters)
     contexts: List[str] = [r[2] for r in results]
     ctx_idx: List[int] = [int(r[0]) for r in results]
     ctx_previews: List[str] = [r[2][:160] for r in results]
@@ -66,13 +90,13 @@ def main():
     if trace:
         trace.span(
             name="retrieval",
-            input={"question": args.question, "index_dir": args.index_dir, "top_k": args.top_k},
-            output={"contexts_idx": ctx_idx, "contexts_preview": ctx_previews},
+            input={"question": args.question, "index_dir": args.index_dir, "top_k": args.top_k, "filters": filters},
+            output={"contexts_idx": ctx_idx, "contexts_preview": ctx_previews, "contexts_source": ctx_sources},
         )
 
     # ---- Generate with Groq ----
     t0 = time.time()
-    answer, usage = generate_answer(args.question, contexts)
+    answer, usage = rag.generate_answer(args.question, contexts, scores=[r[1] for r in results])
     latency_ms = int((time.time() - t0) * 1000)
 
     if trace:
@@ -104,6 +128,7 @@ def main():
         "question": args.question,
         "contexts_idx": ctx_idx,
         "contexts_preview": ctx_previews,
+        "contexts_source": ctx_sources,
         "answer": answer,
         "usage": usage,
         "latency_ms": latency_ms,
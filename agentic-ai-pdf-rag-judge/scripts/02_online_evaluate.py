@@ -2,8 +2,9 @@
 from __future__ import annotations
 
 import argparse
-import json
 import os
+import random
+import subprocess
 import sys
 import time
 import uuid
@@ -16,52 +17,80 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from dotenv import load_dotenv
-from tabulate import tabulate
 load_dotenv()
 
-# project modules
-from src.pipeline.retriever import retrieve
-from src.pipeline.generator import generate_answer
-
-# Judge import (class preferred; function fallback)
-try:
-    from src.judge.judge_agent import JudgeAgent
-    _JUDGE_IS_CLASS = True
-except Exception:
-    _JUDGE_IS_CLASS = False
-    from src.judge.judge_agent import evaluate as _judge_evaluate
-    class JudgeAgent:
-        def __init__(self, model: str | None = None): self.model = model
-        def score(self, q, ctxs, a, gt): return _judge_evaluate(q, ctxs, a, gt)
-        def evaluate(self, q, ctxs, a, gt): return self.score(q, ctxs, a, gt)
-
-# Langfuse (optional)
-try:
-    from langfuse import Langfuse
-except Exception:
-    Langfuse = None
-
-
-def load_dataset(path: str) -> List[Dict[str, Any]]:
-    p = Path(path)
-    data = json.loads(p.read_text(encoding="utf-8"))
-    if isinstance(data, dict) and "rows" in data:
-        data = data["rows"]
-    if not isinstance(data, list):
-        raise ValueError("Dataset must be a JSON list or an object with 'rows'.")
-    return data
-
-
-def ensure_contexts(question: str,
+from src.eval.adaptive import AdaptiveStopper, load_thresholds
+from src.eval.dataset import iter_rows, parse_shard, shard_rows
+from src.eval.ratelimit import RateLimiter, worker_share
+from src.eval.report import merge_reports, print_table, shard_report_path, write_report
+from src.eval.results_store import DEFAULT_DB, ResultsStore
+
+
+def load_backend(service_url: str | None):
+    """
+    (rag, judge): a RAGClient for both when a resident service is given,
+    else the in-process pipeline and JudgeAgent.
+    """
+    if service_url:
+        from src.service.client import RAGClient
+        client = RAGClient(service_url)
+        return client, client
+
+    from types import SimpleNamespace
+    from src.pipeline.retriever import retrieve, retrieve_with_sources, chunk_sources
+    from src.pipeline.generator import generate_answer
+    rag = SimpleNamespace(retrieve=retrieve, retrieve_with_sources=retrieve_with_sources,
+                          chunk_sources=chunk_sources, generate_answer=generate_answer)
+
+    # Judge import (class preferred; function fallback)
+    try:
+        from src.judge.judge_agent import JudgeAgent
+    except Exception:
+        from src.judge.judge_agent import evaluate as _judge_evaluate
+        class JudgeAgent:
+            def __init__(self, model: str | None = None): self.model = model
+            def score(self, q, ctxs, a, gt): return _judge_evaluate(q, ctxs, a, gt)
+            def evaluate(self, q, ctxs, a, gt): return self.score(q, ctxs, a, gt)
+    return rag, JudgeAgent()
+
+def langfuse_client(host_default: str):
+    """Langfuse client when keys are set (imported only then), else None."""
+    if not (os.getenv("LANGFUSE_PUBLIC_KEY") and os.getenv("LANGFUSE_SECRET_KEY")):
+        return None
+    try:
+        from langfuse import Langfuse
+    except Exception:
+        return None
+    return Langfuse(
+        public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
+        secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
+        host=os.getenv("LANGFUSE_HOST", host_default),
+    )
+
+
+def has_contexts(row: Dict[str, Any]) -> bool:
+    return isinstance(row.get("contexts"), list) and bool(row["contexts"]) and isinstance(row["contexts"][0], str)
+
+
+def ensure_contexts(rag,
+                    question: str,
                     row: Dict[str, Any],
                     index_dir: str,
                     top_k: int,
-                    embed_model: str) -> Tuple[List[str], Dict[str, Any]]:
-    if isinstance(row.get("contexts"), list) and row["contexts"] and isinstance(row["contexts"][0], str):
+                    embed_model: str,
+                    mode: str | None = None,
+                    filters: Dict[str, Any] | None = None) -> Tuple[List[str], Dict[str, Any]]:
+    if has_contexts(row):
         ctx = row["contexts"]
         meta = {"used": "provided", "count": len(ctx), "idx": [], "preview": [c[:160] for c in ctx[:3]]}
         return ctx, meta
-    results = retrieve(query=question, index_dir=index_dir, top_k=top_k, embed_model=embed_model)
+    # one index version for results and sources, so a re-ingest mid-run cannot split them
+    results, sources = rag.retrieve_with_sources(query=question, index_dir=index_dir, top_k=top_k,
+                                                 embed_model=embed_model, mode=mode, filters=filters)
+    return retrieved_contexts(results, sources)
+
+
+def retrieved_contexts(results, sources: List[Any]) -> Tuple[List[str], Dict[str, Any]]:
     ctx = [r[2] for r in results]
     meta = {
         "used": "retrieved",
@@ -69,32 +98,155 @@ def ensure_contexts(question: str,
         "idx": [int(r[0]) for r in results],
         "preview": [r[2][:160] for r in results],
         "scores": [float(r[1]) for r in results],
+        "sources": sources,
     }
     return ctx, meta
 
 
+def paced(fn, limiter: RateLimiter):
+    """fn, called only after the limiter grants a request."""
+    def call(*a, **kw):
+        limiter.acquire()
+        return fn(*a, **kw)
+    return call
+
+
+def _worker_argv(argv: List[str]) -> List[str]:
+    """
+    argv without --workers and --store, for re-invoking this script as one
+    shard worker (the launcher stores the merged run once).
+    """
+    out, skip = [], False
+    for i, a in enumerate(argv):
+        if skip:
+            skip = False
+        elif a == "--workers":
+            skip = True
+        elif a == "--store":
+            skip = i + 1 < len(argv) and not argv[i + 1].startswith("--")   # optional value
+        elif not a.startswith(("--workers=", "--store=")):
+            out.append(a)
+    return out
+
+
+def current_index_version(args) -> str | None:
+    try:
+        if args.service:
+            from src.service.client import RAGClient
+            return RAGClient(args.service).health().get("index_version")
+        from src.pipeline.retriever import index_version
+        return index_version(args.index_dir)
+    except Exception:
+        return None
+
+
+def store_run(args, report_path: str, report: Dict[str, Any]) -> None:
+    """Append the run to the SQLite results store (see scripts/04_results.py)."""
+    store = ResultsStore(args.store)
+    try:
+        run_id = store.add_run(report, {
+            "report_path": report_path, "dataset": args.data, "index_dir": args.index_dir,
+            "index_version": current_index_version(args), "retrieval": args.retrieval, "top_k": args.top_k,
+        })
+    finally:
+        store.close()
+    print(f"[ok] Stored run {run_id} in {args.store}")
+
+
+def launch_workers(args) -> int:
+    """
+    Run --workers local processes, one per shard (each with its own Groq
+    clients, rate-limit share and shard report), then merge their reports.
+    """
+    n = args.workers
+    paths = [shard_report_path(args.report, i, n) for i in range(n)]
+    for p in paths:
+        p.unlink(missing_ok=True)   # never merge a previous run's shard report
+    base = [sys.executable, str(Path(__file__).resolve())] + _worker_argv(sys.argv[1:])
+    procs = [subprocess.Popen(base + ["--shard", f"{i}/{n}", "--report", str(paths[i])]) for i in range(n)]
+    codes = [p.wait() for p in procs]
+    failed = [i for i, c in enumerate(codes) if c != 0]
+    ok = [str(paths[i]) for i, c in enumerate(codes) if c == 0 and paths[i].exists()]
+    if failed:
+        print(f"[error] shard worker(s) {failed} failed; merging the {len(ok)} successful shard report(s) "
+              f"and not storing the run.", file=sys.stderr)
+    merge_into(args, ok, store=not failed)
+    return 1 if failed else 0
+
+
+def merge_into(args, shard_paths: List[str], store: bool = True) -> None:
+    report = merge_reports(shard_paths)
+    print_table(report["items"])
+    write_report(args.report, report)
+    print(f"\n[ok] Merged {len(shard_paths)} shard report(s) into {args.report}")
+    if args.store and store:
+        store_run(args, args.report, report)
+
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--data", required=True, help="Path to JSON dataset")
+    ap.add_argument("--data", required=False, help="JSON or JSONL dataset (streamed row by row)")
     ap.add_argument("--report", required=True, help="Path to write JSON report")
     ap.add_argument("--index_dir", default="data/index", help="Vector index directory")
     ap.add_argument("--top_k", type=int, default=int(os.getenv("TOP_K", "3")))
     ap.add_argument("--embed_model", default=os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+    ap.add_argument("--retrieval", choices=["dense", "bm25", "hybrid"], default=os.getenv("RETRIEVAL_MODE", "hybrid"),
+                    help="dense, BM25 or hybrid (RRF-fused) retrieval")
     ap.add_argument("--trace_name", default="online_evaluation")
+    ap.add_argument("--service", default=os.getenv("RAG_SERVICE_URL"),
+                    help="Resident RAG service URL (http://host:port or unix:///path.sock)")
+    ap.add_argument("--semantic_cache", action="store_true", default=os.getenv("SEMANTIC_CACHE") == "1",
+                    help="Serve paraphrased repeat questions from the semantic cache (retrieval + answer)")
+    ap.add_argument("--shard", default=None, help="Evaluate only shard i of N (every N-th row), e.g. 0/4")
+    ap.add_argument("--workers", type=int, default=0,
+                    help="Run N local shard workers and merge their reports (0/1 = this process only)")
+    ap.add_argument("--rpm", type=float, default=float(os.getenv("GROQ_RPM", "0")),
+                    help="Groq requests per minute for the whole run, split evenly across shards (0 = no limit)")
+    ap.add_argument("--merge", nargs="+", default=None, metavar="SHARD_REPORT",
+                    help="Merge shard reports into --report instead of evaluating")
+    ap.add_argument("--store", nargs="?", const=os.getenv("RESULTS_DB", DEFAULT_DB), default=None,
+                    metavar="DB", help=f"Also append the run to a SQLite results store (default {DEFAULT_DB})")
+    ap.add_argument("--adaptive", action="store_true",
+                    help="Evaluate rows in random order and stop once the PASS rate is clearly above/below --pass_target")
+    ap.add_argument("--pass_target", type=float, default=0.8, help="Required PASS rate (--adaptive)")
+    ap.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the stopping intervals")
+    ap.add_argument("--min_rows", type=int, default=10, help="Rows evaluated before early stopping may trigger")
+    ap.add_argument("--thresholds", default=str(ROOT / "configs" / "thresholds.yaml"),
+                    help="Per-metric PASS thresholds (--adaptive)")
+    ap.add_argument("--seed", type=int, default=0, help="Row order seed (--adaptive)")
     args = ap.parse_args()
+    if args.merge:
+        merge_into(args, args.merge)
+        return
+    if not args.data:
+        ap.error("--data is required unless --merge is given")
+    if args.workers > 1:
+        if args.shard:
+            ap.error("--workers launches its own shards; drop --shard")
+        if args.adaptive:
+            ap.error("--adaptive needs one view of all scores; it cannot be combined with --workers")
+        sys.exit(launch_workers(args))
+    shard, n_shards = parse_shard(args.shard) if args.shard else (0, 1)
+    # Every LLM request takes a token from this worker's share. In-process, the
+    # request policy takes one per upstream request, hedges and failovers included;
+    # through --service only whole generate/judge calls can be paced from here.
+    limiter = RateLimiter(worker_share(args.rpm, n_shards))
+    pace = limiter
+    if limiter.rate and not args.service:
+        from src.pipeline.request_policy import set_limiter
+        set_limiter(limiter)
+        pace = RateLimiter(0)
+    if args.semantic_cache and args.service:
+        print("[warn] --semantic_cache applies to in-process runs; the service caches /ask itself.")
+        args.semantic_cache = False
 
     manual_tag = os.getenv("TRACE_TAG", "provider:groq")
 
     # Langfuse setup (optional)
-    lf = None
+    lf = langfuse_client("https://cloud.langfuse.com")
     trace = None
-    if Langfuse and os.getenv("LANGFUSE_PUBLIC_KEY") and os.getenv("LANGFUSE_SECRET_KEY"):
-        lf = Langfuse(
-            public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
-            secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
-            host=os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com"),
-        )
-        trace = lf.trace(name=args.trace_name, metadata={"top_k": args.top_k})
+    if lf:
+        trace = lf.trace(name=args.trace_name, metadata={"top_k": args.top_k, "shard": args.shard})
         trace.update(tags=[manual_tag])
         trace.update(input={
             "dataset": args.data,
@@ -104,20 +256,43 @@ def main():
     else:
         trace_id = str(uuid.uuid4())
 
-    rows = load_dataset(args.data)
-    judge = JudgeAgent()
+    rag, judge = load_backend(args.service)
 
-    table_rows: List[List[str]] = []
     report_items: List[Dict[str, Any]] = []
+    rows = shard_rows(iter_rows(args.data), shard, n_shards)
+    stopper = None
+    if args.adaptive:
+        # Random order needs the (shard's) rows up front; scores stay streaming
+        rows = [(i, r) for i, r in rows if r.get("question", "").strip()]
+        random.Random(args.seed).shuffle(rows)
+        stopper = AdaptiveStopper(load_thresholds(args.thresholds), args.pass_target, len(rows),
+                                  confidence=args.confidence, min_rows=args.min_rows)
 
-    for idx, row in enumerate(rows, 1):
+    for idx, row in rows:
         q = row.get("question", "").strip()
         gt = row.get("ground_truth", "") or row.get("ground_truths", "")
         if not q:
             continue
 
-        # retrieval (or use provided contexts)
-        contexts, rmeta = ensure_contexts(q, row, index_dir=args.index_dir, top_k=args.top_k, embed_model=args.embed_model)
+        cache_info = None
+        if args.semantic_cache and not has_contexts(row):
+            # retrieval + generation, skipped entirely on a semantic-cache hit
+            from src.pipeline.semantic_cache import cached_answer
+            t0 = time.time()
+            results, answer, usage, cache_info = cached_answer(
+                q, args.index_dir, args.top_k, paced(rag.generate_answer, pace),
+                embed_model=args.embed_model, mode=args.retrieval,
+                filters=row.get("filters"))
+            gen_latency_ms = int((time.time() - t0) * 1000)
+            # provenance from the version that served retrieval, not whatever is live now
+            sources = rag.chunk_sources(cache_info.pop("index_dir"), [int(r[0]) for r in results])
+            contexts, rmeta = retrieved_contexts(results, sources)
+            rmeta["cache"] = {k: cache_info[k] for k in ("hit", "similarity") if k in cache_info}
+        else:
+            # retrieval (or use provided contexts)
+            contexts, rmeta = ensure_contexts(rag, q, row, index_dir=args.index_dir, top_k=args.top_k,
+                                              embed_model=args.embed_model, mode=args.retrieval,
+                                              filters=row.get("filters"))
 
         if trace:
             trace.span(
@@ -125,11 +300,15 @@ def main():
                 input={"question": q, "idx": idx, "index_dir": args.index_dir, "top_k": args.top_k},
                 output={"count": rmeta["count"], "idx": rmeta.get("idx", []), "preview": rmeta.get("preview", [])},
             )
+            if cache_info:
+                trace.span(name="semantic_cache", input={"question": q}, output=cache_info)
 
         # generate
-        t0 = time.time()
-        answer, usage = generate_answer(q, contexts)
-        gen_latency_ms = int((time.time() - t0) * 1000)
+        if cache_info is None:
+            pace.acquire()
+            t0 = time.time()
+            answer, usage = rag.generate_answer(q, contexts, scores=rmeta.get("scores"))
+            gen_latency_ms = int((time.time() - t0) * 1000)
 
         if trace:
             trace.generation(
@@ -147,6 +326,7 @@ def main():
             )
 
         # judge
+        pace.acquire()
         t1 = time.time()
         try:
             scores = judge.score(q, contexts, answer, gt)
@@ -163,16 +343,6 @@ def main():
                 metadata={"provider": scores.get("_provider", "groq"), "latency_ms": judge_latency_ms},
             )
 
-        # table
-        table_rows.append([
-            q[:28] + ("…" if len(q) > 28 else ""),
-            f"{scores.get('faith', 0):.2f}",
-            f"{scores.get('relev', 0):.2f}",
-            f"{scores.get('prec', 0):.2f}",
-            f"{scores.get('recall', 0):.2f}",
-            scores.get("verdict", "FAIL"),
-        ])
-
         # report item
         report_items.append({
             "idx": idx,
@@ -183,23 +353,36 @@ def main():
             "scores": scores,
             "latency": {"gen_ms": gen_latency_ms, "judge_ms": judge_latency_ms},
         })
+        if stopper and stopper.add(scores):
+            print(f"[adaptive] {stopper.decision.upper()} settled after {stopper.n}/{stopper.population} rows")
+            break
 
-    # print table
-    headers = ["question", "faith", "relev", "prec", "recall", "verdict"]
-    if table_rows:
-        print(tabulate(table_rows, headers=headers, tablefmt="github"))
-    else:
-        print("[warn] No rows evaluated.")
+    print_table(report_items)
 
     # write report
+    summary: Dict[str, Any] = {"count": len(report_items)}
+    if args.shard:
+        summary["shard"] = args.shard
+    if stopper:
+        summary["adaptive"] = stopper.summary()
+    if not args.service:
+        # per-model latency percentiles, hedges and failovers of this run's LLM calls
+        from src.pipeline.request_policy import policy_stats
+        summary["llm_requests"] = policy_stats()
+    if limiter.rate:
+        summary["rate_limit"] = {"rpm": round(limiter.rate * 60, 2), "waited_s": round(limiter.waited_s, 2)}
+    if args.semantic_cache:
+        from src.pipeline.semantic_cache import cache_stats
+        summary["semantic_cache"] = cache_stats()
     out = {
         "trace_id": getattr(trace, "id", None),
-        "summary": {"count": len(report_items)},
+        "summary": summary,
         "items": report_items,
     }
-    Path(args.report).parent.mkdir(parents=True, exist_ok=True)
-    Path(args.report).write_text(json.dumps(out, indent=2, ensure_ascii=False), encoding="utf-8")
+    write_report(args.report, out)
     print(f"\n[ok] Report written to {args.report}")
+    if args.store:
+        store_run(args, args.report, out)
 
     # top-level output summary (compact)
     if trace:
@@ -209,13 +392,24 @@ def main():
             "report_path": args.report,
             "items_evaluated": len(report_items),
             "avg_faith": avg_faith,
-            "avg_relev": avg_relev
+            "avg_relev": avg_relev,
+            "semantic_cache": summary.get("semantic_cache"),
+            "adaptive": summary.get("adaptive"),
         })
 
     if lf:
         lf.flush()
         lf.shutdown()
 
+    if stopper:
+        a = summary["adaptive"]
+        print(f"[adaptive] decision {a['decision'].upper()}: pass rate {a['pass_rate']} "
+              f"CI {a['pass_rate_ci']} vs target {a['pass_target']}; "
+              f"{a['rows_evaluated']}/{a['rows_total']} rows, {a['llm_calls_saved']} LLM calls saved")
+        # CI gate: non-zero exit when the PASS rate is below target
+        if a["decision"] == "fail":
+            sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
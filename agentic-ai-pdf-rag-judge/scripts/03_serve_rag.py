@@ -0,0 +1,55 @@
+# scripts/03_serve_rag.py
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# --- ensure project root on sys.path ---
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from src.service.server import RAGService, make_server
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run the resident RAG service (warm model, index and clients).")
+    ap.add_argument("--index_dir", default="data/index", help="Vector index directory")
+    ap.add_argument("--embed_model", default=os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+    ap.add_argument("--top_k", type=int, default=int(os.getenv("TOP_K", "3")))
+    ap.add_argument("--retrieval", choices=["dense", "bm25", "hybrid"], default=os.getenv("RETRIEVAL_MODE"))
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--unix", default=None, help="Serve on this Unix socket path instead of TCP")
+    ap.add_argument("--quiet", action="store_true", help="Do not log each request")
+    ap.add_argument("--semantic_cache", action="store_true", default=os.getenv("SEMANTIC_CACHE") == "1",
+                    help="Answer paraphrased repeats on /ask from the semantic cache")
+    args = ap.parse_args()
+
+    service = RAGService(args.index_dir, args.embed_model, top_k=args.top_k, mode=args.retrieval,
+                         semantic_cache=args.semantic_cache)
+    t0 = time.time()
+    service.warm()
+    print(f"[ok] Warm in {time.time() - t0:.1f}s: {service.index_info}")
+
+    server = make_server(service, host=args.host, port=args.port, unix_path=args.unix, quiet=args.quiet)
+    url = f"unix://{args.unix}" if args.unix else f"http://{args.host}:{args.port}"
+    print(f"[ok] Serving on {url}  (export RAG_SERVICE_URL={url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.unix and os.path.exists(args.unix):
+            os.unlink(args.unix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# scripts/04_results.py
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# --- ensure project root on sys.path ---
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.eval.results_store import DEFAULT_DB, LATENCIES, METRICS, ResultsStore
+
+
+def show(rows: List[Dict[str, Any]], as_json: bool) -> None:
+    if as_json:
+        print(json.dumps(rows, indent=2, ensure_ascii=False))
+        return
+    if not rows:
+        print("[warn] No results.")
+        return
+    for r in rows:
+        if isinstance(r.get("started_at"), float):
+            r["started_at"] = time.strftime("%Y-%m-%d %H:%M", time.localtime(r["started_at"]))
+        if isinstance(r.get("question"), str) and len(r["question"]) > 40:
+            r["question"] = r["question"][:40] + "…"
+    from tabulate import tabulate
+    print(tabulate(rows, headers="keys", tablefmt="github", floatfmt=".3f"))
+
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=os.getenv("RESULTS_DB", DEFAULT_DB), help="SQLite results store")
+    common.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+
+    ap = argparse.ArgumentParser(description="Query the evaluation results store (runs written by 02 --store).")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("import", parents=[common], help="Add existing JSON reports to the store")
+    p.add_argument("reports", nargs="+")
+    p.add_argument("--dataset", default=None)
+
+    p = sub.add_parser("runs", parents=[common], help="Recent runs with mean scores")
+    p.add_argument("--last", type=int, default=20)
+
+    p = sub.add_parser("diff", parents=[common], help="Per-question score changes between two runs (largest drops first)")
+    p.add_argument("run_a", help="Run id, id prefix, latest or latest~N")
+    p.add_argument("run_b")
+    p.add_argument("--metric", choices=METRICS + ("pass",), default="faith")
+    p.add_argument("--min_delta", type=float, default=0.0)
+    p.add_argument("--limit", type=int, default=50)
+
+    p = sub.add_parser("latency", parents=[common], help="Latency percentiles per run")
+    p.add_argument("runs", nargs="*", default=["latest"])
+    p.add_argument("--stage", choices=sorted(LATENCIES), default="gen")
+
+    p = sub.add_parser("trend", parents=[common], help="Per-run mean metric, PASS rate and p95 latency over time")
+    p.add_argument("--metric", choices=METRICS, default="faith")
+    p.add_argument("--last", type=int, default=50)
+    p.add_argument("--dataset", default=None)
+    args = ap.parse_args()
+
+    store = ResultsStore(args.db)
+    try:
+        if args.cmd == "import":
+            for path in args.reports:
+                run_id = store.import_report(path, {"dataset": args.dataset})
+                print(f"[ok] {path} -> run {run_id}")
+        elif args.cmd == "runs":
+            show(store.runs(args.last), args.json)
+        elif args.cmd == "diff":
+            show(store.diff(args.run_a, args.run_b, args.metric, args.min_delta, args.limit), args.json)
+        elif args.cmd == "latency":
+            show(store.latency(args.runs, args.stage), args.json)
+        elif args.cmd == "trend":
+            show(store.trend(args.metric, args.last, args.dataset), args.json)
+    except ValueError as e:
+        print(f"[error] {e}", file=sys.stderr)
+        sys.exit(2)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# scripts/bench_e2e.py
+"""
+End-to-end throughput benchmark: retrieve -> generate_answer -> JudgeAgent.evaluate,
+offline. Groq is replaced by a local mock server (src/bench/mock_llm.py),
+Langfuse by an in-memory stub, and the embed model by a hashing encoder over
+synthetic indexes of the requested sizes.
+
+    python scripts/bench_e2e.py --sizes 1000,20000 --concurrency 1,4,16 --out output/bench_e2e.json
+    python scripts/bench_e2e.py --compare output/bench_e2e.json      # deltas vs a previous run
+
+The JSON report has one entry per (index size, concurrency) with QPS and
+p50/p90/p99/mean per stage; the key layout is stable so two files diff cleanly.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+# --- ensure project root on sys.path ---
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.bench.fixtures import (BENCH_ENCODER, HashEncoder, StubLangfuse,
+                                build_synthetic_index, sample_queries)
+from src.bench.mock_llm import MockLLMConfig, start_background
+
+STAGES = ("retrieve", "generate", "judge", "trace", "total")
+
+
+def _summary(ms: List[float]) -> Dict[str, float]:
+    a = np.asarray(ms, dtype=np.float64)
+    if a.size == 0:
+        return {"p50": None, "p90": None, "p99": None, "mean": None}
+    return {
+        "p50": round(float(np.percentile(a, 50)), 3),
+        "p90": round(float(np.percentile(a, 90)), 3),
+        "p99": round(float(np.percentile(a, 99)), 3),
+        "mean": round(float(a.mean()), 3),
+    }
+
+
+def run_level(index_dir: str, queries: List[str], concurrency: int, args, judge, lf) -> Dict[str, Any]:
+    from src.pipeline.retriever import retrieve
+    from src.pipeline.generator import generate_answer
+
+    def one(q: str) -> Dict[str, float]:
+        t = {}
+        t0 = time.perf_counter()
+        results = retrieve(q, index_dir, top_k=args.top_k, mode=args.retrieval)
+        t1 = time.perf_counter()
+        contexts = [r[2] for r in results]
+        answer, usage = generate_answer(q, contexts, scores=[r[1] for r in results])
+        t2 = time.perf_counter()
+        scores = judge.evaluate(q, contexts, answer, "")
+        t3 = time.perf_counter()
+        trace = lf.trace(name="bench", input={"question": q})
+        trace.span(name="retrieval", output={"idx": [r[0] for r in results]})
+        trace.generation(name="generator.answer", output={"contexts": contexts, "answer": answer, "usage": usage})
+        trace.generation(name="judge.verdict", output=scores)
+        t4 = time.perf_counter()
+        t["retrieve"], t["generate"], t["judge"], t["trace"] = (t1 - t0) * 1e3, (t2 - t1) * 1e3, (t3 - t2) * 1e3, (t4 - t3) * 1e3
+        t["total"] = (t4 - t0) * 1e3
+        return t
+
+    samples: Dict[str, List[float]] = {s: [] for s in STAGES}
+    errors = warmup_errors = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # warm-up: failures are counted like measured ones, not raised
+        for f in [pool.submit(one, q) for q in queries[: min(len(queries), concurrency * 2)]]:
+            if f.exception() is not None:
+                warmup_errors += 1
+        start = time.perf_counter()
+        futures = [pool.submit(one, q) for q in queries]
+        for f in futures:
+            try:
+                t = f.result()
+            except Exception:
+                errors += 1
+                continue
+            for s in STAGES:
+                samples[s].append(t[s])
+        wall = time.perf_counter() - start
+    ok = len(samples["total"])
+    return {
+        "concurrency": concurrency,
+        "requests": len(queries),
+        "errors": errors,
+        "warmup_errors": warmup_errors,
+        "wall_s": round(wall, 3),
+        "qps": round(ok / wall, 2) if wall > 0 else None,
+        "stages": {s: _summary(samples[s]) for s in STAGES},
+    }
+
+
+def compare(prev_path: str, cur: Dict[str, Any]) -> float:
+    """Print per-level deltas; returns the worst total-p99 ratio (cur / prev)."""
+    prev = json.loads(Path(prev_path).read_text(encoding="utf-8"))
+    key = lambda r: (r["index_size"], r["concurrency"])
+    old = {key(r): r for r in prev.get("runs", [])}
+    worst = 1.0
+    print(f"\n{'size':>8} {'conc':>5} {'qps':>16} {'retrieve p99':>20} {'total p99':>20}")
+    for r in cur["runs"]:
+        o = old.get(key(r))
+        if not o:
+            continue
+        def fmt(a, b):
+            if a is None or b is None or b == 0:
+                return "n/a"
+            return f"{b:.1f}->{a:.1f} ({(a / b - 1) * 100:+.0f}%)"
+        print(f"{r['index_size']:>8} {r['concurrency']:>5} {fmt(r['qps'], o['qps']):>16} "
+              f"{fmt(r['stages']['retrieve']['p99'], o['stages']['retrieve']['p99']):>20} "
+              f"{fmt(r['stages']['total']['p99'], o['stages']['total']['p99']):>20}")
+        if r["stages"]["total"]["p99"] and o["stages"]["total"]["p99"]:
+            worst = max(worst, r["stages"]["total"]["p99"] / o["stages"]["total"]["p99"])
+    return worst
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline end-to-end RAG benchmark (mock LLM, stub tracer).")
+    ap.add_argument("--sizes", default="1000,10000", help="Comma-separated index sizes (chunks)")
+    ap.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    ap.add_argument("--requests", type=int, default=200, help="Measured requests per level")
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--shards", type=int, default=1, help="Shards per synthetic index (SHARD_WORKERS picks threads/processes)")
+    ap.add_argument("--top_k", type=int, default=3)
+    ap.add_argument("--retrieval", choices=["dense", "bm25", "hybrid"], default="hybrid")
+    ap.add_argument("--work_dir", default=os.path.join(tempfile.gettempdir(), "rag_bench"),
+                    help="Where synthetic indexes are built and reused")
+    ap.add_argument("--latency_ms", type=float, default=MockLLMConfig.latency_ms, help="Mock LLM median latency")
+    ap.add_argument("--latency_sigma", type=float, default=MockLLMConfig.latency_sigma)
+    ap.add_argument("--ms_per_token", type=float, default=MockLLMConfig.ms_per_token)
+    ap.add_argument("--tokens_mean", type=int, default=MockLLMConfig.tokens_mean)
+    ap.add_argument("--error_rate", type=float, default=0.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="output/bench_e2e.json")
+    ap.add_argument("--compare", default=None, help="Previous report to diff against")
+    ap.add_argument("--max_regression", type=float, default=None,
+                    help="Exit 1 if any total p99 exceeds the previous run by this factor (e.g. 1.2)")
+    args = ap.parse_args()
+
+    llm_cfg = MockLLMConfig(args.latency_ms, args.latency_sigma, args.ms_per_token,
+                            args.tokens_mean, args.error_rate, args.seed)
+    llm = start_background(llm_cfg)
+    host, port = llm.server_address[:2]
+    os.environ["GROQ_BASE_URL"] = f"http://{host}:{port}"
+    os.environ["GROQ_API_KEY"] = "bench"   # never a real key: all traffic goes to the mock
+
+    from src.pipeline.retriever import encoder_stats, register_encoder, warm
+    from src.judge.judge_agent import JudgeAgent
+    register_encoder(BENCH_ENCODER, HashEncoder(args.dim))
+    judge = JudgeAgent()
+    lf = StubLangfuse()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    levels = [int(c) for c in args.concurrency.split(",") if c]
+    runs = []
+    for size in sizes:
+        t0 = time.time()
+        index_dir = build_synthetic_index(Path(args.work_dir) / f"n{size}_d{args.dim}_s{args.shards}", size,
+                                          dim=args.dim, seed=args.seed, shards=args.shards)
+        warm(str(index_dir))
+        print(f"[info] index n={size} ready in {time.time() - t0:.1f}s")
+        queries = sample_queries(index_dir, args.requests, seed=args.seed + 1)
+        for c in levels:
+            r = run_level(str(index_dir), queries, c, args, judge, lf)
+            r["index_size"] = size
+            runs.append(r)
+            st = r["stages"]
+            print(f"[ok] n={size:<8} c={c:<3} qps={r['qps']:<8} retrieve p50/p99={st['retrieve']['p50']}/{st['retrieve']['p99']} ms"
+                  f"  total p50/p99={st['total']['p50']}/{st['total']['p99']} ms  errors={r['errors']} (warm-up {r['warmup_errors']})")
+
+    report = {
+        "schema": 1,
+        "env": {"python": platform.python_version(), "platform": platform.platform(),
+                "cpus": os.cpu_count(), "numpy": np.__version__},
+        "config": {"dim": args.dim, "shards": args.shards, "shard_workers": os.getenv("SHARD_WORKERS", "threads"),
+                   "top_k": args.top_k, "retrieval": args.retrieval,
+                   "requests": args.requests, "llm": vars(llm_cfg),
+                   "microbatch_max_wait_us": int(os.getenv("MICROBATCH_MAX_WAIT_US", "0"))},
+        "runs": runs,
+        "encoder_stats": encoder_stats(),
+    }
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    Path(args.out).write_text(json.dumps(report, indent=2, sort_keys=True), encoding="utf-8")
+    print(f"[ok] Report written to {args.out}  (mock LLM calls: {llm.llm.calls})")
+
+    llm.shutdown()
+    if args.compare:
+        worst = compare(args.compare, report)
+        if args.max_regression and worst > args.max_regression:
+            print(f"[fail] total p99 regressed x{worst:.2f} (limit x{args.max_regression})")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# scripts/bench_import_time.py
+"""
+Import-time regression check for the CLI entry points.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter for
+each project module, sums the cumulative import cost, and fails when a module
+exceeds its budget or drags in a heavy dependency that should load lazily
+(torch, sentence_transformers, groq, langfuse, tabulate).
+
+    python scripts/bench_import_time.py                 # table + exit code
+    python scripts/bench_import_time.py --json out.json --repeat 5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# module -> budget (ms, cumulative, median of --repeat runs). numpy alone is
+# ~100-150 ms on a laptop; everything beyond it should be near-free.
+BUDGETS_MS: Dict[str, float] = {
+    "src.pipeline.retriever": 250,
+    "src.pipeline.generator": 250,
+    "src.pipeline.lexical": 200,
+    "src.pipeline.chunker": 250,
+    "src.judge.judge_agent": 150,
+    "src.observe.tracer": 50,
+    "src.service.client": 100,
+}
+
+# Must not appear in the import graph of any module above
+HEAVY = ("torch", "sentence_transformers", "transformers", "groq", "langfuse", "tabulate")
+
+
+def measure(module: str) -> Tuple[float, List[str]]:
+    """(cumulative ms for `module`, heavy top-level packages it imported)."""
+    env = dict(os.environ, PYTHONPATH=str(ROOT) + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    # Children are printed before their parent, and site/.pth imports run
+    # before `-c`; only count depth-0 entries on the module's own package path.
+    chain = {".".join(module.split(".")[:i]) for i in range(1, module.count(".") + 2)}
+    total_us = 0
+    heavy, pending = set(), set()
+    for line in proc.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            continue   # header row
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        top = name.strip().split(".")[0]
+        if top in HEAVY:
+            pending.add(top)
+        if depth == 0:
+            if name.strip() in chain:
+                total_us += cumulative
+                heavy |= pending
+            pending = set()
+    return total_us / 1000.0, sorted(heavy)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Check import-time budgets for project modules.")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per module (median is reported)")
+    ap.add_argument("--module", action="append", help="Only these modules (default: all budgeted)")
+    ap.add_argument("--scale", type=float, default=1.0, help="Multiply budgets (slow CI machines)")
+    ap.add_argument("--json", default=None, help="Also write results to this JSON file")
+    args = ap.parse_args()
+
+    modules = args.module or list(BUDGETS_MS)
+    results = []
+    failed = False
+    for mod in modules:
+        runs, heavy = [], []
+        for _ in range(max(1, args.repeat)):
+            ms, heavy = measure(mod)
+            runs.append(ms)
+        ms = statistics.median(runs)
+        budget = BUDGETS_MS.get(mod, float("inf")) * args.scale
+        ok = ms <= budget and not heavy
+        failed |= not ok
+        results.append({"module": mod, "ms": round(ms, 1), "budget_ms": budget, "heavy": heavy, "ok": ok})
+        print(f"{'ok  ' if ok else 'FAIL'} {mod:<28} {ms:8.1f} ms  (budget {budget:.0f})"
+              + (f"  heavy: {', '.join(heavy)}" if heavy else ""))
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json).write_text(json.dumps({"python": sys.version.split()[0], "results": results}, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
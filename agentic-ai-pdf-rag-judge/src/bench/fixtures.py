@@ -0,0 +1,183 @@
+# src/bench/fixtures.py
+"""
+Offline fixtures for benchmarks: a hashing query encoder, synthetic indexes
+in the same on-disk layout as scripts/00_ingest_pdfs.py, and a stub for the
+Langfuse v2 trace surface the scripts use.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.pipeline.chunker import CHUNK_META_DTYPE
+from src.pipeline.lexical import build_bm25, save_bm25, tokenize
+from src.pipeline.shards import SHARD_MANIFEST, write_shards
+
+BENCH_ENCODER = "bench/hash-encoder"
+# Synthetic provenance for metadata filters: chunks are laid out as PDFs of
+# SYNTH_PDF_CHUNKS chunks, SYNTH_PAGE_CHUNKS per page, ingested one day apart.
+SYNTH_PDF_CHUNKS = 500
+SYNTH_PAGE_CHUNKS = 10
+SYNTH_INGEST_EPOCH = 1735689600  # 2025-01-01T00:00Z
+
+
+@lru_cache(maxsize=65536)
+def _word_vector(word: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+class HashEncoder:
+    """Bag-of-words random projection; same vectors at ingest and query time."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = True, **_: Any) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, t in enumerate(texts):
+            for w in tokenize(t):
+                out[i] += _word_vector(w, self.dim)
+        if normalize_embeddings:
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out
+
+
+def _vocab(size: int) -> List[str]:
+    # pronounceable pseudo-words, stable across runs
+    cons, vow = "bcdfghklmnprstvz", "aeiou"
+    out = []
+    for i in range(size):
+        n, w = i, ""
+        for _ in range(3):
+            w += cons[n % len(cons)] + vow[(n // len(cons)) % len(vow)]
+            n //= len(cons) * len(vow)
+        out.append(w + str(i % 7))
+    return out
+
+
+def build_synthetic_index(out_dir: Path,
+                          count: int,
+                          dim: int = 384,
+                          words_per_chunk: int = 80,
+                          vocab_size: int = 20000,
+                          seed: int = 0,
+                          shards: int = 1) -> Path:
+    """
+    Write `count` Zipf-distributed pseudo-text chunks, their HashEncoder
+    embeddings (optionally in `shards` shards), synthetic chunks.npy
+    provenance and a BM25 index. Reuses an existing dir built with the same
+    parameters.
+    """
+    out = Path(out_dir)
+    params = {"count": count, "dim": dim, "words_per_chunk": words_per_chunk,
+              "vocab_size": vocab_size, "seed": seed, "shards": shards}
+    meta_path = out / "meta.json"
+    if meta_path.exists():
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("synthetic") == params and (out / "chunks.npy").exists():
+            return out
+    out.mkdir(parents=True, exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    vocab = _vocab(vocab_size)
+    word_vecs = np.stack([_word_vector(w, dim) for w in vocab])
+    ranks = np.arange(1, vocab_size + 1, dtype=np.float64)
+    probs = (1.0 / ranks) / (1.0 / ranks).sum()
+
+    texts: List[str] = []
+    embs = np.empty((count, dim), dtype=np.float32)
+    step = 4096
+    for lo in range(0, count, step):
+        hi = min(lo + step, count)
+        ids = rng.choice(vocab_size, size=(hi - lo, words_per_chunk), p=probs)
+        texts.extend(" ".join(vocab[j] for j in row) for row in ids)
+        block = word_vecs[ids].sum(axis=1)
+        block /= np.maximum(np.linalg.norm(block, axis=1, keepdims=True), 1e-12)
+        embs[lo:hi] = block
+
+    if shards > 1:
+        write_shards(out, embs, shards)
+        (out / "embeddings.npy").unlink(missing_ok=True)
+    else:
+        (out / SHARD_MANIFEST).unlink(missing_ok=True)
+        embs.tofile(out / "embeddings.npy")
+    (out / "texts.json").write_text(json.dumps(texts), encoding="utf-8")
+    rows = np.arange(count)
+    chunks = np.zeros(count, dtype=CHUNK_META_DTYPE)
+    chunks["pdf"] = rows // SYNTH_PDF_CHUNKS
+    chunks["page"] = (rows % SYNTH_PDF_CHUNKS) // SYNTH_PAGE_CHUNKS + 1
+    chunks["end"] = [len(t) for t in texts]
+    chunks["ingested"] = SYNTH_INGEST_EPOCH + chunks["pdf"] * 86400
+    np.save(out / "chunks.npy", chunks)
+    n_pdfs = int(chunks["pdf"][-1]) + 1 if count else 0
+    save_bm25(out, build_bm25(texts))
+    meta_path.write_text(json.dumps({
+        "count": count, "dim": dim, "embed_model": BENCH_ENCODER,
+        "pdfs": [f"synthetic-{i:04d}.pdf" for i in range(n_pdfs)],
+        "chunker": "synthetic", "synthetic": params, "shards": shards,
+    }), encoding="utf-8")
+    return out
+
+
+def sample_queries(index_dir: Path, n: int, words: int = 6, seed: int = 1) -> List[str]:
+    """Queries made from word runs of random chunks, so most have real hits."""
+    texts = json.loads((Path(index_dir) / "texts.json").read_text(encoding="utf-8"))
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        toks = texts[rng.randrange(len(texts))].split()
+        start = rng.randrange(max(1, len(toks) - words))
+        out.append(" ".join(toks[start:start + words]))
+    return out
+
+
+# ---- Langfuse v2 stand-in ----------------------------------------------------
+class _StubObservation:
+    def __init__(self, sink: List[str], kind: str, **kwargs: Any):
+        self._sink = sink
+        self._record(kind, kwargs)
+
+    def _record(self, kind: str, payload: Dict[str, Any]) -> None:
+        # Serialize like the SDK would, so payload-size costs still show up
+        self._sink.append(json.dumps({"kind": kind, "ts": time.time(), **payload}, default=str))
+
+    def update(self, **kwargs: Any) -> None:
+        self._record("update", kwargs)
+
+    def end(self, **kwargs: Any) -> None:
+        self._record("end", kwargs)
+
+
+class StubTrace(_StubObservation):
+    def span(self, **kwargs: Any) -> _StubObservation:
+        return _StubObservation(self._sink, "span", **kwargs)
+
+    def generation(self, **kwargs: Any) -> _StubObservation:
+        return _StubObservation(self._sink, "generation", **kwargs)
+
+
+class StubLangfuse:
+    """Accepts lf.trace(...).span/.generation/.update like scripts 01/02; keeps events in memory."""
+
+    def __init__(self, keep: Optional[int] = 10000):
+        self.events: List[str] = []
+        self.keep = keep
+
+    def trace(self, **kwargs: Any) -> StubTrace:
+        if self.keep is not None and len(self.events) > self.keep:
+            del self.events[: len(self.events) - self.keep]
+        return StubTrace(self.events, "trace", **kwargs)
+
+    def flush(self) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        pass
@@ -0,0 +1,158 @@
+# src/bench/mock_llm.py
+"""
+Local stand-in for the Groq (OpenAI-compatible) chat completions API.
+
+Point the Groq SDK at it with GROQ_BASE_URL=http://127.0.0.1:<port>; the
+generator and JudgeAgent then run unchanged. Each response sleeps for a
+sampled latency and returns a sampled number of completion tokens:
+
+    latency_ms = lognormal(median=latency_ms, sigma=latency_sigma)
+                 + completion_tokens * ms_per_token
+
+Judge prompts (system prompt mentions "evaluation judge") get a valid
+verdict JSON so the judge's parsing path is exercised too.
+
+    python -m src.bench.mock_llm --port 8099 --latency_ms 300 --ms_per_token 2
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+_WORDS = ("the policy states that requests are reviewed within thirty days and "
+          "refunds apply only to eligible items according to the document").split()
+
+
+@dataclass
+class MockLLMConfig:
+    latency_ms: float = 200.0      # median base latency
+    latency_sigma: float = 0.35    # lognormal sigma (0 = fixed)
+    ms_per_token: float = 1.0      # decode cost per completion token
+    tokens_mean: int = 60          # completion tokens, ~N(mean, mean/4), capped by max_tokens
+    error_rate: float = 0.0        # fraction of requests answered with HTTP 500
+    seed: int = 0
+
+
+def _prompt_tokens(messages) -> int:
+    return sum(len(str(m.get("content", ""))) for m in messages) // 4
+
+
+class MockLLM:
+    def __init__(self, cfg: MockLLMConfig):
+        self.cfg = cfg
+        self._rng = random.Random(cfg.seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _sample(self, max_tokens: int):
+        with self._lock:
+            self.calls += 1
+            base = self.cfg.latency_ms * (self._rng.lognormvariate(0.0, self.cfg.latency_sigma)
+                                          if self.cfg.latency_sigma > 0 else 1.0)
+            n = max(1, int(self._rng.gauss(self.cfg.tokens_mean, self.cfg.tokens_mean / 4)))
+            fail = self._rng.random() < self.cfg.error_rate
+        n = min(n, max_tokens)
+        return base + n * self.cfg.ms_per_token, n, fail
+
+    def complete(self, req: Dict[str, Any]):
+        """(status, body). Sleeps for the sampled latency before returning."""
+        messages = req.get("messages") or []
+        delay_ms, n, fail = self._sample(int(req.get("max_tokens") or 256))
+        time.sleep(delay_ms / 1000.0)
+        if fail:
+            return 500, {"error": {"message": "mock upstream error", "type": "server_error"}}
+
+        system = str(messages[0].get("content", "")) if messages else ""
+        if "evaluation judge" in system:
+            content = json.dumps({
+                "scores": {"faithfulness": 0.9, "relevance": 0.85, "precision": 0.8,
+                           "recall": 0.7, "correctness_det": 0.8},
+                "format_issues": {"too_short": 0, "contains_forbidden": 0},
+                "verdict": "PASS",
+                "reasons": ["mock"],
+            })
+        else:
+            content = " ".join(_WORDS[i % len(_WORDS)] for i in range(n))
+        prompt_tokens = _prompt_tokens(messages)
+        return 200, {
+            "id": f"mock-{self.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": req.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+                "logprobs": None,
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": n,
+                      "total_tokens": prompt_tokens + n},
+        }
+
+
+def make_server(cfg: MockLLMConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Threaded server; port=0 picks a free port (see server.server_address)."""
+    llm = MockLLM(cfg)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            n = int(self.headers.get("Content-Length") or 0)
+            req = json.loads(self.rfile.read(n) or b"{}")
+            if not self.path.endswith("/chat/completions"):
+                status, body = 404, {"error": {"message": f"unknown path {self.path}"}}
+            else:
+                status, body = llm.complete(req)
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.llm = llm
+    return server
+
+
+def start_background(cfg: MockLLMConfig) -> ThreadingHTTPServer:
+    server = make_server(cfg)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Mock Groq/OpenAI chat completions server.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--latency_ms", type=float, default=MockLLMConfig.latency_ms)
+    ap.add_argument("--latency_sigma", type=float, default=MockLLMConfig.latency_sigma)
+    ap.add_argument("--ms_per_token", type=float, default=MockLLMConfig.ms_per_token)
+    ap.add_argument("--tokens_mean", type=int, default=MockLLMConfig.tokens_mean)
+    ap.add_argument("--error_rate", type=float, default=MockLLMConfig.error_rate)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    cfg = MockLLMConfig(args.latency_ms, args.latency_sigma, args.ms_per_token,
+                        args.tokens_mean, args.error_rate, args.seed)
+    server = make_server(cfg, args.host, args.port)
+    print(f"[ok] Mock LLM on http://{args.host}:{args.port}  (export GROQ_BASE_URL=http://{args.host}:{args.port})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# src/eval/adaptive.py
+"""
+Adaptive early stopping for eval runs.
+
+Rows are evaluated in random order. After each judged row we update
+confidence intervals on the mean faithfulness / relevance / precision /
+recall and on the PASS rate, where a row passes when every metric meets
+its configs/thresholds.yaml threshold. The run stops once the PASS-rate
+interval lies entirely above or below the target: the regression decision
+is settled and the remaining rows' LLM calls are saved.
+
+Intervals are Wilson (PASS rate) and normal (means), with a finite-
+population correction because rows are drawn without replacement from a
+dataset of known size: at n = N they collapse to the exact values.
+Intervals are re-checked after every row, so the effective error rate is
+above the nominal 1 - confidence. --min_rows and a higher confidence keep
+early looks conservative.
+"""
+from __future__ import annotations
+
+import math
+from pathlib import Path
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple
+
+# thresholds.yaml key -> judge score key
+METRICS = {"faithfulness": "faith", "relevance": "relev", "precision": "prec", "recall": "recall"}
+
+
+def load_thresholds(path: str = "configs/thresholds.yaml") -> Dict[str, float]:
+    import yaml
+    data = yaml.safe_load(Path(path).read_text(encoding="utf-8")) or {}
+    unknown = set(data) - set(METRICS)
+    if unknown:
+        raise ValueError(f"unknown metrics in {path}: {sorted(unknown)}; expected {sorted(METRICS)}")
+    return {k: float(v) for k, v in data.items()}
+
+
+def row_passes(scores: Dict[str, Any], thresholds: Dict[str, float]) -> bool:
+    return all(float(scores.get(METRICS[m], 0) or 0) >= t for m, t in thresholds.items())
+
+
+def _fpc(n: int, population: int) -> float:
+    """Variance factor for sampling n of `population` without replacement."""
+    if population <= 1 or n >= population:
+        return 0.0
+    return (population - n) / (population - 1)
+
+
+def wilson_interval(passes: int, n: int, z: float, population: int) -> Tuple[float, float]:
+    if n == 0:
+        return 0.0, 1.0
+    p = passes / n
+    f = _fpc(n, population)
+    if f == 0.0:
+        return p, p
+    n_eff = n / f
+    denom = 1 + z * z / n_eff
+    centre = (p + z * z / (2 * n_eff)) / denom
+    half = z * math.sqrt(p * (1 - p) / n_eff + z * z / (4 * n_eff * n_eff)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def mean_interval(values: List[float], z: float, population: int) -> Tuple[float, float, float]:
+    """(mean, low, high)."""
+    n = len(values)
+    if n == 0:
+        return 0.0, 0.0, 1.0
+    mean = sum(values) / n
+    if n == 1:
+        return mean, 0.0, 1.0
+    var = sum((v - mean) ** 2 for v in values) / (n - 1)
+    half = z * math.sqrt(var / n * _fpc(n, population))
+    return mean, max(0.0, mean - half), min(1.0, mean + half)
+
+
+class AdaptiveStopper:
+    def __init__(self,
+                 thresholds: Dict[str, float],
+                 pass_target: float,
+                 population: int,
+                 confidence: float = 0.95,
+                 min_rows: int = 10):
+        self.thresholds = thresholds
+        self.pass_target = pass_target
+        self.population = population
+        self.confidence = confidence
+        self.min_rows = min_rows
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        self.values: Dict[str, List[float]] = {m: [] for m in METRICS}
+        self.passes = 0
+        self.n = 0
+        self.decision: Optional[str] = None
+
+    def add(self, scores: Dict[str, Any]) -> bool:
+        """Record one judged row; True once the decision is settled."""
+        self.n += 1
+        self.passes += row_passes(scores, self.thresholds)
+        for m, key in METRICS.items():
+            self.values[m].append(float(scores.get(key, 0) or 0))
+        if self.n < min(self.min_rows, self.population):
+            return False
+        lo, hi = self.pass_interval()
+        if lo >= self.pass_target:
+            self.decision = "pass"
+        elif hi < self.pass_target:
+            self.decision = "fail"
+        return self.decision is not None
+
+    def pass_interval(self) -> Tuple[float, float]:
+        return wilson_interval(self.passes, self.n, self.z, self.population)
+
+    def final_decision(self) -> str:
+        """Settled decision, else the point estimate vs the target (all rows seen or none)."""
+        if self.decision:
+            return self.decision
+        return "pass" if self.n and self.passes / self.n >= self.pass_target else "fail"
+
+    def summary(self, calls_per_row: int = 2) -> Dict[str, Any]:
+        lo, hi = self.pass_interval()
+        skipped = self.population - self.n
+        means = {}
+        for m, vals in self.values.items():
+            mean, mlo, mhi = mean_interval(vals, self.z, self.population)
+            means[m] = {"mean": round(mean, 4), "ci": [round(mlo, 4), round(mhi, 4)],
+                        "threshold": self.thresholds.get(m)}
+        return {
+            "decision": self.final_decision(),
+            "settled_early": self.decision is not None and skipped > 0,
+            "pass_target": self.pass_target,
+            "confidence": self.confidence,
+            "pass_rate": round(self.passes / self.n, 4) if self.n else None,
+            "pass_rate_ci": [round(lo, 4), round(hi, 4)],
+            "metrics": means,
+            "rows_evaluated": self.n,
+            "rows_total": self.population,
+            "rows_skipped": skipped,
+            # one generation + one judge call per skipped row
+            "llm_calls_saved": skipped * calls_per_row,
+        }
@@ -0,0 +1,140 @@
+# src/eval/dataset.py
+"""
+Streaming evaluation datasets.
+
+Rows are read one at a time, so suites larger than memory can be evaluated:
+
+    *.jsonl    one JSON object per line
+    *.json     a JSON list, or an object with a "rows" list; the list is
+               decoded element by element from a bounded read buffer
+
+shard_rows() keeps every N-th row for worker i of N (by position in the
+file), so shards are disjoint, cover the dataset and need no coordination.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, Tuple
+
+_READ_SIZE = 1 << 16
+_DECODER = json.JSONDecoder()
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """'i/N' -> (i, N) with 0 <= i < N."""
+    try:
+        i, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"shard must look like i/N, got {spec!r}") from None
+    if n < 1 or not 0 <= i < n:
+        raise ValueError(f"shard {spec!r} out of range (need 0 <= i < N)")
+    return i, n
+
+
+def _iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{lineno}: {e}") from None
+
+
+class _Buffer:
+    """Sliding text window over a file, refilled as values are decoded."""
+
+    def __init__(self, f):
+        self.f = f
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(_READ_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace char ('' at EOF), without consuming it."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError(f"expected one of {chars!r} in JSON dataset, got {c!r}")
+        self.pos += 1
+        return c
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                # incomplete value: read more, or fail if there is no more
+                if not self.fill():
+                    raise
+                continue
+            # A number at the buffer's end may continue in the next read
+            if end == len(self.text) and not self.eof and not isinstance(obj, (dict, list, str)):
+                if self.fill():
+                    continue
+            self.pos = end
+            return obj
+
+
+def _iter_json(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        buf = _Buffer(f)
+        if buf.expect("[{") == "{":
+            # {"rows": [...], ...}: skip other keys until "rows"
+            while True:
+                if buf.peek() == "}":
+                    raise ValueError("Dataset must be a JSON list or an object with 'rows'.")
+                key = buf.value()
+                buf.expect(":")
+                if key == "rows":
+                    buf.expect("[")
+                    break
+                buf.value()
+                buf.expect(",}")
+                if buf.text[buf.pos - 1] == "}":
+                    raise ValueError("Dataset must be a JSON list or an object with 'rows'.")
+        if buf.peek() == "]":
+            return
+        while True:
+            yield buf.value()
+            if buf.expect(",]") == "]":
+                return
+
+
+def iter_rows(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(1-based position, row) for every row of a .json or .jsonl dataset."""
+    p = Path(path)
+    rows = _iter_jsonl(p) if p.suffix.lower() in (".jsonl", ".ndjson") else _iter_json(p)
+    for i, row in enumerate(rows, 1):
+        yield i, row
+
+
+def shard_rows(rows: Iterator[Tuple[int, Dict[str, Any]]], shard: int = 0,
+               n_shards: int = 1) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Rows whose 0-based position is congruent to `shard` mod `n_shards`."""
+    for i, row in rows:
+        if (i - 1) % n_shards == shard:
+            yield i, row
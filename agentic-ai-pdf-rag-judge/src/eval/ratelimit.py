@@ -0,0 +1,57 @@
+# src/eval/ratelimit.py
+"""
+Client-side request pacing for eval workers.
+
+Each worker of an N-way sharded run gets rpm / N, so N processes (or
+machines) together stay under the account's requests-per-minute limit
+without talking to each other.
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+
+class RateLimiter:
+    """Token bucket: `rpm` requests per minute, bursts of up to `burst`."""
+
+    def __init__(self, rpm: float, burst: int = 1):
+        self.rate = max(0.0, float(rpm)) / 60.0
+        self.capacity = max(1, int(burst))
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_s = 0.0
+
+    def acquire(self) -> float:
+        """Block until a request may be sent; returns seconds waited (0 when unlimited)."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1.0
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited_s += wait
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def try_acquire(self) -> bool:
+        """Take a token only if one is free now (optional requests such as hedges)."""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+
+def worker_share(rpm: float, n_workers: int) -> float:
+    """Per-worker requests per minute for an N-way split (0 = unlimited)."""
+    return float(rpm) / max(1, n_workers) if rpm else 0.0
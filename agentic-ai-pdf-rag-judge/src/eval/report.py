@@ -0,0 +1,68 @@
+# src/eval/report.py
+"""
+Eval report helpers: the summary table, shard report paths, and merging
+shard reports back into the single-run report format.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+TABLE_HEADERS = ["question", "faith", "relev", "prec", "recall", "verdict"]
+
+
+def table_row(item: Dict[str, Any]) -> List[str]:
+    q, scores = item["question"], item["scores"]
+    return [
+        q[:28] + ("…" if len(q) > 28 else ""),
+        f"{scores.get('faith', 0):.2f}",
+        f"{scores.get('relev', 0):.2f}",
+        f"{scores.get('prec', 0):.2f}",
+        f"{scores.get('recall', 0):.2f}",
+        scores.get("verdict", "FAIL"),
+    ]
+
+
+def print_table(items: Sequence[Dict[str, Any]]) -> None:
+    if not items:
+        print("[warn] No rows evaluated.")
+        return
+    from tabulate import tabulate
+    print(tabulate([table_row(i) for i in items], headers=TABLE_HEADERS, tablefmt="github"))
+
+
+def shard_report_path(report: str, shard: int, n_shards: int) -> Path:
+    """output/report.json -> output/report.shard-1-of-4.json"""
+    p = Path(report)
+    return p.with_name(f"{p.stem}.shard-{shard}-of-{n_shards}{p.suffix}")
+
+
+def write_report(path: str, report: Dict[str, Any]) -> None:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+def _merge_cache_stats(stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    hits = sum(s.get("hits", 0) for s in stats)
+    misses = sum(s.get("misses", 0) for s in stats)
+    return {"hits": hits, "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "per_shard": stats}
+
+
+def merge_reports(paths: Sequence[str]) -> Dict[str, Any]:
+    """
+    One report from shard reports: items ordered by dataset position, counts
+    summed, per-shard trace ids and rate-limit waits kept under "shards".
+    """
+    reports = [json.loads(Path(p).read_text(encoding="utf-8")) for p in paths]
+    items = sorted((i for r in reports for i in r.get("items", [])), key=lambda i: i["idx"])
+    summary: Dict[str, Any] = {"count": len(items)}
+    caches = [r["summary"]["semantic_cache"] for r in reports if r.get("summary", {}).get("semantic_cache")]
+    if caches:
+        summary["semantic_cache"] = _merge_cache_stats(caches)
+    summary["shards"] = [{"path": str(p), "trace_id": r.get("trace_id"),
+                          **{k: v for k, v in r.get("summary", {}).items() if k != "semantic_cache"}}
+                         for p, r in zip(paths, reports)]
+    return {"trace_id": None, "summary": summary, "items": items}
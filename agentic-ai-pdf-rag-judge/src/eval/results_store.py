@@ -0,0 +1,234 @@
+# src/eval/results_store.py
+"""
+Local SQLite store of evaluation runs for cross-run queries.
+
+    runs     one row per run: when, dataset, index version, retrieval mode,
+             top_k, models, row count, plus the report summary as JSON
+    results  one row per (run, dataset row) with typed columns: the four
+             judge scores, PASS, generation/judge latency, usage tokens,
+             serving models, semantic-cache hit, hedge/failover info
+
+Questions are keyed by a hash of their text, so per-question diffs line up
+across runs even when datasets are reordered or sharded. Percentiles are
+computed with numpy over a single fetched column; SQLite has no
+percentile aggregate.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_DB = "data/results.db"
+METRICS = ("faith", "relev", "prec", "recall")
+LATENCIES = {"gen": "gen_ms", "judge": "judge_ms"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id        TEXT PRIMARY KEY,
+    started_at    REAL NOT NULL,
+    report_path   TEXT,
+    dataset       TEXT,
+    index_dir     TEXT,
+    index_version TEXT,
+    retrieval     TEXT,
+    top_k         INTEGER,
+    gen_model     TEXT,
+    judge_model   TEXT,
+    rows          INTEGER NOT NULL,
+    summary       TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id            TEXT NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    idx               INTEGER NOT NULL,
+    qhash             TEXT NOT NULL,
+    question          TEXT NOT NULL,
+    faith             REAL,
+    relev             REAL,
+    prec              REAL,
+    recall            REAL,
+    pass              INTEGER,
+    gen_ms            INTEGER,
+    judge_ms          INTEGER,
+    prompt_tokens     INTEGER,
+    completion_tokens INTEGER,
+    total_tokens      INTEGER,
+    gen_model         TEXT,
+    judge_model       TEXT,
+    cache_hit         INTEGER,
+    hedge_won         INTEGER,
+    failovers         INTEGER,
+    PRIMARY KEY (run_id, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started_at);
+"""
+
+
+def question_hash(question: str) -> str:
+    return hashlib.blake2b(" ".join(question.split()).lower().encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _int(v: Any) -> Optional[int]:
+    return int(v) if isinstance(v, (int, float)) else None
+
+
+def _result_row(run_id: str, item: Dict[str, Any]) -> tuple:
+    scores = item.get("scores") or {}
+    usage = item.get("usage") or {}
+    latency = item.get("latency") or {}
+    request = usage.get("request") or {}
+    cache = (item.get("contexts_used") or {}).get("cache") or {}
+    return (
+        run_id, int(item["idx"]), question_hash(item["question"]), item["question"],
+        *(float(scores.get(m, 0) or 0) for m in METRICS),
+        int(scores.get("verdict", "FAIL") == "PASS"),
+        _int(latency.get("gen_ms")), _int(latency.get("judge_ms")),
+        _int(usage.get("prompt_tokens")), _int(usage.get("completion_tokens")), _int(usage.get("total_tokens")),
+        usage.get("model"), scores.get("_model"),
+        int(bool(cache["hit"])) if "hit" in cache else None,
+        int(bool(request["hedge_won"])) if "hedge_won" in request else None,
+        _int(request.get("failovers")),
+    )
+
+
+class ResultsStore:
+    def __init__(self, path: str = DEFAULT_DB):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    # ---- writes ----
+    def add_run(self, report: Dict[str, Any], run: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Append one report (the 02_online_evaluate.py format). `run` carries
+        run-level columns (dataset, index_dir, index_version, retrieval,
+        top_k, report_path, started_at); models default to the first item's.
+        """
+        run = dict(run or {})
+        items = report.get("items") or []
+        run_id = run.pop("run_id", None) or uuid.uuid4().hex[:12]
+        first = items[0] if items else {}
+        with self.db:
+            self.db.execute(
+                "INSERT INTO runs VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+                (run_id, float(run.get("started_at") or time.time()), run.get("report_path"), run.get("dataset"),
+                 run.get("index_dir"), run.get("index_version"), run.get("retrieval"), _int(run.get("top_k")),
+                 run.get("gen_model") or (first.get("usage") or {}).get("model"),
+                 run.get("judge_model") or (first.get("scores") or {}).get("_model"),
+                 len(items), json.dumps(report.get("summary") or {})))
+            self.db.executemany(f"INSERT INTO results VALUES ({','.join('?' * 19)})",
+                                (_result_row(run_id, i) for i in items))
+        return run_id
+
+    def import_report(self, path: str, run: Optional[Dict[str, Any]] = None) -> str:
+        """Backfill a JSON report written before the store existed (started_at = file mtime)."""
+        p = Path(path)
+        report = json.loads(p.read_text(encoding="utf-8"))
+        run = {"report_path": str(p), "started_at": p.stat().st_mtime, **(run or {})}
+        return self.add_run(report, run)
+
+    def delete_run(self, run_id: str) -> None:
+        with self.db:
+            self.db.execute("DELETE FROM runs WHERE run_id = ?", (self.resolve(run_id),))
+
+    # ---- reads ----
+    def resolve(self, ref: str) -> str:
+        """Run id from an id, an id prefix, 'latest' or 'latest~N' (N runs before latest)."""
+        if ref.startswith("latest"):
+            back = int(ref.split("~", 1)[1]) if "~" in ref else 0
+            row = self.db.execute("SELECT run_id FROM runs ORDER BY started_at DESC LIMIT 1 OFFSET ?",
+                                  (back,)).fetchone()
+        else:
+            rows = self.db.execute("SELECT run_id FROM runs WHERE run_id LIKE ? LIMIT 2", (ref + "%",)).fetchall()
+            if len(rows) > 1:
+                raise ValueError(f"run id prefix {ref!r} is ambiguous")
+            row = rows[0] if rows else None
+        if row is None:
+            raise ValueError(f"no run matches {ref!r}")
+        return row["run_id"]
+
+    def runs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        sql = """SELECT r.run_id, r.started_at, r.dataset, r.index_version, r.retrieval, r.top_k, r.gen_model,
+                        r.rows, AVG(x.pass) AS pass_rate, AVG(x.faith) AS faith, AVG(x.relev) AS relev
+                 FROM (SELECT * FROM runs ORDER BY started_at DESC LIMIT ?) r LEFT JOIN results x USING (run_id)
+                 GROUP BY r.run_id ORDER BY r.started_at DESC"""
+        return [dict(r) for r in self.db.execute(sql, (limit,))]
+
+    def diff(self, run_a: str, run_b: str, metric: str = "faith", min_delta: float = 0.0,
+             limit: int = 50) -> List[Dict[str, Any]]:
+        """Per-question metric change from run_a to run_b, largest regressions first."""
+        if metric not in METRICS + ("pass",):
+            raise ValueError(f"metric must be one of {METRICS + ('pass',)}")
+        a, b = self.resolve(run_a), self.resolve(run_b)
+        # two primary-key range scans joined in a dict: the planner would otherwise
+        # re-scan run_b once per run_a row
+        before = {q: (v, p) for q, v, p in self.db.execute(
+            f"SELECT qhash, {metric}, pass FROM results WHERE run_id = ?", (a,))}
+        out = []
+        for qhash, question, value, passed in self.db.execute(
+                f"SELECT qhash, question, {metric}, pass FROM results WHERE run_id = ?", (b,)):
+            if qhash not in before:
+                continue
+            prev, prev_pass = before[qhash]
+            if abs(value - prev) >= min_delta:
+                out.append({"question": question, "a": prev, "b": value, "delta": round(value - prev, 4),
+                            "a_pass": prev_pass, "b_pass": passed})
+        out.sort(key=lambda r: r["delta"])
+        return out[:limit]
+
+    def latency(self, run_refs: Sequence[str], stage: str = "gen",
+                percentiles: Iterable[float] = (50, 90, 95, 99)) -> List[Dict[str, Any]]:
+        """Latency percentiles (ms) of one stage per run."""
+        col = LATENCIES[stage]
+        out = []
+        for ref in run_refs:
+            run_id = self.resolve(ref)
+            vals = np.array([r[0] for r in self.db.execute(
+                f"SELECT {col} FROM results WHERE run_id = ? AND {col} IS NOT NULL", (run_id,))], dtype=np.float64)
+            row: Dict[str, Any] = {"run_id": run_id, "n": int(vals.size)}
+            for q in percentiles:
+                row[f"p{q:g}"] = round(float(np.percentile(vals, q)), 1) if vals.size else None
+            out.append(row)
+        return out
+
+    def trend(self, metric: str = "faith", last: int = 50, dataset: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Per-run mean metric, PASS rate and p95 generation latency, oldest first."""
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of {METRICS}")
+        where, params = ("WHERE dataset = ?", [dataset]) if dataset else ("", [])
+        runs = self.db.execute(f"SELECT run_id, started_at, index_version, gen_model FROM runs {where} "
+                               f"ORDER BY started_at DESC LIMIT ?", (*params, last)).fetchall()
+        ids = [r["run_id"] for r in runs]
+        if not ids:
+            return []
+        marks = ",".join("?" * len(ids))
+        agg = {r["run_id"]: r for r in self.db.execute(
+            f"SELECT run_id, COUNT(*) AS n, AVG({metric}) AS mean, AVG(pass) AS pass_rate FROM results "
+            f"WHERE run_id IN ({marks}) GROUP BY run_id", ids)}
+        lat: Dict[str, List[float]] = {i: [] for i in ids}
+        for run_id, ms in self.db.execute(
+                f"SELECT run_id, gen_ms FROM results WHERE run_id IN ({marks}) AND gen_ms IS NOT NULL", ids):
+            lat[run_id].append(ms)
+        out = []
+        for r in reversed(runs):
+            a = agg.get(r["run_id"])
+            out.append({"run_id": r["run_id"], "started_at": r["started_at"], "index_version": r["index_version"],
+                        "gen_model": r["gen_model"], "n": a["n"] if a else 0,
+                        metric: round(a["mean"], 4) if a else None,
+                        "pass_rate": round(a["pass_rate"], 4) if a else None,
+                        "gen_p95_ms": round(float(np.percentile(lat[r["run_id"]], 95)), 1)
+                        if lat[r["run_id"]] else None})
+        return out
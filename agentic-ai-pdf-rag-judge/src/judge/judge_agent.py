@@ -7,7 +7,7 @@ from typing import Any, Dict, List, Tuple, Set
 from dotenv import load_dotenv
 load_dotenv()
 
-from groq import Groq
+from src.pipeline.request_policy import get_policy
 
 JUDGE_MODEL = os.getenv("GROQ_CHAT_MODEL", os.getenv("DEFAULT_MODEL", "llama-3.3-70b-versatile"))
 
@@ -42,10 +42,11 @@ Rules:
 - If ground truth is empty, set recall=0.0 but still fill other fields.
 """
 
-def _client() -> Groq:
+def _client() -> "Groq":
     key = os.getenv("GROQ_API_KEY")
     if not key:
         raise RuntimeError("GROQ_API_KEY is not set")
+    from groq import Groq  # deferred so importing the judge stays cheap
     return Groq(api_key=key)
 
 def _make_messages(question: str, contexts: List[str], answer: str, ground_truth: str):
@@ -150,12 +151,11 @@ class JudgeAgent:
 
     def evaluate(self, question: str, contexts: List[str], answer: str, ground_truth: str) -> Dict[str, Any]:
         msgs = _make_messages(question, contexts, answer, ground_truth)
-        resp = self.client.chat.completions.create(
-            model=self.model,
-            messages=msgs,
-            temperature=0.0,
-            max_tokens=256,
-        )
+        def attempt(model: str, timeout_s: float):
+            return self.client.chat.completions.create(model=model, messages=msgs, temperature=0.0,
+                                                       max_tokens=256, timeout=timeout_s)
+        # deadline, p95 hedging and failover along GROQ_MODEL_CHAIN
+        resp, request = get_policy("judge", self.model).call(attempt)
         raw = (resp.choices[0].message.content or "").strip()
         obj = _safe_load_json(raw)
 
@@ -168,8 +168,9 @@ class JudgeAgent:
             "recall": flat["recall"],
             "verdict": structured.get("verdict", "FAIL"),
             "_raw": structured,     # structured object for Langfuse
-            "_model": self.model,
+            "_model": request["model"],
             "_provider": "groq",
+            "_request": request,
         }
 
     # alias used elsewhere
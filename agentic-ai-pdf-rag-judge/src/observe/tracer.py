@@ -2,10 +2,13 @@
 import os, time
 from typing import Any, Dict, Optional
 
-try:
-    from langfuse import Langfuse
-except Exception:
-    Langfuse = None  # type: ignore
+def _langfuse_cls():
+    # Imported on first tracer construction, not at module import
+    try:
+        from langfuse import Langfuse
+    except Exception:
+        return None
+    return Langfuse
 
 def _mk_client():
     pk = os.getenv("LANGFUSE_PUBLIC_KEY")
@@ -14,6 +17,7 @@ def _mk_client():
     if not (pk and sk and host):
         print("[tracer] Missing LANGFUSE_* envs; pk/sk/host required")
         return None, None
+    Langfuse = _langfuse_cls()
     if Langfuse is None:
         print("[tracer] langfuse SDK not importable")
         return None, None
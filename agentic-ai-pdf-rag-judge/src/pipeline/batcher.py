@@ -0,0 +1,116 @@
+# src/pipeline/batcher.py
+"""
+Dynamic micro-batching for query encoding.
+
+Concurrent retrieve() calls each submit one query; a single worker thread
+drains the queue into batches of at most `max_batch` texts, waiting at most
+`max_wait_us` after the first queued request, and runs one encode() per batch.
+Under load the encoder sees batches (better SIMD/BLAS use); when idle a lone
+request waits at most max_wait_us.
+"""
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+class MicroBatchEncoder:
+    def __init__(self, model, max_batch: int = 32, max_wait_us: int = 2000):
+        self.model = model
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0, int(max_wait_us)) / 1e6
+        self.max_seq_length = getattr(model, "max_seq_length", None)
+        self.tokenizer = getattr(model, "tokenizer", None)
+        self._q: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._encode_s = 0.0
+        self._max_depth = 0
+        self._hist: Dict[int, int] = {}
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="encode-batcher", daemon=True)
+        self._worker.start()
+
+    # ---- client side ----
+    def submit(self, text: str) -> Future:
+        """Future resolving to the normalized embedding (1-D float32) of `text`."""
+        if self._closed:
+            raise RuntimeError("MicroBatchEncoder is closed")
+        fut: Future = Future()
+        self._q.put((text, fut))
+        depth = self._q.qsize()
+        with self._lock:
+            self._requests += 1
+            self._max_depth = max(self._max_depth, depth)
+        return fut
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = True, **_) -> np.ndarray:
+        """Drop-in for model.encode(); each text joins whatever batch is forming."""
+        futs = [self.submit(t) for t in ([texts] if isinstance(texts, str) else texts)]
+        return np.stack([f.result() for f in futs])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hist = dict(sorted(self._hist.items()))
+            batches = self._batches
+            return {
+                "requests": self._requests,
+                "batches": batches,
+                "mean_batch": round(sum(k * v for k, v in hist.items()) / batches, 2) if batches else 0.0,
+                "batch_size_hist": hist,
+                "queue_depth": self._q.qsize(),
+                "max_queue_depth": self._max_depth,
+                "mean_encode_ms": round(self._encode_s / batches * 1000, 3) if batches else 0.0,
+                "max_batch": self.max_batch,
+                "max_wait_us": int(self.max_wait * 1e6),
+            }
+
+    def close(self) -> None:
+        self._closed = True
+        self._q.put(None)  # type: ignore[arg-type]
+        self._worker.join(timeout=5)
+
+    # ---- worker ----
+    def _gather(self, first) -> List[Tuple[str, Future]]:
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._q.get(timeout=remaining) if remaining > 0 else self._q.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._q.put(None)   # let _run see the close after this batch
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._q.get()
+            if first is None:
+                return
+            batch = self._gather(first)
+            texts = [t for t, _ in batch]
+            t0 = time.perf_counter()
+            try:
+                vecs = np.asarray(self.model.encode(texts, normalize_embeddings=True, batch_size=len(texts)),
+                                  dtype=np.float32)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - t0
+            for i, (_, fut) in enumerate(batch):
+                fut.set_result(vecs[i])
+            with self._lock:
+                self._batches += 1
+                self._encode_s += elapsed
+                self._hist[len(batch)] = self._hist.get(len(batch), 0) + 1
@@ -0,0 +1,124 @@
+# src/pipeline/chunker.py
+from __future__ import annotations
+
+import re
+from typing import Callable, Iterable, List, Tuple
+
+import numpy as np
+
+# Per-chunk provenance, one row per chunk (20 bytes): which PDF (index into
+# meta["pdfs"]), which 1-based page, the char span inside that page's text,
+# and when the PDF was ingested (epoch seconds; used by metadata filters).
+CHUNK_META_DTYPE = np.dtype([("pdf", "<u4"), ("page", "<u4"), ("start", "<u4"), ("end", "<u4"),
+                             ("ingested", "<u4")])
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[A-Z0-9\"'(\[])|\n\s*\n")
+
+Span = Tuple[int, int]
+
+
+def split_sentences(text: str) -> List[Span]:
+    """Return (start, end) char spans of sentences, whitespace-trimmed."""
+    spans: List[Span] = []
+    start = 0
+    for m in _SENTENCE_END.finditer(text):
+        spans.append((start, m.start()))
+        start = m.end()
+    spans.append((start, len(text)))
+    out = []
+    for s, e in spans:
+        while s < e and text[s].isspace():
+            s += 1
+        while e > s and text[e - 1].isspace():
+            e -= 1
+        if e > s:
+            out.append((s, e))
+    return out
+
+
+def _split_long(text: str, span: Span, count_tokens: Callable[[str], int], max_tokens: int) -> List[Span]:
+    """Break a sentence that alone exceeds max_tokens at word boundaries."""
+    words = [(m.start() + span[0], m.end() + span[0]) for m in re.finditer(r"\S+", text[span[0]:span[1]])]
+    pieces: List[Span] = []
+    i = 0
+    while i < len(words):
+        # Largest j with words[i:j] within budget (binary search on token count).
+        lo, hi = i + 1, len(words)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if count_tokens(text[words[i][0]:words[mid - 1][1]]) <= max_tokens:
+                lo = mid
+            else:
+                hi = mid - 1
+        pieces.append((words[i][0], words[lo - 1][1]))
+        i = lo
+    return pieces
+
+
+def chunk_by_tokens(text: str,
+                    count_tokens: Callable[[str], int],
+                    max_tokens: int,
+                    overlap_tokens: int = 0) -> Iterable[Tuple[str, int, int]]:
+    """
+    Pack whole sentences into chunks of at most `max_tokens` tokens as counted
+    by the embedding model's tokenizer. Consecutive chunks share trailing
+    sentences worth up to `overlap_tokens`. Yields (chunk_text, start, end).
+    """
+    if not text or not text.strip():
+        return
+    units: List[Tuple[Span, int]] = []
+    for span in split_sentences(text):
+        n = count_tokens(text[span[0]:span[1]])
+        if n > max_tokens:
+            for piece in _split_long(text, span, count_tokens, max_tokens):
+                units.append((piece, count_tokens(text[piece[0]:piece[1]])))
+        else:
+            units.append((span, n))
+
+    i = 0
+    while i < len(units):
+        j, used = i, 0
+        # Separator whitespace can add a token per boundary; count it conservatively.
+        while j < len(units) and used + units[j][1] + (1 if j > i else 0) <= max_tokens:
+            used += units[j][1] + (1 if j > i else 0)
+            j += 1
+        j = max(j, i + 1)
+        start, end = units[i][0][0], units[j - 1][0][1]
+        yield text[start:end], start, end
+        if j >= len(units):
+            break
+        # Step back over trailing sentences for overlap, but always make progress.
+        k, carried = j, 0
+        while k - 1 > i and carried + units[k - 1][1] <= overlap_tokens:
+            carried += units[k - 1][1]
+            k -= 1
+        i = k
+
+
+def chunk_by_chars(text: str, max_chars: int, overlap: int) -> Iterable[Tuple[str, int, int]]:
+    """Legacy fixed character windows; yields (chunk_text, start, end)."""
+    if not text:
+        return
+    start = 0
+    n = len(text)
+    if max_chars <= 0:
+        max_chars = 800
+    if overlap < 0:
+        overlap = 0
+    while start < n:
+        end = min(start + max_chars, n)
+        piece = text[start:end]
+        lead = len(piece) - len(piece.lstrip())
+        stripped = piece.strip()
+        if stripped:
+            yield stripped, start + lead, start + lead + len(stripped)
+        if end >= n:
+            break
+        start = max(0, end - overlap)
+
+
+def tokenizer_counter(tokenizer) -> Callable[[str], int]:
+    """Token counter for a Hugging Face tokenizer, excluding special tokens."""
+    def count(s: str) -> int:
+        return len(tokenizer.encode(s, add_special_tokens=False))
+    return count
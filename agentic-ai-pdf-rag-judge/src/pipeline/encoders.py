@@ -0,0 +1,199 @@
+# src/pipeline/encoders.py
+"""
+Embedding backends for ingest and query encoding.
+
+  torch      sentence-transformers on PyTorch (reference)
+  onnx       the same transformer exported to ONNX, run with onnxruntime
+  onnx-int8  ONNX with dynamic int8 weight quantization (fastest on CPU)
+
+ONNX backends export the configured model once into ONNX_CACHE_DIR
+(default data/onnx/<model>) and afterwards need only onnxruntime and
+tokenizers at query time; torch is imported for export and parity checks.
+All encoders share .encode(texts, normalize_embeddings=True, batch_size=...),
+.max_seq_length and .tokenizer (for the token-aware chunker).
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+ENCODER_BACKENDS = ("torch", "onnx", "onnx-int8")
+_CONFIG = "encoder_config.json"
+
+
+def encoder_key(model_name: str, backend: str = "torch") -> str:
+    """Cache key for a (model, backend) pair; plain model name for torch."""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def _cache_dir(model_name: str, backend: str) -> Path:
+    root = Path(os.getenv("ONNX_CACHE_DIR", "data/onnx"))
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name)
+    return root / (slug + ("-int8" if backend == "onnx-int8" else ""))
+
+
+class _CountingTokenizer:
+    """encode(text, add_special_tokens=False) over a `tokenizers.Tokenizer`, as the chunker expects."""
+
+    def __init__(self, tok):
+        self._tok = tok
+
+    def encode(self, text: str, add_special_tokens: bool = True) -> List[int]:
+        return self._tok.encode(text, add_special_tokens=add_special_tokens).ids
+
+
+def _pooling_mode(module) -> str:
+    cfg = module.get_config_dict()
+    if isinstance(cfg.get("pooling_mode"), str):       # sentence-transformers >= 5
+        return cfg["pooling_mode"]
+    for mode in ("cls", "max", "mean"):                 # older: one flag per mode
+        if cfg.get(f"pooling_mode_{mode}_token") or cfg.get(f"pooling_mode_{mode}_tokens"):
+            return mode
+    return "mean"
+
+
+def export_onnx(model_name: str, out_dir: Path, quantize: bool = False, st_model=None) -> Path:
+    """
+    Export the sentence-transformers model's transformer to out_dir/model.onnx
+    (plus model.int8.onnx when quantize), its tokenizer, and the pooling config.
+    """
+    import torch
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    if st_model is None:
+        from sentence_transformers import SentenceTransformer
+        st_model = SentenceTransformer(model_name, device="cpu")
+
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in tokenizer.model_input_names]
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    args = tuple(sample[n] for n in input_names)
+    axes = {n: {0: "batch", 1: "seq"} for n in input_names}
+    axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+
+    class _Wrapped(torch.nn.Module):
+        # Positional order of HF forward() differs across versions; bind by name.
+        def __init__(self):
+            super().__init__()
+            self.inner = transformer
+
+        def forward(self, *inputs):
+            return self.inner(**dict(zip(input_names, inputs)), return_dict=True).last_hidden_state
+
+    fp32 = out / "model.onnx"
+    with torch.no_grad():
+        torch.onnx.export(_Wrapped().eval(), args, str(fp32), input_names=input_names,
+                          output_names=["last_hidden_state"], dynamic_axes=axes,
+                          opset_version=14, do_constant_folding=True, dynamo=False)
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(str(fp32), str(out / "model.int8.onnx"), weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(str(out))
+    pooling = _pooling_mode(st_model[1]) if len(st_model) > 1 else "mean"
+    config = {
+        "source_model": model_name,
+        "pooling": pooling,
+        "max_seq_length": int(st_model.max_seq_length),
+        "input_names": input_names,
+        "normalize": any(type(m).__name__ == "Normalize" for m in st_model),
+    }
+    (out / _CONFIG).write_text(json.dumps(config, indent=2), encoding="utf-8")
+    return out
+
+
+class OnnxEncoder:
+    def __init__(self, model_dir: Path, quantized: bool = False, threads: Optional[int] = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        d = Path(model_dir)
+        self.config: Dict = json.loads((d / _CONFIG).read_text(encoding="utf-8"))
+        self.max_seq_length = int(self.config["max_seq_length"])
+        self.quantized = quantized
+        tok = Tokenizer.from_file(str(d / "tokenizer.json"))
+        tok.no_padding()
+        tok.no_truncation()
+        self.tokenizer = _CountingTokenizer(tok)
+        self._batch_tok = Tokenizer.from_file(str(d / "tokenizer.json"))
+        self._batch_tok.enable_truncation(self.max_seq_length)
+        self._batch_tok.enable_padding()
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads or os.getenv("ONNX_THREADS"):
+            opts.intra_op_num_threads = int(threads or os.getenv("ONNX_THREADS"))
+        path = d / ("model.int8.onnx" if quantized else "model.onnx")
+        self.session = ort.InferenceSession(str(path), opts, providers=["CPUExecutionProvider"])
+        self.input_names = self.config["input_names"]
+
+    def _pool(self, hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        mode = self.config["pooling"]
+        if mode == "cls":
+            return hidden[:, 0]
+        m = mask[..., None].astype(np.float32)
+        if mode == "max":
+            return np.where(m > 0, hidden, -1e9).max(axis=1)
+        return (hidden * m).sum(axis=1) / np.maximum(m.sum(axis=1), 1e-9)
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = True, batch_size: int = 32, **_) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        out = []
+        # Sort by length so padding per batch stays small, then restore order.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for lo in range(0, len(order), batch_size):
+            idx = order[lo:lo + batch_size]
+            enc = self._batch_tok.encode_batch([texts[i] for i in idx])
+            ids = np.array([e.ids for e in enc], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in enc], dtype=np.int64)
+            feeds = {"input_ids": ids, "attention_mask": mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in enc], dtype=np.int64)
+            hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+            out.append(self._pool(hidden, mask).astype(np.float32))
+        embs = np.empty((len(texts), out[0].shape[1] if out else 0), dtype=np.float32)
+        if out:
+            embs[order] = np.vstack(out)
+        if normalize_embeddings:
+            embs /= np.maximum(np.linalg.norm(embs, axis=1, keepdims=True), 1e-12)
+        return embs
+
+
+def load_encoder(model_name: str, backend: str = "torch", st_model=None):
+    """Encoder for a backend; ONNX models are exported on first use and cached on disk."""
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"encoder backend must be one of {ENCODER_BACKENDS}")
+    if backend == "torch":
+        if st_model is not None:
+            return st_model
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    quantized = backend == "onnx-int8"
+    d = _cache_dir(model_name, backend)
+    weights = d / ("model.int8.onnx" if quantized else "model.onnx")
+    if not weights.exists():
+        print(f"[encoders] exporting {model_name} to {d} (int8={quantized})", flush=True)
+        export_onnx(model_name, d, quantize=quantized, st_model=st_model)
+    return OnnxEncoder(d, quantized=quantized)
+
+
+def parity_check(reference, candidate, texts: List[str]) -> Dict[str, float]:
+    """Row-wise cosine between two encoders' normalized embeddings of `texts`."""
+    if not texts:
+        return {"n": 0}
+    a = np.asarray(reference.encode(texts, normalize_embeddings=True), dtype=np.float32)
+    b = np.asarray(candidate.encode(texts, normalize_embeddings=True), dtype=np.float32)
+    cos = (a * b).sum(axis=1)
+    return {
+        "n": len(texts),
+        "mean_cos": round(float(cos.mean()), 6),
+        "min_cos": round(float(cos.min()), 6),
+        "p05_cos": round(float(np.percentile(cos, 5)), 6),
+    }
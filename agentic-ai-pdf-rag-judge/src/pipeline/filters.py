@@ -0,0 +1,131 @@
+# src/pipeline/filters.py
+"""
+Metadata pre-filters over chunks.npy.
+
+Filters resolve to a sorted array of candidate row ids before any scoring,
+so dense and BM25 work scale with the selected subset, not the corpus:
+
+    {"pdf": "handbook.pdf" | ["a.pdf", "b.pdf"] | 0,
+     "page": 3 | "3" | [3] | [3, 10],           # inclusive range
+     "ingested_after": "2025-01-31" | epoch_s,
+     "ingested_before": "2025-02-28T12:00" | epoch_s}
+
+Columns are read once per index into contiguous arrays; each predicate is a
+vectorised boolean mask (one bit of selectivity per chunk) and the masks are
+AND-ed together.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+FILTER_KEYS = ("pdf", "page", "ingested_after", "ingested_before")
+
+
+def _epoch(value: Any) -> int:
+    if isinstance(value, (int, float)):
+        return int(value)
+    if str(value).isdigit():
+        return int(value)
+    dt = datetime.fromisoformat(str(value))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+class ChunkColumns:
+    def __init__(self, index_dir: str):
+        idx = Path(index_dir)
+        rows = np.load(idx / "chunks.npy")
+        meta = json.loads((idx / "meta.json").read_text(encoding="utf-8"))
+        self.count = int(rows.shape[0])
+        self.pdf = np.ascontiguousarray(rows["pdf"])
+        self.page = np.ascontiguousarray(rows["page"])
+        names = rows.dtype.names or ()
+        self.ingested = np.ascontiguousarray(rows["ingested"]) if "ingested" in names else None
+        self.pdf_ids = {name: i for i, name in enumerate(meta.get("pdfs", []))}
+        self.n_pdfs = len(self.pdf_ids) or (int(self.pdf.max()) + 1 if self.count else 0)
+
+    def _pdf_ids(self, value: Any) -> np.ndarray:
+        """PDF names or ids (ints or digit strings, as --pdf 0 arrives); unknown ones raise ValueError."""
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        ids = []
+        for v in values:
+            if isinstance(v, str) and v in self.pdf_ids:
+                ids.append(self.pdf_ids[v])
+            elif isinstance(v, int) or (isinstance(v, str) and v.isdigit()):
+                if not 0 <= int(v) < self.n_pdfs:
+                    raise ValueError(f"pdf id {v} out of range; index has {self.n_pdfs} PDF(s)")
+                ids.append(int(v))
+            else:
+                raise ValueError(f"unknown pdf {v!r}; index has {sorted(self.pdf_ids)}")
+        return np.array(ids, dtype=self.pdf.dtype)
+
+    @staticmethod
+    def _page_range(value: Any) -> tuple:
+        """(lo, hi) from a page (int or digit string) or a 1-2 element list; else ValueError."""
+        def page(v: Any) -> int:
+            if isinstance(v, bool) or not (isinstance(v, int) or (isinstance(v, str) and v.strip().isdigit())):
+                raise ValueError(f"page must be an int or digit string, got {v!r}")
+            return int(v)
+        if isinstance(value, (list, tuple)):
+            if len(value) not in (1, 2):
+                raise ValueError(f"page range must have 1 or 2 elements, got {value!r}")
+            lo, hi = page(value[0]), page(value[-1])
+        else:
+            lo = hi = page(value)
+        if lo > hi:
+            raise ValueError(f"page range {value!r} is empty (start > end)")
+        return lo, hi
+
+    def mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        unknown = set(filters) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"unknown filter keys {sorted(unknown)}; expected {FILTER_KEYS}")
+        m = np.ones(self.count, dtype=bool)
+        if filters.get("pdf") is not None:
+            m &= np.isin(self.pdf, self._pdf_ids(filters["pdf"]))
+        if filters.get("page") is not None:
+            lo, hi = self._page_range(filters["page"])
+            m &= (self.page >= lo) & (self.page <= hi)
+        for key, after in (("ingested_after", True), ("ingested_before", False)):
+            if filters.get(key) is None:
+                continue
+            if self.ingested is None:
+                raise ValueError("index has no ingest dates; re-run 00_ingest_pdfs.py to filter on them")
+            ts = _epoch(filters[key])
+            m &= (self.ingested >= ts) if after else (self.ingested < ts)
+        return m
+
+    def resolve(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Sorted candidate row ids, or None when no filter applies."""
+        if not filters or all(v is None for v in filters.values()):
+            return None
+        return np.flatnonzero(self.mask(filters))
+
+
+def add_filter_args(ap: argparse.ArgumentParser) -> None:
+    """--pdf / --pages / --ingested_after / --ingested_before, shared by the CLIs."""
+    ap.add_argument("--pdf", action="append", default=None, help="Only chunks from this PDF (repeatable)")
+    ap.add_argument("--pages", default=None, help="Page or inclusive range, e.g. 3 or 3-10")
+    ap.add_argument("--ingested_after", default=None, help="ISO date/time or epoch seconds")
+    ap.add_argument("--ingested_before", default=None, help="ISO date/time or epoch seconds")
+
+
+def filters_from_args(args: argparse.Namespace) -> Optional[Dict[str, Any]]:
+    """Filter dict from add_filter_args() flags, or None when none were given."""
+    filters: Dict[str, Any] = {}
+    if args.pdf:
+        filters["pdf"] = args.pdf
+    if args.pages:
+        lo, _, hi = args.pages.partition("-")
+        filters["page"] = [int(lo), int(hi or lo)]
+    for key in ("ingested_after", "ingested_before"):
+        if getattr(args, key):
+            filters[key] = getattr(args, key)
+    return filters or None
@@ -2,10 +2,13 @@
 from __future__ import annotations
 
 import os
-from typing import List, Tuple, Dict
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from dotenv import load_dotenv
-from groq import Groq
+
+from src.pipeline.chunker import split_sentences
+from src.pipeline.lexical import tokenize
+from src.pipeline.request_policy import get_policy
 
 # Ensure .env is read whenever this module is imported
 load_dotenv()
@@ -27,10 +30,153 @@ MODEL_NAME = _resolve_model()
 # -----------------------------------------------------------------------------
 
 
+# ---- Context budget -----------------------------------------------------------
+# Token budget for the packed context, per model. CONTEXT_TOKEN_BUDGET overrides.
+# Budgets are in estimated tokens (estimate_tokens: ~4 chars/token), not counts
+# from the model's tokenizer, so they are set well below the context windows.
+_CONTEXT_BUDGETS = {
+    "llama-3.3-70b-versatile": 3000,
+    "llama-3.1-8b-instant": 1500,
+}
+_DEFAULT_CONTEXT_BUDGET = 2000
+_DEFAULT_MAX_TOKENS = 256   # "≤ 3 sentences" answers fit comfortably
+_DEDUPE_CONTAINMENT = 0.8
+_STOP = {
+    "the", "a", "an", "is", "are", "was", "were", "of", "and", "or", "in", "to", "for", "on", "at", "by",
+    "with", "that", "this", "it", "who", "what", "when", "where", "why", "how", "does", "do", "which",
+}
+
+
+def _context_budget(model: str) -> int:
+    env = os.getenv("CONTEXT_TOKEN_BUDGET")
+    if env:
+        return int(env)
+    return _CONTEXT_BUDGETS.get(model, _DEFAULT_CONTEXT_BUDGET)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate LLM token count (~4 chars per token for English text). A
+    heuristic, not the model tokenizer: code, numbers and non-English text
+    can run over it.
+    """
+    return (len(text) + 3) // 4
+
+
+def _norm_sentence(s: str) -> str:
+    return " ".join(tokenize(s))
+
+
+def _truncate_words(text: str, budget_tokens: int) -> str:
+    """Longest prefix of text, cut at a word boundary, within budget_tokens."""
+    limit = max(0, budget_tokens * 4)
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit + 1)
+    return text[:cut if cut > 0 else limit].rstrip()
+
+
+def pack_contexts(question: str,
+                  contexts: Sequence[str],
+                  budget_tokens: int,
+                  scores: Optional[Sequence[float]] = None,
+                  trim: bool = False) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Fit retrieved contexts into a token budget:
+      1. order by retrieval score (best first),
+      2. drop chunks mostly contained in an already kept chunk, and drop
+         sentences already seen (ingest overlap repeats boundary sentences),
+      3. optionally drop sentences sharing no content word with the question
+         (if that leaves nothing at all, the chunks are packed untrimmed),
+      4. add chunks until the budget is spent; the last one is cut at a
+         sentence boundary (a best chunk whose first sentence alone is over
+         budget is cut at a word boundary instead, so context is never empty).
+    Returns (packed_contexts, stats).
+    """
+    items = [c for c in contexts if isinstance(c, str) and c.strip()]
+    if scores is not None and len(scores) == len(contexts):
+        ranked = sorted(
+            ((sc, c) for sc, c in zip(scores, contexts) if isinstance(c, str) and c.strip()),
+            key=lambda x: -x[0],
+        )
+        items = [c for _, c in ranked]
+
+    q_terms = {t for t in tokenize(question) if t not in _STOP}
+    tokens_in = sum(estimate_tokens(c) for c in items)
+    stats = {"contexts_in": len(items), "duplicates_dropped": 0, "sentences_dropped": 0, "sentences_truncated": 0}
+
+    packed: List[str] = []
+    kept_terms: List[set] = []
+    seen_sentences: set = set()
+    used = 0
+    for ctx in items:
+        terms = set(tokenize(ctx))
+        if terms and any(len(terms & k) / min(len(terms), len(k) or 1) >= _DEDUPE_CONTAINMENT for k in kept_terms):
+            stats["duplicates_dropped"] += 1
+            continue
+
+        sentences = []
+        for start, end in split_sentences(ctx):
+            sent = ctx[start:end]
+            key = _norm_sentence(sent)
+            if not key or key in seen_sentences:
+                stats["sentences_dropped"] += 1
+                continue
+            sentences.append((sent, key))
+        if trim and q_terms and sentences:
+            relevant = [(s, k) for s, k in sentences if q_terms & set(k.split())]
+            stats["sentences_dropped"] += len(sentences) - len(relevant)
+            sentences = relevant
+        if not sentences:
+            continue
+
+        remaining = budget_tokens - used
+        chosen = []
+        for sent, key in sentences:
+            cost = estimate_tokens(sent) + 1
+            if cost > remaining:
+                break
+            chosen.append((sent, key))
+            remaining -= cost
+        if not chosen and not packed:
+            sent, key = sentences[0]
+            head = _truncate_words(sent, remaining - 1)
+            if head:
+                packed.append(head)
+                stats["sentences_truncated"] = 1
+                used = budget_tokens
+            break
+        if not chosen:
+            break
+        packed.append(" ".join(sent for sent, _ in chosen))
+        seen_sentences.update(key for _, key in chosen)
+        kept_terms.append(terms)
+        used = budget_tokens - remaining
+        if len(chosen) < len(sentences):
+            break
+
+    if trim and not packed and items:
+        # no sentence shares a word with the question: better untrimmed context than none
+        packed, stats = pack_contexts(question, items, budget_tokens, trim=False)
+        stats["trim_fallback"] = 1
+        return packed, stats
+
+    tokens_out = sum(estimate_tokens(c) for c in packed)
+    stats.update({
+        "contexts_packed": len(packed),
+        "context_tokens_in": tokens_in,
+        "context_tokens_packed": tokens_out,
+        "context_tokens_saved": max(0, tokens_in - tokens_out),
+        "context_token_budget": budget_tokens,
+    })
+    return packed, stats
+
+
 def _build_prompt(question: str, contexts: List[str]) -> str:
     """
     Build a compact, context-constrained prompt.
     The generator must answer ONLY from provided contexts.
+    Contexts are expected to be packed already (see pack_contexts).
     """
     ctx = "\n\n".join(f"- {c}" for c in contexts if isinstance(c, str))
     return (
@@ -42,13 +188,30 @@ def _build_prompt(question: str, contexts: List[str]) -> str:
     )
 
 
-def generate_answer(question: str, contexts: List[str]) -> Tuple[str, Dict]:
+_CLIENTS: Dict[str, "Groq"] = {}
+
+
+def _get_client(api_key: str) -> "Groq":
+    client = _CLIENTS.get(api_key)
+    if client is None:
+        from groq import Groq  # deferred: only needed once we actually call the LLM
+        client = _CLIENTS[api_key] = Groq(api_key=api_key)
+    return client
+
+
+def generate_answer(question: str,
+                    contexts: List[str],
+                    scores: Optional[Sequence[float]] = None,
+                    max_tokens: Optional[int] = None) -> Tuple[str, Dict]:
     """
     Generate an answer from Groq Chat Completions given a question + retrieved contexts.
+    Contexts are packed into the model's context budget first (see pack_contexts);
+    CONTEXT_TRIM=1 also drops sentences with no query overlap.
 
     Returns:
         (answer_text, usage_dict)
-        usage_dict includes: prompt_tokens, completion_tokens, total_tokens, model, provider
+        usage_dict includes: prompt_tokens, completion_tokens, total_tokens, model, provider,
+        and the packing stats (context_tokens_in / _packed / _saved, ...)
     """
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
@@ -56,21 +219,26 @@ def generate_answer(question: str, contexts: List[str]) -> Tuple[str, Dict]:
             "GROQ_API_KEY is not set. Please add it to your .env or environment."
         )
 
-    # Initialize Groq client
-    client = Groq(api_key=api_key)
+    # Reuse one Groq client (and its HTTP connection pool) per API key
+    client = _get_client(api_key)
 
-    # Construct prompt from contexts
-    prompt = _build_prompt(question, contexts)
-
-    # Call Groq
-    resp = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[
-            {"role": "system", "content": "Answer strictly from the provided context."},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.1,
+    # Pack contexts into the token budget, then construct the prompt
+    packed, pack_stats = pack_contexts(
+        question, contexts, _context_budget(MODEL_NAME), scores=scores,
+        trim=os.getenv("CONTEXT_TRIM", "0") == "1",
     )
+    prompt = _build_prompt(question, packed)
+
+    # Call Groq: deadline, p95 hedging and failover along GROQ_MODEL_CHAIN
+    messages = [
+        {"role": "system", "content": "Answer strictly from the provided context."},
+        {"role": "user", "content": prompt},
+    ]
+    max_tokens = max_tokens or int(os.getenv("GEN_MAX_TOKENS", _DEFAULT_MAX_TOKENS))
+    def attempt(model: str, timeout_s: float):
+        return client.chat.completions.create(model=_MODEL_FALLBACKS.get(model, model), messages=messages,
+                                              temperature=0.1, max_tokens=max_tokens, timeout=timeout_s)
+    resp, request = get_policy("generate", MODEL_NAME).call(attempt)
 
     # Extract text & usage
     text = (resp.choices[0].message.content or "").strip()
@@ -78,8 +246,10 @@ def generate_answer(question: str, contexts: List[str]) -> Tuple[str, Dict]:
         "prompt_tokens": getattr(resp.usage, "prompt_tokens", None),
         "completion_tokens": getattr(resp.usage, "completion_tokens", None),
         "total_tokens": getattr(resp.usage, "total_tokens", None),
-        "model": MODEL_NAME,
+        "model": request["model"],
         "provider": "groq",
+        "request": request,
+        **pack_stats,
     }
 
     # Safety net: if the model returned nothing, keep contract stable
@@ -0,0 +1,103 @@
+# src/pipeline/lexical.py
+from __future__ import annotations
+
+import json
+import math
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Keeps codes, versions and identifiers intact: "iso-27001", "4.2", "gdpr_art17".
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[._\-/][a-z0-9]+)*")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def build_bm25(texts: List[str]) -> Dict[str, object]:
+    """
+    Build CSR-style postings: for term t, docs[indptr[t]:indptr[t+1]] are the
+    chunk ids containing t and tf[...] their term frequencies.
+    """
+    per_doc = [Counter(tokenize(t)) for t in texts]
+    vocab = sorted({term for c in per_doc for term in c})
+    term_id = {t: i for i, t in enumerate(vocab)}
+
+    df = np.zeros(len(vocab), dtype=np.int64)
+    for c in per_doc:
+        for term in c:
+            df[term_id[term]] += 1
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(df, out=indptr[1:])
+
+    docs = np.empty(int(indptr[-1]), dtype=np.int32)
+    tf = np.empty(int(indptr[-1]), dtype=np.uint16)
+    cursor = indptr[:-1].copy()
+    for doc_id, c in enumerate(per_doc):
+        for term, n in c.items():
+            t = term_id[term]
+            docs[cursor[t]] = doc_id
+            tf[cursor[t]] = min(n, 65535)
+            cursor[t] += 1
+    doc_len = np.array([sum(c.values()) for c in per_doc], dtype=np.int32)
+    return {"vocab": vocab, "indptr": indptr, "docs": docs, "tf": tf, "doc_len": doc_len}
+
+
+def save_bm25(out_dir: Path, index: Dict[str, object]) -> None:
+    out = Path(out_dir)
+    np.save(out / "bm25_indptr.npy", index["indptr"])
+    np.save(out / "bm25_docs.npy", index["docs"])
+    np.save(out / "bm25_tf.npy", index["tf"])
+    np.save(out / "bm25_doclen.npy", index["doc_len"])
+    (out / "bm25_vocab.json").write_text(json.dumps(index["vocab"], ensure_ascii=False), encoding="utf-8")
+
+
+def has_bm25(index_dir: str) -> bool:
+    return (Path(index_dir) / "bm25_vocab.json").exists()
+
+
+class BM25Index:
+    def __init__(self, index_dir: str, k1: float = BM25_K1, b: float = BM25_B):
+        idx = Path(index_dir)
+        vocab = json.loads((idx / "bm25_vocab.json").read_text(encoding="utf-8"))
+        self.term_id = {t: i for i, t in enumerate(vocab)}
+        self.indptr = np.load(idx / "bm25_indptr.npy", mmap_mode="r")
+        self.docs = np.load(idx / "bm25_docs.npy", mmap_mode="r")
+        self.tf = np.load(idx / "bm25_tf.npy", mmap_mode="r")
+        self.doc_len = np.load(idx / "bm25_doclen.npy").astype(np.float32)
+        self.count = int(self.doc_len.shape[0])
+        self.k1 = k1
+        self.b = b
+        avg = float(self.doc_len.mean()) if self.count else 1.0
+        # Precompute the length-normalisation term of the BM25 denominator.
+        self._norm = (k1 * (1.0 - b + b * self.doc_len / (avg or 1.0))).astype(np.float32)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score for every chunk (zeros where no query term occurs)."""
+        out = np.zeros(self.count, dtype=np.float32)
+        for term in set(tokenize(query)):
+            t = self.term_id.get(term)
+            if t is None:
+                continue
+            lo, hi = int(self.indptr[t]), int(self.indptr[t + 1])
+            docs = np.asarray(self.docs[lo:hi])
+            tf = np.asarray(self.tf[lo:hi], dtype=np.float32)
+            n_t = hi - lo
+            idf = math.log(1.0 + (self.count - n_t + 0.5) / (n_t + 0.5))
+            out[docs] += idf * tf * (self.k1 + 1.0) / (tf + self._norm[docs])
+        return out
+
+    def search(self, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        s = self.scores(query)
+        hits = np.flatnonzero(s > 0)
+        if hits.size > top_k:
+            hits = hits[np.argpartition(-s[hits], top_k - 1)[:top_k]]
+        order = hits[np.argsort(-s[hits], kind="stable")]
+        return order, s[order]
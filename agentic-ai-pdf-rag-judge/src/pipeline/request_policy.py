@@ -0,0 +1,273 @@
+# src/pipeline/request_policy.py
+"""
+Deadlines, hedging and model failover for LLM calls (generator and judge).
+
+A call walks the model chain (GROQ_MODEL_CHAIN, comma-separated; primary
+model first) within one overall deadline (LLM_DEADLINE_S). Each model gets
+an even share of the time that is left. If a request has not returned
+after that model's observed p95 latency (LLM_HEDGE_DELAY_S until
+LLM_HEDGE_MIN_SAMPLES calls have been seen), one duplicate is sent; the
+first success wins. On error or timeout the call fails over to the next
+model.
+
+Every request runs on its own thread rather than a fixed pool, so no time
+is spent queued behind other calls and the deadline only covers upstream
+latency. Losing requests cannot be interrupted inside the HTTP client.
+They are abandoned instead: the caller does not wait for them, their
+results are discarded, and they are bounded by their own timeout. Hedges
+are limited to LLM_HEDGE_BUDGET (fraction of calls) so a slow upstream is
+not flooded.
+Per-model latency percentiles (p50/p95/p99) cover every upstream request,
+including hedge losers and abandoned ones, which are recorded when they
+finish. This way the tail that sets the hedge delay is not hidden by the
+hedges themselves. Caller-observed latency (the whole call, from the first
+request to the winning response) is reported separately. With a limiter
+set (set_limiter), every upstream request takes a token: primaries and
+failovers wait for one, and a hedge is skipped when none is free.
+"""
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+_WINDOW = 512   # latencies kept per model for percentiles
+
+
+class _Latencies:
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=_WINDOW)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank percentile of the recent latencies (seconds)."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+    def percentiles_ms(self) -> Dict[str, Optional[float]]:
+        out = {}
+        for q in (50, 95, 99):
+            v = self.percentile(q)
+            out[f"p{q}_ms"] = round(v * 1000, 1) if v is not None else None
+        return out
+
+
+class _ModelStats(_Latencies):
+    def __init__(self):
+        super().__init__()
+        self.calls = self.errors = self.timeouts = self.hedges = self.hedge_wins = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "errors": self.errors, "timeouts": self.timeouts,
+                "hedges": self.hedges, "hedge_wins": self.hedge_wins, **self.percentiles_ms()}
+
+
+class RequestPolicy:
+    def __init__(self,
+                 models: List[str],
+                 deadline_s: float = 60.0,
+                 hedge: bool = True,
+                 hedge_delay_s: float = 2.0,
+                 hedge_min_samples: int = 20,
+                 hedge_budget: float = 0.2,
+                 limiter=None):
+        if not models:
+            raise ValueError("RequestPolicy needs at least one model")
+        self.models = list(models)
+        self.deadline_s = deadline_s
+        self.hedge = hedge
+        self.hedge_delay_s = hedge_delay_s
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_budget = hedge_budget
+        self.limiter = limiter     # anything with acquire() / try_acquire(), e.g. RateLimiter
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _ModelStats] = {m: _ModelStats() for m in self.models}
+        self._caller = _Latencies()
+        self.calls = self.failovers = self.deadline_exceeded = 0
+        self._hedges = 0
+
+    # ---- bookkeeping ----
+    def _hedge_after(self, model: str) -> Optional[float]:
+        if not self.hedge:
+            return None
+        with self._lock:
+            st = self._stats[model]
+            if len(st.latencies) < self.hedge_min_samples:
+                return self.hedge_delay_s
+            return st.percentile(95)
+
+    def _record(self, model: str, latency_s: Optional[float] = None, error: bool = False,
+                timeout: bool = False) -> None:
+        with self._lock:
+            st = self._stats[model]
+            if latency_s is not None:
+                st.latencies.append(latency_s)
+            st.errors += error
+            st.timeouts += timeout
+
+    def _take_hedge(self, model: str) -> bool:
+        """Reserve one hedge if the budget allows (checked when it is sent, not when planned)."""
+        with self._lock:
+            if self._hedges >= self.hedge_budget * self.calls:
+                return False
+            if self.limiter is not None and not self.limiter.try_acquire():
+                return False
+            self._hedges += 1
+            self._stats[model].hedges += 1
+            return True
+
+    def _spawn(self, fn: Callable[[str, float], Any], model: str, timeout_s: float) -> Future:
+        """
+        One request on its own daemon thread; Future of (result, latency_s).
+        Its latency or error is recorded when it finishes, even if abandoned.
+        """
+        fut: Future = Future()
+        with self._lock:
+            self._stats[model].calls += 1
+
+        def run():
+            fut.set_running_or_notify_cancel()
+            t0 = time.perf_counter()
+            try:
+                result = fn(model, timeout_s)
+            except BaseException as e:
+                self._record(model, error=True)
+                fut.set_exception(e)
+            else:
+                latency = time.perf_counter() - t0
+                self._record(model, latency)
+                fut.set_result((result, latency))
+
+        threading.Thread(target=run, name=f"llm-{model}", daemon=True).start()
+        return fut
+
+    # ---- one model, optionally hedged ----
+    def _attempt(self, fn: Callable[[str, float], Any], model: str, budget_s: float) -> Tuple[Any, bool]:
+        """(result, hedge_won); raises the last error, or TimeoutError when budget_s runs out."""
+        end = time.monotonic() + budget_s
+        futs: List[Future] = [self._spawn(fn, model, budget_s)]
+        hedge_after = self._hedge_after(model)
+        if hedge_after is not None and hedge_after < budget_s:
+            done, _ = wait(futs, timeout=hedge_after)
+            if not done and self._take_hedge(model):
+                futs.append(self._spawn(fn, model, max(0.001, end - time.monotonic())))
+        error: Optional[BaseException] = None
+        pending = set(futs)
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, end - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for f in done:
+                if f.exception() is None:
+                    result, _ = f.result()          # pending requests are abandoned
+                    won = f is not futs[0]
+                    if won:
+                        with self._lock:
+                            self._stats[model].hedge_wins += 1
+                    return result, won
+                error = f.exception()
+        if error is not None and not pending:
+            raise error
+        self._record(model, timeout=True)
+        raise TimeoutError(f"{model}: no response within {budget_s:.1f}s")
+
+    # ---- API ----
+    def call(self, fn: Callable[[str, float], Any], deadline_s: Optional[float] = None) -> Tuple[Any, Dict[str, Any]]:
+        """
+        fn(model, timeout_s) makes one request. Returns (result, info) with the
+        serving model, failovers, whether a hedge won, and the total latency.
+        """
+        with self._lock:
+            self.calls += 1
+        if self.limiter is not None:
+            self.limiter.acquire()      # before the deadline starts: pacing is not upstream latency
+        t0 = time.monotonic()
+        end = t0 + (deadline_s or self.deadline_s)
+        last: Optional[Exception] = None
+        for i, model in enumerate(self.models):
+            left = end - time.monotonic()
+            if left <= 0:
+                break
+            if i and self.limiter is not None:
+                self.limiter.acquire()  # a failover is another upstream request
+                left = end - time.monotonic()
+                if left <= 0:
+                    break
+            try:
+                result, hedge_won = self._attempt(fn, model, left / (len(self.models) - i))
+            except Exception as e:
+                last = e
+                if i + 1 < len(self.models):
+                    with self._lock:
+                        self.failovers += 1
+                continue
+            latency = time.monotonic() - t0
+            with self._lock:
+                self._caller.latencies.append(latency)
+            return result, {"model": model, "failovers": i, "hedge_won": hedge_won,
+                            "latency_ms": int(latency * 1000)}
+        if time.monotonic() < end and last is not None:
+            raise last      # every model failed fast: surface the upstream error
+        with self._lock:
+            self.deadline_exceeded += 1
+        raise TimeoutError(f"LLM call exceeded its {deadline_s or self.deadline_s:.0f}s deadline "
+                           f"on {self.models}") from last
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"calls": self.calls, "failovers": self.failovers, "deadline_exceeded": self.deadline_exceeded,
+                    "caller": self._caller.percentiles_ms(),
+                    "models": {m: st.as_dict() for m, st in self._stats.items()}}
+
+
+def model_chain(primary: str) -> List[str]:
+    """primary first, then GROQ_MODEL_CHAIN entries (deduplicated, in order)."""
+    chain = [primary] + [m.strip() for m in os.getenv("GROQ_MODEL_CHAIN", "").split(",") if m.strip()]
+    return list(dict.fromkeys(chain))
+
+
+_POLICIES: Dict[Tuple[str, Tuple[str, ...]], RequestPolicy] = {}
+_POLICIES_LOCK = threading.Lock()
+_LIMITER = None
+
+
+def set_limiter(limiter) -> None:
+    """Rate-limit every upstream request (hedges and failovers too) of all policies in this process."""
+    global _LIMITER
+    with _POLICIES_LOCK:
+        _LIMITER = limiter
+        for policy in _POLICIES.values():
+            policy.limiter = limiter
+
+
+def get_policy(purpose: str, primary: str) -> RequestPolicy:
+    """Process-wide policy per (purpose, model chain), configured from LLM_* env vars."""
+    chain = tuple(model_chain(primary))
+    with _POLICIES_LOCK:
+        policy = _POLICIES.get((purpose, chain))
+        if policy is None:
+            policy = _POLICIES[(purpose, chain)] = RequestPolicy(
+                list(chain),
+                deadline_s=float(os.getenv("LLM_DEADLINE_S", "60")),
+                hedge=os.getenv("LLM_HEDGE", "1") == "1",
+                hedge_delay_s=float(os.getenv("LLM_HEDGE_DELAY_S", "2.0")),
+                hedge_min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+                hedge_budget=float(os.getenv("LLM_HEDGE_BUDGET", "0.2")),
+                limiter=_LIMITER,
+            )
+        return policy
+
+
+def policy_stats() -> Dict[str, Any]:
+    """{purpose: stats} for every policy used in this process."""
+    with _POLICIES_LOCK:
+        items = list(_POLICIES.items())
+    out: Dict[str, Any] = {}
+    for (purpose, chain), policy in items:
+        out[purpose if purpose not in out else f"{purpose}:{chain[0]}"] = policy.stats()
+    return out
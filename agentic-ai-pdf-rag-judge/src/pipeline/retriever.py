@@ -1,29 +1,329 @@
 # src/pipeline/retriever.py
-import argparse, json, numpy as np
+import argparse, contextlib, json, os, sys, threading, numpy as np
 from pathlib import Path
-from typing import List, Tuple
-from sentence_transformers import SentenceTransformer
+from typing import Dict, List, Optional, Tuple
 
-def _load_index(index_dir: str) -> Tuple[np.ndarray, List[str], dict]:
+# --- ensure project root on sys.path (for `python src/pipeline/retriever.py`) ---
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.pipeline.batcher import MicroBatchEncoder
+from src.pipeline.encoders import encoder_key, load_encoder
+from src.pipeline.filters import ChunkColumns, add_filter_args, filters_from_args
+from src.pipeline.lexical import BM25Index, has_bm25
+from src.pipeline.shards import has_shards, load_matrix, open_dense
+from src.pipeline.versions import resolve_version
+
+RETRIEVAL_MODES = ("dense", "bm25", "hybrid")
+RRF_K = 60
+
+# Process-wide caches so long-lived callers (the RAG service, eval loops) pay
+# for model and index loading once. Index handles are stamped with the live
+# version dir (CURRENT) and its meta.json mtime, so a new ingest is picked up
+# and hot-swapped in; the old handle is closed once its in-flight queries end.
+_CACHE_LOCK = threading.Lock()
+_SWAP = threading.Condition(_CACHE_LOCK)
+_MODELS: Dict[str, "SentenceTransformer"] = {}
+_ENCODE_LOCKS: Dict[str, threading.Lock] = {}
+_INDEXES: Dict[str, "IndexHandle"] = {}
+_LOADING: set = set()
+
+# MICROBATCH_MAX_WAIT_US > 0 routes query encodes through a MicroBatchEncoder
+# (one encode per micro-batch of concurrent queries, at most MICROBATCH_MAX_BATCH).
+_NO_LOCK = contextlib.nullcontext()
+
+def _wrap_encoder(model):
+    """(model_or_batcher, lock): batchers are thread-safe, raw models get a lock."""
+    wait_us = int(os.getenv("MICROBATCH_MAX_WAIT_US", "0"))
+    if wait_us <= 0:
+        return model, threading.Lock()
+    batcher = MicroBatchEncoder(model, int(os.getenv("MICROBATCH_MAX_BATCH", "32")), wait_us)
+    return batcher, _NO_LOCK
+
+def _load_index(index_dir: str) -> Tuple[Optional[np.ndarray], List[str], dict]:
+    """embs is None for sharded indexes; shards are loaded by their searcher."""
     idx = Path(index_dir)
-    embs = np.fromfile(idx / "embeddings.npy", dtype=np.float32)
     meta = json.loads((idx / "meta.json").read_text(encoding="utf-8"))
     texts = json.loads((idx / "texts.json").read_text(encoding="utf-8"))
-    embs = embs.reshape((meta["count"], meta["dim"]))
-    return embs, texts, meta
+    if has_shards(index_dir):
+        return None, texts, meta
+    return load_matrix(idx / "embeddings.npy", meta["count"], meta["dim"]), texts, meta
+
+def _index_stamp(index_dir: str) -> Tuple[str, int]:
+    """(live version dir, its meta.json mtime_ns)."""
+    d = resolve_version(index_dir)
+    return str(d), (d / "meta.json").stat().st_mtime_ns
+
+class IndexHandle:
+    """
+    One loaded index version. Queries hold a reference while they run; a
+    handle replaced by a newer version is closed when the last one returns.
+    """
+
+    def __init__(self, stamp: Tuple[str, int]):
+        self.stamp = stamp
+        self.dir = stamp[0]
+        embs, self.texts, self.meta = _load_index(self.dir)
+        self.bm25 = BM25Index(self.dir) if has_bm25(self.dir) else None
+        self.dense = open_dense(self.dir, embs)
+        self._columns: Optional[ChunkColumns] = None
+        self.refs = 0
+        self.retired = False
+
+    @property
+    def version(self) -> str:
+        """meta.json "version" (written at ingest), else its mtime for older indexes."""
+        return str(self.meta.get("version") or f"mtime-{self.stamp[1]}")
+
+    def sources(self, idxs: List[int]) -> List[Optional[Dict]]:
+        """chunk_sources() for ids returned by a search on this handle."""
+        return chunk_sources(self.dir, idxs)
+
+    def columns(self) -> ChunkColumns:
+        """Metadata filter columns from chunks.npy, loaded on first filtered query."""
+        if self._columns is None:
+            if not (Path(self.dir) / "chunks.npy").exists():
+                raise ValueError("index has no chunk metadata (chunks.npy); re-run 00_ingest_pdfs.py to use filters")
+            self._columns = ChunkColumns(self.dir)
+        return self._columns
+
+    def close(self) -> None:
+        self.dense.close()
+
+def _acquire(index_dir: str) -> IndexHandle:
+    """Referenced handle for the live version; pair with _release()."""
+    key = str(Path(index_dir).resolve())
+    with _SWAP:
+        while True:
+            # read under the lock: a stamp read before another thread installed a
+            # newer handle would look stale and swap the older version back in
+            stamp = _index_stamp(index_dir)
+            h = _INDEXES.get(key)
+            # current, or stale while another thread loads its successor
+            if h is not None and (h.stamp == stamp or key in _LOADING):
+                h.refs += 1
+                return h
+            if key not in _LOADING:
+                break
+            _SWAP.wait()     # cold start: one loader, everyone else waits for it
+        _LOADING.add(key)
+    try:
+        new = IndexHandle(stamp)
+    finally:
+        with _SWAP:
+            _LOADING.discard(key)
+            _SWAP.notify_all()
+    with _SWAP:
+        old = _INDEXES.get(key)
+        _INDEXES[key] = new
+        new.refs += 1
+        drained = False
+        if old is not None:
+            old.retired = True
+            drained = old.refs == 0
+    if drained:
+        old.close()
+    return new
+
+def _release(h: IndexHandle) -> None:
+    with _CACHE_LOCK:
+        h.refs -= 1
+        drained = h.retired and h.refs == 0
+    if drained:
+        h.close()
+
+@contextlib.contextmanager
+def pinned_index(index_dir: str):
+    """
+    The live IndexHandle, kept open for the whole block. Pass it as `handle=`
+    to retrieve()/embed_query() and read h.sources()/h.texts/h.version, so
+    one request sees one version even if CURRENT flips meanwhile.
+    """
+    h = _acquire(index_dir)
+    try:
+        yield h
+    finally:
+        _release(h)
+
+def _cached_index(index_dir: str) -> tuple:
+    """(dense searcher, texts, meta, bm25_or_None) of the live index version."""
+    with pinned_index(index_dir) as h:
+        return h.dense, h.texts, h.meta, h.bm25
 
-def _embed_query(q: str, model_name: str) -> np.ndarray:
-    model = SentenceTransformer(model_name)
-    v = model.encode([q], normalize_embeddings=True).astype(np.float32)
+def _query_backend(meta: dict) -> str:
+    """Encoder backend for queries: ENCODER_BACKEND, else whatever built the index."""
+    return os.getenv("ENCODER_BACKEND") or (meta.get("encoder") or {}).get("backend", "torch")
+
+def _get_model(model_name: str, backend: str = "torch"):
+    key = encoder_key(model_name, backend)
+    with _CACHE_LOCK:
+        model = _MODELS.get(key)
+        if model is None:
+            # loaded on first use: torch dominates CLI startup otherwise
+            model, _ENCODE_LOCKS[key] = _wrap_encoder(load_encoder(model_name, backend))
+            _MODELS[key] = model
+        return model
+
+def register_encoder(model_name: str, model) -> None:
+    """
+    Serve query encodes for `model_name` from `model` (anything with
+    .encode(texts, normalize_embeddings=True)) instead of sentence-transformers.
+    """
+    with _CACHE_LOCK:
+        _MODELS[model_name], _ENCODE_LOCKS[model_name] = _wrap_encoder(model)
+
+def encoder_stats() -> Dict[str, dict]:
+    """Queue depth and batch-size histograms of micro-batched query encoders."""
+    with _CACHE_LOCK:
+        return {k: m.stats() for k, m in _MODELS.items() if isinstance(m, MicroBatchEncoder)}
+
+def warm(index_dir: str, embed_model: str = "sentence-transformers/all-MiniLM-L6-v2") -> dict:
+    """Load the index and its embed model into the process caches."""
+    with pinned_index(index_dir) as h:
+        _get_model(h.meta.get("embed_model", embed_model), _query_backend(h.meta))
+        return {"count": h.dense.count, "dim": h.dense.dim, "bm25": h.bm25 is not None,
+                "searcher": type(h.dense).__name__, "version": h.version}
+
+def chunk_sources(index_dir: str, idxs: List[int]) -> List[Optional[Dict]]:
+    """
+    Provenance for chunk ids: {"pdf", "page", "start", "end"} from chunks.npy.
+    Returns None entries for indexes built before chunk metadata existed.
+    Reads the live version; ids from an earlier search may belong to a
+    replaced one, so prefer IndexHandle.sources() (or pass the version dir).
+    """
+    idx = resolve_version(index_dir)
+    path = idx / "chunks.npy"
+    if not path.exists():
+        return [None for _ in idxs]
+    rows = np.load(path, mmap_mode="r")
+    pdfs = json.loads((idx / "meta.json").read_text(encoding="utf-8")).get("pdfs", [])
+    out = []
+    for i in idxs:
+        if not 0 <= int(i) < rows.shape[0]:
+            raise ValueError(f"chunk id {i} out of range for index {idx} ({rows.shape[0]} chunks)")
+        r = rows[int(i)]
+        pdf_id = int(r["pdf"])
+        out.append({
+            "pdf": pdfs[pdf_id] if pdf_id < len(pdfs) else pdf_id,
+            "page": int(r["page"]),
+            "start": int(r["start"]),
+            "end": int(r["end"]),
+        })
+    return out
+
+def _embed_query(q: str, model_name: str, backend: str = "torch") -> np.ndarray:
+    model = _get_model(model_name, backend)
+    with _ENCODE_LOCKS[encoder_key(model_name, backend)]:
+        v = model.encode([q], normalize_embeddings=True).astype(np.float32)
     return v[0]
 
-def retrieve(query: str, index_dir: str, top_k: int = 3, embed_model: str = "sentence-transformers/all-MiniLM-L6-v2"):
-    embs, texts, meta = _load_index(index_dir)
-    qv = _embed_query(query, meta.get("embed_model", embed_model))
-    sims = (embs @ qv)  # cosine, because vectors are normalized
-    top_idx = np.argsort(-sims)[:top_k]
-    results = [(int(i), float(sims[i]), texts[i]) for i in top_idx]
-    return results
+def embed_query(query: str, index_dir: str, embed_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+                handle: Optional[IndexHandle] = None) -> np.ndarray:
+    """Normalized query vector with the encoder that matches the index."""
+    meta = handle.meta if handle is not None else _cached_index(index_dir)[2]
+    return _embed_query(query, meta.get("embed_model", embed_model), _query_backend(meta))
+
+def index_version(index_dir: str) -> str:
+    """meta.json "version" (written at ingest), else its mtime for older indexes."""
+    with pinned_index(index_dir) as h:
+        return h.version
+
+def index_texts(index_dir: str) -> List[str]:
+    return _cached_index(index_dir)[1]
+
+def _top(scores: np.ndarray, k: int, positive_only: bool = False) -> np.ndarray:
+    cand = np.flatnonzero(scores > 0) if positive_only else np.arange(scores.shape[0])
+    if cand.size > k:
+        cand = cand[np.argpartition(-scores[cand], k - 1)[:k]]
+    return cand[np.argsort(-scores[cand], kind="stable")]
+
+def _fuse(dense: np.ndarray, lexical: np.ndarray, top_k: int, fusion: str, alpha: float) -> List[Tuple[int, float]]:
+    """
+    Fuse dense and BM25 scores over the union of each leg's top candidates.
+    rrf:      sum of 1 / (RRF_K + rank) per leg (scale-free).
+    weighted: alpha * dense + (1 - alpha) * bm25, each min-max normalised.
+    """
+    depth = max(top_k * 5, 20)
+    dense_ids = _top(dense, depth)
+    lex_ids = _top(lexical, depth, positive_only=True)
+    if fusion == "weighted":
+        cand = np.union1d(dense_ids, lex_ids)
+        def norm(x):
+            lo, hi = float(x.min()), float(x.max())
+            return (x - lo) / (hi - lo) if hi > lo else np.zeros_like(x)
+        fused = alpha * norm(dense[cand]) + (1.0 - alpha) * norm(lexical[cand])
+        order = np.argsort(-fused, kind="stable")[:top_k]
+        return [(int(cand[i]), float(fused[i])) for i in order]
+    scores: Dict[int, float] = {}
+    for ids in (dense_ids, lex_ids):
+        for rank, i in enumerate(ids, 1):
+            scores[int(i)] = scores.get(int(i), 0.0) + 1.0 / (RRF_K + rank)
+    return sorted(scores.items(), key=lambda kv: -kv[1])[:top_k]
+
+def retrieve(query: str, index_dir: str, top_k: int = 3, embed_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+             mode: Optional[str] = None, fusion: str = "rrf", alpha: float = 0.5,
+             query_vec: Optional[np.ndarray] = None, filters: Optional[Dict] = None,
+             handle: Optional[IndexHandle] = None):
+    """
+    Returns [(idx, score, text)] for the top_k chunks.
+    mode: dense | bm25 | hybrid (default: RETRIEVAL_MODE env, else hybrid).
+    Indexes without BM25 postings fall back to dense.
+    query_vec: precomputed embed_query() vector, to avoid encoding twice.
+    filters: {"pdf", "page", "ingested_after", "ingested_before"} (see filters.py);
+             resolved to candidate rows first, and only those rows are scored.
+    handle: search this pinned_index() handle instead of the live version.
+    """
+    mode = mode or os.getenv("RETRIEVAL_MODE", "hybrid")
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"mode must be one of {RETRIEVAL_MODES}")
+
+    if handle is not None:
+        return _search(handle, query, top_k, embed_model, mode, fusion, alpha, query_vec, filters)
+    with pinned_index(index_dir) as h:
+        return _search(h, query, top_k, embed_model, mode, fusion, alpha, query_vec, filters)
+
+def retrieve_with_sources(query: str, index_dir: str, top_k: int = 3,
+                          embed_model: str = "sentence-transformers/all-MiniLM-L6-v2", mode: Optional[str] = None,
+                          filters: Optional[Dict] = None, **kw) -> Tuple[list, List[Optional[Dict]]]:
+    """(retrieve() results, chunk_sources() of their ids), both from one pinned version."""
+    with pinned_index(index_dir) as h:
+        results = retrieve(query, index_dir, top_k=top_k, embed_model=embed_model, mode=mode, filters=filters,
+                           handle=h, **kw)
+        return results, h.sources([r[0] for r in results])
+
+def _search(h: IndexHandle, query: str, top_k: int, embed_model: str, mode: str, fusion: str, alpha: float,
+            query_vec: Optional[np.ndarray], filters: Optional[Dict]):
+    dense, texts, meta, bm25 = h.dense, h.texts, h.meta, h.bm25
+    rows = h.columns().resolve(filters) if filters else None
+    if rows is not None and rows.size == 0:
+        return []
+    if bm25 is None:
+        mode = "dense"
+    if mode == "bm25":
+        if rows is None:
+            ids, scores = bm25.search(query, top_k)
+        else:
+            sub = bm25.scores(query)[rows]
+            local = _top(sub, top_k, positive_only=True)
+            ids, scores = rows[local], sub[local]
+        return [(int(i), float(sc), texts[i]) for i, sc in zip(ids, scores)]
+
+    qv = query_vec if query_vec is not None else _embed_query(query, meta.get("embed_model", embed_model),
+                                                              _query_backend(meta))
+    if mode == "dense":
+        # cosine, because vectors are normalized; per-shard top-k, heap-merged
+        ids, sims = dense.topk(qv, top_k, rows)
+        return [(int(i), float(s), texts[i]) for i, s in zip(ids, sims)]
+
+    sims = dense.scores(qv, rows)
+    lexical = bm25.scores(query)
+    if rows is not None:
+        # fuse over the subset, then map local positions back to chunk ids
+        fused = _fuse(sims, lexical[rows], top_k, fusion, alpha)
+        return [(int(rows[i]), sc, texts[rows[i]]) for i, sc in fused]
+    fused = _fuse(sims, lexical, top_k, fusion, alpha)
+    return [(i, sc, texts[i]) for i, sc in fused]
 
 def main():
     ap = argparse.ArgumentParser()
@@ -31,12 +331,17 @@ def main():
     ap.add_argument("--index_dir", default="data/index")
     ap.add_argument("--k", type=int, default=3)
     ap.add_argument("--embed_model", default="sentence-transformers/all-MiniLM-L6-v2")
+    ap.add_argument("--mode", choices=RETRIEVAL_MODES, default=os.getenv("RETRIEVAL_MODE", "hybrid"))
+    ap.add_argument("--fusion", choices=["rrf", "weighted"], default="rrf")
+    add_filter_args(ap)
     args = ap.parse_args()
 
-    results = retrieve(args.query, args.index_dir, top_k=args.k, embed_model=args.embed_model)
+    results, sources = retrieve_with_sources(args.query, args.index_dir, top_k=args.k, embed_model=args.embed_model,
+                                             mode=args.mode, fusion=args.fusion, filters=filters_from_args(args))
     print("\n[Top-K retrieved passages]\n")
-    for rank, (i, score, txt) in enumerate(results, 1):
-        print(f"[{rank}] score={score:.4f}  idx={i}\n{txt[:400]}\n")
+    for rank, ((i, score, txt), src) in enumerate(zip(results, sources), 1):
+        where = f"  {src['pdf']} p.{src['page']}" if src else ""
+        print(f"[{rank}] score={score:.4f}  idx={i}{where}\n{txt[:400]}\n")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,205 @@
+# src/pipeline/semantic_cache.py
+"""
+Semantic query cache in front of retrieval + generation.
+
+Entries map a normalized query embedding to (retrieved idx/scores, answer,
+usage). A lookup hits when cosine >= threshold and the entry's key (index
+version, retrieval mode, top_k, metadata filters) matches, so paraphrased repeats skip both
+the index scan and the Groq call. Eviction is LRU with a TTL.
+
+Lookup is brute force over the live entries while the cache is small and
+switches to random-hyperplane LSH (a few tables of sign bits) beyond
+`brute_limit`; candidates are always re-scored exactly.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class SemanticCache:
+    def __init__(self,
+                 dim: int,
+                 threshold: float = 0.95,
+                 max_entries: int = 1024,
+                 ttl_s: float = 3600.0,
+                 n_tables: int = 4,
+                 n_bits: int = 10,
+                 brute_limit: int = 256,
+                 seed: int = 0):
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.brute_limit = brute_limit
+        self._vecs = np.zeros((max_entries, dim), dtype=np.float32)
+        self._free = list(range(max_entries - 1, -1, -1))
+        # slot -> (key, created, payload); order = LRU (oldest first)
+        self._entries: "OrderedDict[int, Tuple[str, float, Dict[str, Any]]]" = OrderedDict()
+        self._planes = np.random.default_rng(seed).standard_normal((n_tables, n_bits, dim)).astype(np.float32)
+        self._weights = (1 << np.arange(n_bits)).astype(np.int64)
+        self._tables: List[Dict[int, set]] = [{} for _ in range(n_tables)]
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expired = 0
+
+    # ---- LSH ----
+    def _codes(self, v: np.ndarray) -> List[int]:
+        bits = (self._planes @ v) > 0                       # (tables, bits)
+        return [int(c) for c in bits.astype(np.int64) @ self._weights]
+
+    def _index(self, slot: int, v: np.ndarray) -> None:
+        for table, code in zip(self._tables, self._codes(v)):
+            table.setdefault(code, set()).add(slot)
+
+    def _unindex(self, slot: int) -> None:
+        for table, code in zip(self._tables, self._codes(self._vecs[slot])):
+            bucket = table.get(code)
+            if bucket is not None:
+                bucket.discard(slot)
+                if not bucket:
+                    del table[code]
+
+    def _drop(self, slot: int) -> None:
+        self._unindex(slot)
+        del self._entries[slot]
+        self._free.append(slot)
+
+    def _candidates(self, v: np.ndarray) -> np.ndarray:
+        if len(self._entries) <= self.brute_limit:
+            return np.fromiter(self._entries.keys(), dtype=np.int64, count=len(self._entries))
+        cand = set()
+        for table, code in zip(self._tables, self._codes(v)):
+            cand |= table.get(code, set())
+        return np.fromiter(cand, dtype=np.int64, count=len(cand))
+
+    # ---- API ----
+    def get(self, qv: np.ndarray, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """(payload, similarity) for the best live entry under `key`, else None."""
+        qv = np.asarray(qv, dtype=np.float32)
+        now = time.time()
+        with self._lock:
+            cand = self._candidates(qv)
+            best, best_sim = None, self.threshold
+            if cand.size:
+                sims = self._vecs[cand] @ qv
+                for i in np.argsort(-sims):
+                    if sims[i] < best_sim:
+                        break
+                    slot = int(cand[i])
+                    k, created, _ = self._entries[slot]
+                    if now - created > self.ttl_s:
+                        self._drop(slot)
+                        self.expired += 1
+                        continue
+                    if k == key:
+                        best, best_sim = slot, float(sims[i])
+                        break
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            self.hits += 1
+            return self._entries[best][2], best_sim
+
+    def put(self, qv: np.ndarray, key: str, payload: Dict[str, Any]) -> None:
+        qv = np.asarray(qv, dtype=np.float32)
+        with self._lock:
+            if not self._free:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+            slot = self._free.pop()
+            self._vecs[slot] = qv
+            self._entries[slot] = (key, time.time(), payload)
+            self._index(slot, qv)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "threshold": self.threshold,
+            }
+
+
+_CACHES: Dict[int, SemanticCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_cache(dim: int) -> SemanticCache:
+    """Process-wide cache per embedding dim, configured from SEMANTIC_CACHE_* env vars."""
+    with _CACHES_LOCK:
+        cache = _CACHES.get(dim)
+        if cache is None:
+            cache = _CACHES[dim] = SemanticCache(
+                dim,
+                threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+                max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "1024")),
+                ttl_s=float(os.getenv("SEMANTIC_CACHE_TTL_S", "3600")),
+            )
+        return cache
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Stats of the process-wide cache (one per embedding dim; usually just one)."""
+    with _CACHES_LOCK:
+        caches = list(_CACHES.values())
+    if len(caches) == 1:
+        return caches[0].stats()
+    return {str(c.dim): c.stats() for c in caches}
+
+
+def _hit_usage(usage: Dict[str, Any]) -> Dict[str, Any]:
+    """Usage for a cache hit: no Groq call was made, so no tokens and no request info."""
+    return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0,
+            "model": usage.get("model"), "provider": usage.get("provider"), "cached": True}
+
+
+def cached_answer(question: str,
+                  index_dir: str,
+                  top_k: int,
+                  generate_fn: Callable[..., Tuple[str, Dict]],
+                  embed_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+                  mode: Optional[str] = None,
+                  filters: Optional[Dict[str, Any]] = None):
+    """
+    retrieve + generate through the semantic cache.
+    Returns (results [(idx, score, text)], answer, usage, cache_info).
+    The cache key, cached chunk texts and a fresh retrieval all come from one
+    pinned index version; cache_info["index_dir"] is that version's directory,
+    for chunk_sources() after the (possibly slow) generation.
+    """
+    from src.pipeline.retriever import embed_query, pinned_index, retrieve
+
+    mode = mode or os.getenv("RETRIEVAL_MODE", "hybrid")
+    with pinned_index(index_dir) as h:
+        qv = embed_query(question, index_dir, embed_model, handle=h)
+        cache = get_cache(int(qv.shape[0]))
+        key = f"{h.version}|{mode}|{top_k}|{json.dumps(filters or {}, sort_keys=True)}"
+
+        t0 = time.perf_counter()
+        hit = cache.get(qv, key)
+        if hit:
+            payload, sim = hit
+            results = [(i, s, h.texts[i]) for i, s in zip(payload["idx"], payload["scores"])]
+            info = {"hit": True, "similarity": round(sim, 4), "index_dir": h.dir,
+                    "lookup_ms": round((time.perf_counter() - t0) * 1000, 3), **cache.stats()}
+            return results, payload["answer"], _hit_usage(payload["usage"]), info
+
+        results = retrieve(question, index_dir, top_k=top_k, embed_model=embed_model, mode=mode, query_vec=qv,
+                           filters=filters, handle=h)
+        answer, usage = generate_fn(question, [r[2] for r in results], scores=[r[1] for r in results])
+        cache.put(qv, key, {"idx": [r[0] for r in results], "scores": [r[1] for r in results],
+                            "answer": answer, "usage": usage})
+        return results, answer, usage, {"hit": False, "index_dir": h.dir, **cache.stats()}
@@ -0,0 +1,243 @@
+# src/pipeline/shards.py
+"""
+Sharded dense index: N row-contiguous embedding shards plus a manifest.
+
+    <index_dir>/shards.json              {"dim", "count", "shards": [{"path", "offset", "count"}]}
+    <index_dir>/shard-000/embeddings.npy raw float32 rows [offset, offset + count)
+
+Row ids stay global (offset + local row), so texts.json, chunks.npy and the
+BM25 postings are shared by all shards and unchanged.
+
+Searchers (all expose .count, .dim, .topk(qv, k, rows) and .scores(qv, rows);
+`rows` is an optional sorted array of global row ids from a metadata filter,
+and only those rows are scored):
+  DenseMatrix       one in-memory matrix (unsharded indexes)
+  ThreadShardPool   shards scanned on a thread pool; numpy's matmul releases
+                    the GIL, so shards run on separate cores
+  ProcessShardPool  each worker process owns a group of shards and returns
+                    only its top-k; the same protocol fits shards served by
+                    separate local processes
+Per-shard top-k lists are merged with a heap.
+"""
+from __future__ import annotations
+
+import heapq
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SHARD_MANIFEST = "shards.json"
+# Above this fraction of a shard's rows, a filtered scan scores the whole
+# shard and selects afterwards: gathering rows costs more than the matmul.
+GATHER_MAX_FRACTION = 0.25
+
+
+def write_shards(out_dir: Path, embs: np.ndarray, n_shards: int) -> Dict:
+    """Split rows into n_shards contiguous shards and write the manifest."""
+    out = Path(out_dir)
+    n = int(embs.shape[0])
+    n_shards = max(1, min(int(n_shards), n))
+    bounds = np.linspace(0, n, n_shards + 1).astype(int)
+    shards = []
+    for s in range(n_shards):
+        lo, hi = int(bounds[s]), int(bounds[s + 1])
+        rel = f"shard-{s:03d}/embeddings.npy"
+        (out / rel).parent.mkdir(parents=True, exist_ok=True)
+        (out / rel).write_bytes(np.ascontiguousarray(embs[lo:hi], dtype=np.float32).tobytes())
+        shards.append({"path": rel, "offset": lo, "count": hi - lo})
+    manifest = {"dim": int(embs.shape[1]), "count": n, "shards": shards}
+    (out / SHARD_MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def has_shards(index_dir: str) -> bool:
+    return (Path(index_dir) / SHARD_MANIFEST).exists()
+
+
+def read_manifest(index_dir: str) -> Dict:
+    return json.loads((Path(index_dir) / SHARD_MANIFEST).read_text(encoding="utf-8"))
+
+
+def load_matrix(path: Path, count: int, dim: int) -> np.ndarray:
+    """
+    Raw float32 rows, memory-mapped read-only unless INDEX_MMAP=0. Mapped
+    pages come from the OS page cache (shared by every process serving the
+    index) and are released when the last reference to the array goes.
+    """
+    if count == 0:
+        return np.zeros((0, dim), dtype=np.float32)
+    if os.getenv("INDEX_MMAP", "1") == "0":
+        return np.fromfile(path, dtype=np.float32).reshape((count, dim))
+    return np.memmap(path, dtype=np.float32, mode="r", shape=(count, dim))
+
+
+def _load_shard(index_dir: str, shard: Dict, dim: int) -> np.ndarray:
+    return load_matrix(Path(index_dir) / shard["path"], shard["count"], dim)
+
+
+def _score_rows(m: np.ndarray, qv: np.ndarray, local: Optional[np.ndarray] = None) -> np.ndarray:
+    """m @ qv, restricted to the sorted local row ids when given."""
+    if local is None:
+        return m @ qv
+    if local.size and local[-1] - local[0] + 1 == local.size:     # contiguous: a view, no copy
+        return m[local[0]:local[-1] + 1] @ qv
+    if local.size > GATHER_MAX_FRACTION * m.shape[0]:
+        return (m @ qv)[local]
+    return m[local] @ qv
+
+
+def _shard_topk(m: np.ndarray, offset: int, qv: np.ndarray, k: int,
+                local: Optional[np.ndarray] = None) -> List[Tuple[float, int]]:
+    """Top-k (score, global id) in one shard, optionally over local row ids only."""
+    sims = _score_rows(m, qv, local)
+    if sims.shape[0] > k:
+        part = np.argpartition(-sims, k - 1)[:k]
+    else:
+        part = np.arange(sims.shape[0])
+    ids = part if local is None else local[part]
+    return [(float(sims[i]), offset + int(j)) for i, j in zip(part, ids)]
+
+
+def _split_rows(rows: np.ndarray, offset: int, count: int) -> np.ndarray:
+    """Local ids of the sorted global `rows` that fall inside [offset, offset + count)."""
+    lo, hi = np.searchsorted(rows, [offset, offset + count])
+    return rows[lo:hi] - offset
+
+
+def merge_topk(parts: Sequence[List[Tuple[float, int]]], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Heap-merge per-shard (score, id) lists into global (ids, scores), best first."""
+    best = heapq.nlargest(k, (x for p in parts for x in p), key=lambda x: (x[0], -x[1]))
+    ids = np.array([i for _, i in best], dtype=np.int64)
+    scores = np.array([s for s, _ in best], dtype=np.float32)
+    return ids, scores
+
+
+class DenseMatrix:
+    def __init__(self, embs: np.ndarray):
+        self.embs = embs
+        self.count, self.dim = int(embs.shape[0]), int(embs.shape[1])
+
+    def scores(self, qv: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        return _score_rows(self.embs, qv, rows)
+
+    def topk(self, qv: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        return merge_topk([_shard_topk(self.embs, 0, qv, k, rows)], k)
+
+    def close(self) -> None:
+        self.embs = None   # drops the mapping once no query holds a slice of it
+
+
+class ThreadShardPool:
+    def __init__(self, index_dir: str, workers: Optional[int] = None):
+        man = read_manifest(index_dir)
+        self.count, self.dim = int(man["count"]), int(man["dim"])
+        self.offsets = [int(s["offset"]) for s in man["shards"]]
+        self.mats = [_load_shard(index_dir, s, self.dim) for s in man["shards"]]
+        self._pool = ThreadPoolExecutor(max_workers=workers or min(len(self.mats), os.cpu_count() or 1),
+                                        thread_name_prefix="shard")
+
+    def _locals(self, rows: Optional[np.ndarray]) -> List[Optional[np.ndarray]]:
+        if rows is None:
+            return [None] * len(self.mats)
+        return [_split_rows(rows, off, m.shape[0]) for off, m in zip(self.offsets, self.mats)]
+
+    def topk(self, qv: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        local = self._locals(rows)
+        # Shards with no selected rows are skipped entirely
+        live = [s for s in range(len(self.mats)) if local[s] is None or local[s].size]
+        parts = self._pool.map(lambda s: _shard_topk(self.mats[s], self.offsets[s], qv, k, local[s]), live)
+        return merge_topk(list(parts), k)
+
+    def scores(self, qv: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Scores for all rows, or for `rows` in the same order when given."""
+        local = self._locals(rows)
+        out = np.empty(self.count if rows is None else rows.shape[0], dtype=np.float32)
+        starts = self.offsets if rows is None else np.searchsorted(rows, self.offsets).tolist()
+        def fill(s: int) -> None:
+            n = self.mats[s].shape[0] if local[s] is None else local[s].size
+            out[starts[s]:starts[s] + n] = _score_rows(self.mats[s], qv, local[s])
+        list(self._pool.map(fill, range(len(self.mats))))
+        return out
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+        self.mats = []
+
+
+# ---- process workers -----------------------------------------------------------
+_WORKER_SHARDS: List[Tuple[int, np.ndarray]] = []
+
+
+def _worker_init(index_dir: str, shard_ids: List[int]) -> None:
+    global _WORKER_SHARDS
+    man = read_manifest(index_dir)
+    _WORKER_SHARDS = [(int(man["shards"][s]["offset"]), _load_shard(index_dir, man["shards"][s], int(man["dim"])))
+                      for s in shard_ids]
+
+
+def _worker_topk(qv: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> List[Tuple[float, int]]:
+    parts = []
+    for off, m in _WORKER_SHARDS:
+        local = None if rows is None else _split_rows(rows, off, m.shape[0])
+        if local is None or local.size:
+            parts.append(_shard_topk(m, off, qv, k, local))
+    return heapq.nlargest(k, (x for p in parts for x in p), key=lambda x: (x[0], -x[1]))
+
+
+def _worker_scores(qv: np.ndarray, rows: Optional[np.ndarray] = None) -> List[Tuple[int, np.ndarray]]:
+    """(position in the output, scores) per owned shard."""
+    if rows is None:
+        return [(off, m @ qv) for off, m in _WORKER_SHARDS]
+    out = []
+    for off, m in _WORKER_SHARDS:
+        local = _split_rows(rows, off, m.shape[0])
+        out.append((int(np.searchsorted(rows, off)), _score_rows(m, qv, local)))
+    return out
+
+
+class ProcessShardPool:
+    """
+    One single-worker process per shard group; each loads only its shards.
+    Only (score, id) top-k lists cross the process boundary for dense search.
+    """
+
+    def __init__(self, index_dir: str, workers: Optional[int] = None):
+        man = read_manifest(index_dir)
+        self.count, self.dim = int(man["count"]), int(man["dim"])
+        n = len(man["shards"])
+        workers = max(1, min(workers or os.cpu_count() or 1, n))
+        groups = [list(range(n))[w::workers] for w in range(workers)]
+        self._procs = [ProcessPoolExecutor(max_workers=1, initializer=_worker_init, initargs=(str(index_dir), g))
+                       for g in groups]
+
+    def topk(self, qv: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        futs = [p.submit(_worker_topk, qv, k, rows) for p in self._procs]
+        return merge_topk([f.result() for f in futs], k)
+
+    def scores(self, qv: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        out = np.empty(self.count if rows is None else rows.shape[0], dtype=np.float32)
+        for f in [p.submit(_worker_scores, qv, rows) for p in self._procs]:
+            for pos, sims in f.result():
+                out[pos:pos + sims.shape[0]] = sims
+        return out
+
+    def close(self) -> None:
+        for p in self._procs:
+            p.shutdown(wait=False, cancel_futures=True)
+
+
+def open_dense(index_dir: str, embs: Optional[np.ndarray] = None):
+    """
+    Searcher for an index dir. SHARD_WORKERS=threads (default) | processes picks
+    the pool for sharded indexes; SHARD_THREADS / SHARD_PROCESSES size it.
+    """
+    if not has_shards(index_dir):
+        return DenseMatrix(embs)
+    kind = os.getenv("SHARD_WORKERS", "threads")
+    if kind == "processes":
+        return ProcessShardPool(index_dir, int(os.getenv("SHARD_PROCESSES", "0")) or None)
+    return ThreadShardPool(index_dir, int(os.getenv("SHARD_THREADS", "0")) or None)
@@ -0,0 +1,74 @@
+# src/pipeline/versions.py
+"""
+Versioned index directories.
+
+    <index_dir>/CURRENT                 "versions/<version>" (one line)
+    <index_dir>/versions/<version>/     a complete index (meta.json, texts.json, ...)
+
+Ingest fills a fresh version directory and only then flips CURRENT with
+os.replace, which is atomic on POSIX and Windows, so a reader sees either
+the old or the new index and never a half-written one. Version directories
+are immutable once published. An index_dir without CURRENT is a flat
+(pre-versioning) index and resolves to itself.
+"""
+from __future__ import annotations
+
+import os
+import shutil
+from pathlib import Path
+from typing import List
+
+CURRENT = "CURRENT"
+VERSIONS_DIR = "versions"
+
+
+def version_dir(index_dir: str, version: str) -> Path:
+    return Path(index_dir) / VERSIONS_DIR / version
+
+
+def resolve_version(index_dir: str) -> Path:
+    """Directory holding the live index files for index_dir."""
+    root = Path(index_dir)
+    try:
+        rel = (root / CURRENT).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return root
+    return root / rel
+
+
+def publish_version(index_dir: str, vdir: Path) -> None:
+    """Atomically point index_dir/CURRENT at vdir (a directory under index_dir)."""
+    root = Path(index_dir)
+    rel = Path(vdir).resolve().relative_to(root.resolve()).as_posix()
+    tmp = root / f"{CURRENT}.tmp.{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(rel + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, root / CURRENT)
+
+
+def list_versions(index_dir: str) -> List[Path]:
+    """Version directories, oldest first (names start with the ingest timestamp)."""
+    d = Path(index_dir) / VERSIONS_DIR
+    return sorted(p for p in d.iterdir() if p.is_dir()) if d.exists() else []
+
+
+def prune_versions(index_dir: str, keep: int = 3) -> List[Path]:
+    """
+    Delete all but the newest `keep` versions, never the current one.
+    Readers still draining an old version keep their mapped pages on POSIX;
+    on Windows a mapped file cannot be deleted, so that version is left for
+    the next prune.
+    """
+    current = resolve_version(index_dir).resolve()
+    removed = []
+    for p in list_versions(index_dir)[:-keep] if keep > 0 else list_versions(index_dir):
+        if p.resolve() == current:
+            continue
+        try:
+            shutil.rmtree(p)
+            removed.append(p)
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,119 @@
+# src/service/client.py
+"""
+Thin client for the resident RAG service (src/service/server.py).
+
+Method names and return shapes mirror the in-process functions, so scripts can
+swap `retrieve` / `retrieve_with_sources` / `chunk_sources` / `generate_answer` / `JudgeAgent.score` for
+a RAGClient without other changes. URLs: http://host:port or unix:///path.sock
+"""
+from __future__ import annotations
+
+import http.client
+import json
+import socket
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.unix_path)
+        self.sock = sock
+
+
+class ServiceError(RuntimeError):
+    pass
+
+
+class RAGClient:
+    def __init__(self, url: str, timeout: float = 120.0):
+        self.url = url
+        self.timeout = timeout
+        self._local = threading.local()   # one keep-alive connection per thread
+
+    def _conn(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            u = urlparse(self.url)
+            if u.scheme == "unix":
+                conn = _UnixHTTPConnection(u.path, self.timeout)
+            elif u.scheme == "http":
+                conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=self.timeout)
+            else:
+                raise ValueError(f"unsupported service url: {self.url}")
+            self._local.conn = conn
+        return conn
+
+    def _call(self, path: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        data = json.dumps(body or {}).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        method = "POST" if body is not None else "GET"
+        for attempt in (0, 1):
+            conn = self._conn()
+            try:
+                conn.request(method, path, body=data if body is not None else None, headers=headers)
+                resp = conn.getresponse()
+                payload = json.loads(resp.read() or b"{}")
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # server dropped an idle keep-alive connection; reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        if resp.status != 200:
+            raise ServiceError(f"{path}: {payload.get('error', resp.status)}")
+        return payload
+
+    @staticmethod
+    def _abs(index_dir: Optional[str]) -> Optional[str]:
+        # the service may run from another cwd
+        return str(Path(index_dir).resolve()) if index_dir else None
+
+    def health(self) -> Dict[str, Any]:
+        return self._call("/health")
+
+    def retrieve(self, query: str, index_dir: Optional[str] = None, top_k: int = 3,
+                 embed_model: Optional[str] = None, mode: Optional[str] = None,
+                 filters: Optional[Dict[str, Any]] = None) -> List[Tuple[int, float, str]]:
+        # embed_model is fixed by the service; accepted for signature parity
+        out = self._call("/retrieve", {"question": query, "index_dir": self._abs(index_dir), "top_k": top_k,
+                                       "mode": mode, "filters": filters})
+        return [(int(i), float(s), t) for i, s, t in out["results"]]
+
+    def retrieve_with_sources(self, query: str, index_dir: Optional[str] = None, top_k: int = 3,
+                              embed_model: Optional[str] = None, mode: Optional[str] = None,
+                              filters: Optional[Dict[str, Any]] = None
+                              ) -> Tuple[List[Tuple[int, float, str]], List[Optional[Dict]]]:
+        out = self._call("/retrieve", {"question": query, "index_dir": self._abs(index_dir), "top_k": top_k,
+                                       "mode": mode, "filters": filters, "sources": True})
+        return [(int(i), float(s), t) for i, s, t in out["results"]], out["sources"]
+
+    def chunk_sources(self, index_dir: Optional[str], idxs: List[int]) -> List[Optional[Dict]]:
+        return self._call("/sources", {"index_dir": self._abs(index_dir), "idxs": list(idxs)})["sources"]
+
+    def generate_answer(self, question: str, contexts: List[str],
+                        scores: Optional[Sequence[float]] = None,
+                        max_tokens: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
+        out = self._call("/generate", {"question": question, "contexts": contexts,
+                                       "scores": list(scores) if scores is not None else None,
+                                       "max_tokens": max_tokens})
+        return out["answer"], out["usage"]
+
+    def score(self, question: str, contexts: List[str], answer: str, ground_truth: str) -> Dict[str, Any]:
+        return self._call("/judge", {"question": question, "contexts": contexts,
+                                     "answer": answer, "ground_truth": ground_truth})
+
+    evaluate = score
+
+    def ask(self, question: str, top_k: Optional[int] = None, mode: Optional[str] = None,
+            filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._call("/ask", {"question": question, "top_k": top_k, "mode": mode, "filters": filters})
@@ -0,0 +1,228 @@
+# src/service/server.py
+"""
+Resident RAG service.
+
+Loads the embed model, index, Groq client and JudgeAgent once and serves
+retrieve / generate / judge over local HTTP (TCP or a Unix socket), so
+interactive calls pay for the LLM round trip rather than Python startup.
+
+    python scripts/03_serve_rag.py --index_dir data/index --port 8765
+    python scripts/03_serve_rag.py --index_dir data/index --unix /tmp/rag.sock
+
+Endpoints (JSON in, JSON out):
+    GET  /health
+    POST /retrieve   {question, top_k?, mode?, index_dir?}
+    POST /sources    {idxs, index_dir?}
+    POST /generate   {question, contexts, scores?, max_tokens?}
+    POST /judge      {question, contexts, answer, ground_truth?}
+    POST /ask        {question, top_k?, mode?}   retrieve + generate (semantic-cached
+                                                 when started with --semantic_cache)
+"""
+from __future__ import annotations
+
+import json
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+
+from src.pipeline.retriever import retrieve, chunk_sources, encoder_stats, index_version, pinned_index, warm
+from src.pipeline import generator
+from src.pipeline.generator import generate_answer
+from src.pipeline.request_policy import policy_stats
+from src.pipeline.semantic_cache import cache_stats, cached_answer
+
+
+class RAGService:
+    """Warm state shared by all request threads."""
+
+    def __init__(self, index_dir: str, embed_model: str, top_k: int = 3, mode: Optional[str] = None,
+                 semantic_cache: bool = False):
+        self.index_dir = index_dir
+        self.embed_model = embed_model
+        self.top_k = top_k
+        self.mode = mode
+        self.semantic_cache = semantic_cache
+        self.started = time.time()
+        self._judge = None
+        self._judge_lock = threading.Lock()
+        self.index_info: Dict[str, Any] = {}
+
+    def warm(self) -> None:
+        self.index_info = warm(self.index_dir, self.embed_model)
+        key = os.getenv("GROQ_API_KEY")
+        if key:
+            generator._get_client(key)
+            self.judge()
+
+    def judge(self):
+        with self._judge_lock:
+            if self._judge is None:
+                from src.judge.judge_agent import JudgeAgent
+                self._judge = JudgeAgent()
+            return self._judge
+
+    # ---- handlers ----
+    def health(self, _: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "ok": True,
+            "index_dir": self.index_dir,
+            "index": self.index_info,
+            # live version: changes when a new ingest is hot-swapped in
+            "index_version": index_version(self.index_dir),
+            "encoders": encoder_stats(),
+            "semantic_cache": cache_stats() if self.semantic_cache else None,
+            "llm_requests": policy_stats(),
+            "uptime_s": round(time.time() - self.started, 1),
+        }
+
+    def retrieve(self, req: Dict[str, Any], handle=None) -> Dict[str, Any]:
+        if req.get("sources") and handle is None:
+            # results and their provenance from one version, in one round trip
+            with pinned_index(req.get("index_dir") or self.index_dir) as h:
+                out = self.retrieve(req, handle=h)
+                out["sources"] = h.sources([r[0] for r in out["results"]])
+                return out
+        results = retrieve(
+            query=req["question"],
+            index_dir=req.get("index_dir") or self.index_dir,
+            top_k=int(req.get("top_k") or self.top_k),
+            embed_model=self.embed_model,
+            mode=req.get("mode") or self.mode,
+            filters=req.get("filters"),
+            handle=handle,
+        )
+        return {"results": [[i, s, t] for i, s, t in results]}
+
+    def sources(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        return {"sources": chunk_sources(req.get("index_dir") or self.index_dir, req["idxs"])}
+
+    def generate(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        answer, usage = generate_answer(req["question"], req["contexts"],
+                                        scores=req.get("scores"), max_tokens=req.get("max_tokens"))
+        return {"answer": answer, "usage": usage}
+
+    def judge_score(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        return self.judge().score(req["question"], req["contexts"], req["answer"], req.get("ground_truth", ""))
+
+    def ask(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        if self.semantic_cache:
+            return self._ask_cached(req)
+        t0 = time.time()
+        # one index version for retrieval and provenance, even if a new one is
+        # hot-swapped in during generation
+        with pinned_index(req.get("index_dir") or self.index_dir) as h:
+            results = self.retrieve(req, handle=h)["results"]
+            t1 = time.time()
+            idxs = [int(r[0]) for r in results]
+            gen = self.generate({"question": req["question"], "contexts": [r[2] for r in results],
+                                 "scores": [r[1] for r in results], "max_tokens": req.get("max_tokens")})
+            t2 = time.time()
+            sources = h.sources(idxs)
+        return {
+            "contexts_idx": idxs,
+            "contexts_source": sources,
+            "contexts": [r[2] for r in results],
+            "answer": gen["answer"],
+            "usage": gen["usage"],
+            "latency": {"retrieve_ms": int((t1 - t0) * 1000), "gen_ms": int((t2 - t1) * 1000)},
+        }
+
+    def _ask_cached(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        index_dir = req.get("index_dir") or self.index_dir
+        t0 = time.time()
+        results, answer, usage, cache_info = cached_answer(
+            req["question"], index_dir, int(req.get("top_k") or self.top_k), generate_answer,
+            embed_model=self.embed_model, mode=req.get("mode") or self.mode, filters=req.get("filters"))
+        idxs = [int(r[0]) for r in results]
+        return {
+            "contexts_idx": idxs,
+            "contexts_source": chunk_sources(cache_info.pop("index_dir"), idxs),
+            "contexts": [r[2] for r in results],
+            "answer": answer,
+            "usage": usage,
+            "cache": cache_info,
+            "latency": {"total_ms": int((time.time() - t0) * 1000)},
+        }
+
+    def routes(self) -> Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]]:
+        return {
+            "/health": self.health,
+            "/retrieve": self.retrieve,
+            "/sources": self.sources,
+            "/generate": self.generate,
+            "/judge": self.judge_score,
+            "/ask": self.ask,
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, so clients reuse one connection
+    routes: Dict[str, Callable] = {}
+    quiet = False
+
+    def _reply(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self, req: Dict[str, Any]) -> None:
+        fn = self.routes.get(self.path)
+        if fn is None:
+            self._reply(404, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            self._reply(200, fn(req))
+        except KeyError as e:
+            self._reply(400, {"error": f"missing field {e}"})
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+        except Exception as e:
+            self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def do_GET(self) -> None:
+        self._dispatch({})
+
+    def do_POST(self) -> None:
+        n = int(self.headers.get("Content-Length") or 0)
+        try:
+            req = json.loads(self.rfile.read(n) or b"{}")
+        except ValueError:
+            self._reply(400, {"error": "body must be JSON"})
+            return
+        self._dispatch(req)
+
+    def address_string(self) -> str:
+        # Unix-socket peers have no (host, port)
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, fmt: str, *args) -> None:
+        if not self.quiet:
+            super().log_message(fmt, *args)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service: RAGService,
+                host: str = "127.0.0.1",
+                port: int = 8765,
+                unix_path: Optional[str] = None,
+                quiet: bool = False):
+    # Headers and body go out as separate writes; without TCP_NODELAY each
+    # keep-alive response stalls on delayed ACK. Not applicable to AF_UNIX.
+    handler = type("RAGHandler", (_Handler,), {"routes": service.routes(), "quiet": quiet,
+                                               "disable_nagle_algorithm": not unix_path})
+    if unix_path:
+        if os.path.exists(unix_path):
+            os.unlink(unix_path)
+        return ThreadingUnixHTTPServer(unix_path, handler)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
@@ -2,14 +2,21 @@ import os
 import json
 import time
 import random
+import asyncio
+import argparse
 import datetime
 import logging
-from logging.handlers import RotatingFileHandler
+import multiprocessing
 
+import elasticapm
 from elasticapm import Client
 from elasticapm.handlers.logging import LoggingHandler
 from elasticapm.instrumentation.control import instrument
 
+from log_writer import writer_settings, build_handlers, get_serializer, shutdown_writers
+from bulk_sink import BulkSink, sink_settings
+from metrics_aggregator import SlidingWindowAggregator, RollupEmitter, metrics_settings
+
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -23,26 +30,118 @@ def get_env(name, default=""):
     return value if value else default
 
 
-def configure_logging(log_file):
+# dict -> str used for every log line; replaced by configure_logging.
+serialize = json.dumps
+
+
+def configure_logging(log_file, config=None):
+    global serialize
     logger = logging.getLogger("atomic-agent")
     logger.setLevel(logging.INFO)
 
     if logger.handlers:
         return logger
 
-    handler = RotatingFileHandler(log_file, maxBytes=5_000_000, backupCount=3)
+    settings = writer_settings(config or {})
+    serialize = get_serializer(settings["serializer"])
+    handler, _ = build_handlers(log_file, settings)
     handler.setLevel(logging.INFO)
-    formatter = logging.Formatter("%(message)s")
-    handler.setFormatter(formatter)
     logger.addHandler(handler)
+    # Records only reach our handler; skip the root logger walk.
+    logger.propagate = False
     return logger
 
 
-def configure_apm():
+# Optional direct-to-Elasticsearch sink; set by configure_bulk_sink.
+bulk_sink = None
+write_log_file = True
+
+
+def configure_bulk_sink(config):
+    global bulk_sink, write_log_file
+    settings = sink_settings(config)
+    if not settings["enabled"]:
+        return None
+    bulk_sink = BulkSink.from_config(config)
+    write_log_file = bool(settings["write_file"])
+    print(f"[INFO] Bulk sink enabled: data_stream={settings['data_stream']} "
+          f"batch_size={settings['batch_size']} write_file={write_log_file}")
+    return bulk_sink
+
+
+def shutdown_bulk_sink():
+    global bulk_sink
+    if bulk_sink is not None:
+        bulk_sink.close()
+        print(f"[INFO] Bulk sink stats: {bulk_sink.stats}")
+        bulk_sink = None
+
+
+APM_DEFAULTS = {
+    "transaction_sample_rate": 1.0,
+    "api_request_time": "10s",
+    "api_request_size": "768kb",
+    "transaction_max_spans": 16,
+    "exit_span_min_duration": "0ms",
+}
+
+
+def apm_settings(config):
+    """
+    Agent options that bound APM overhead at high event rates: head-based
+    sampling and batched sends (one intake request per api_request_time or
+    api_request_size, whichever comes first).
+    """
+    settings = dict(APM_DEFAULTS)
+    settings.update((config or {}).get("apm") or {})
+    rate = get_env("ELASTIC_APM_TRANSACTION_SAMPLE_RATE")
+    if rate:
+        settings["transaction_sample_rate"] = float(rate)
+    return {key.upper(): value for key, value in settings.items()}
+
+
+# Optional in-process rollups; set by configure_metrics.
+aggregator = None
+rollup_emitter = None
+
+
+def configure_metrics(config, source=None):
+    global aggregator, rollup_emitter
+    settings = metrics_settings(config)
+    if not settings["enabled"]:
+        return None
+    sink = None
+    if settings["ship_to_bulk"]:
+        rollup_config = dict(config, bulk_sink=dict(config.get("bulk_sink") or {},
+                                                     data_stream=settings["rollup_data_stream"]))
+        sink = BulkSink.from_config(rollup_config)
+    output = settings["output"]
+    if output and source:
+        root, ext = os.path.splitext(output)
+        output = f"{root}-{source}{ext}"
+    aggregator = SlidingWindowAggregator(settings["window_seconds"], settings["bucket_seconds"],
+                                         settings["relative_accuracy"])
+    rollup_emitter = RollupEmitter(aggregator, settings["emit_interval_seconds"], output, sink, source)
+    print(f"[INFO] Metrics rollups enabled: window={settings['window_seconds']}s output={output or '-'}")
+    return aggregator
+
+
+def shutdown_metrics():
+    global aggregator, rollup_emitter
+    if rollup_emitter is not None:
+        rollup_emitter.close()
+        if rollup_emitter.sink is not None:
+            rollup_emitter.sink.close()
+        rollup_emitter = None
+    aggregator = None
+
+
+def configure_apm(config=None):
     server_url = get_env("ELASTIC_APM_SERVER_URL")
     secret_token = get_env("ELASTIC_APM_SECRET_TOKEN")
     service_name = get_env("ELASTIC_APM_SERVICE_NAME", "atomic-agent-service")
     environment = get_env("ELASTIC_APM_ENVIRONMENT", "dev")
+    tuning = apm_settings(config)
 
     if not server_url or not secret_token:
         print("[WARN] APM not fully configured; running in no-send mode.")
@@ -50,6 +149,7 @@ def configure_apm():
             "SERVICE_NAME": service_name,
             "ENVIRONMENT": environment,
             "DISABLE_SEND": True,
+            **tuning,
         })
         return client
 
@@ -58,6 +158,7 @@ def configure_apm():
         "SERVER_URL": server_url,
         "SECRET_TOKEN": secret_token,
         "ENVIRONMENT": environment,
+        **tuning,
     })
     instrument()
     return client
@@ -79,35 +180,38 @@ def load_config(path="config.yaml"):
         return yaml.safe_load(f) or {}
 
 
-def simulate_action(config, logger, apm_client):
+ERROR_DETAILS = [
+    "timeout while calling downstream API",
+    "database connection failure",
+    "invalid input payload",
+    "permission denied on resource",
+]
+
+
+def plan_action(config):
+    """Pick an action, its simulated latency (seconds) and its outcome."""
     actions = config.get("actions", ["fetch_data", "process_order", "run_batch"])
     success_rate = float(config.get("success_rate", 0.8))
     min_latency = int(config.get("min_latency_ms", 100))
     max_latency = int(config.get("max_latency_ms", 800))
-    agent_id = config.get("agent_id", "agent-01")
 
     action = random.choice(actions)
-    start = time.time()
+    delay = random.uniform(min_latency / 1000.0, max_latency / 1000.0)
+    success = random.random() <= success_rate
+    return action, delay, success
 
-    time.sleep(random.uniform(min_latency / 1000.0, max_latency / 1000.0))
-    latency_ms = int((time.time() - start) * 1000)
 
-    success = random.random() <= success_rate
+def build_log_entry(agent_id, action, success, latency_ms):
     status = "OK" if success else "ERROR"
 
     if success:
         msg_detail = "completed successfully"
     else:
-        msg_detail = random.choice([
-            "timeout while calling downstream API",
-            "database connection failure",
-            "invalid input payload",
-            "permission denied on resource",
-        ])
+        msg_detail = random.choice(ERROR_DETAILS)
 
     message = f"{action} {msg_detail}."
 
-    log_entry = {
+    return {
         "timestamp": datetime.datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
         "agent_id": agent_id,
         "action": action,
@@ -116,20 +220,228 @@ def simulate_action(config, logger, apm_client):
         "latency_ms": latency_ms,
     }
 
-    logger.info(json.dumps(log_entry))
 
+def write_event(entry, logger):
+    if write_log_file:
+        logger.info(serialize(entry))
+    if bulk_sink is not None:
+        bulk_sink.submit(entry)
+    if aggregator is not None:
+        aggregator.observe(entry)
+
+
+def simulate_action(config, logger, apm_client, agent_id=None):
+    agent_id = agent_id or config.get("agent_id", "agent-01")
+    action, delay, success = plan_action(config)
+
+    # The transaction wraps the whole action so its duration matches latency_ms.
     apm_client.begin_transaction("atomic-agent-workload")
-    result = "success" if success else "failure"
-    apm_client.end_transaction(action, result)
+    start = time.time()
+    with elasticapm.capture_span(f"{action} downstream", span_type="external", span_subtype="simulated"):
+        time.sleep(delay)
+    latency_ms = int((time.time() - start) * 1000)
+
+    entry = build_log_entry(agent_id, action, success, latency_ms)
+    with elasticapm.capture_span("log_write", span_type="app", span_subtype="log"):
+        write_event(entry, logger)
+
+    apm_client.end_transaction(action, "success" if success else "failure")
+
+
+async def simulate_action_async(config, logger, apm_client, agent_id):
+    action, delay, success = plan_action(config)
+
+    # Each asyncio task has its own context, so transactions do not interleave.
+    apm_client.begin_transaction("atomic-agent-workload")
+    start = time.time()
+    async with elasticapm.async_capture_span(f"{action} downstream", span_type="external", span_subtype="simulated"):
+        await asyncio.sleep(delay)
+    latency_ms = int((time.time() - start) * 1000)
+
+    entry = build_log_entry(agent_id, action, success, latency_ms)
+    with elasticapm.capture_span("log_write", span_type="app", span_subtype="log"):
+        write_event(entry, logger)
+
+    apm_client.end_transaction(action, "success" if success else "failure")
+
+
+# ---- load generation ----
+
+LOAD_DEFAULTS = {
+    "enabled": False,
+    "agents": 8,
+    "agent_id_prefix": "agent",
+    "processes": 1,
+    "target_eps": 500,
+    "start_eps": 10,
+    "ramp_seconds": 30,
+    "burst_every_seconds": 0,
+    "burst_seconds": 5,
+    "burst_multiplier": 3.0,
+    "max_in_flight_per_agent": 1024,
+    "duration_seconds": 0,
+    "report_interval_seconds": 5,
+}
+
+
+def load_settings(config):
+    settings = dict(LOAD_DEFAULTS)
+    settings.update(config.get("load") or {})
+    return settings
+
+
+def target_rate(settings, elapsed):
+    """
+    Events/sec the whole generator should produce `elapsed` seconds in:
+    a linear ramp from start_eps to target_eps, then periodic bursts.
+    """
+    target = float(settings["target_eps"])
+    ramp = float(settings["ramp_seconds"])
+    if ramp > 0 and elapsed < ramp:
+        start = float(settings["start_eps"])
+        rate = start + (target - start) * (elapsed / ramp)
+    else:
+        rate = target
+
+    every = float(settings["burst_every_seconds"])
+    if every > 0 and elapsed >= ramp and (elapsed - ramp) % every < float(settings["burst_seconds"]):
+        rate *= float(settings["burst_multiplier"])
+    return max(rate, 0.001)
+
+
+async def run_simulated_agent(config, settings, logger, apm_client, agent_id, share, started, stats, stop_at):
+    """
+    Open-loop pacing: actions are launched on schedule whether or not earlier
+    ones have finished, so slow simulated calls do not throttle the rate.
+    """
+    loop = asyncio.get_running_loop()
+    in_flight = asyncio.Semaphore(int(settings["max_in_flight_per_agent"]))
+    tasks = set()
+
+    async def one():
+        try:
+            await simulate_action_async(config, logger, apm_client, agent_id)
+            stats["events"] += 1
+        finally:
+            in_flight.release()
+
+    next_at = loop.time()
+    while not stop_at or loop.time() < stop_at:
+        rate = target_rate(settings, loop.time() - started) * share
+        next_at += 1.0 / rate
+        delay = next_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await in_flight.acquire()
+        task = asyncio.create_task(one())
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_load(config, logger, apm_client, agent_ids, share):
+    settings = load_settings(config)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    duration = float(settings["duration_seconds"])
+    stop_at = started + duration if duration > 0 else 0
+    stats = {"events": 0}
+    per_agent = share / len(agent_ids)
+
+    workers = [
+        asyncio.create_task(run_simulated_agent(
+            config, settings, logger, apm_client, agent_id, per_agent, started, stats, stop_at))
+        for agent_id in agent_ids
+    ]
+
+    interval = float(settings["report_interval_seconds"])
+    last_events, last_t = 0, started
+    while not all(w.done() for w in workers):
+        await asyncio.wait(workers, timeout=interval)
+        now = loop.time()
+        events = stats["events"]
+        eps = (events - last_events) / max(now - last_t, 1e-9)
+        print(f"[INFO] pid={os.getpid()} agents={len(agent_ids)} events={events} "
+              f"rate={eps:.0f}/s target={target_rate(settings, now - started) * share:.0f}/s", flush=True)
+        last_events, last_t = events, now
+    return stats["events"]
+
+
+def _load_process(config, log_file, agent_ids, share):
+    logger = configure_logging(log_file, config)
+    apm_client = configure_apm(config)
+    configure_bulk_sink(config)
+    # Worker processes write their own rollup file, like their own log file.
+    source = os.path.splitext(os.path.basename(log_file))[0] if multiprocessing.parent_process() else None
+    configure_metrics(config, source=source)
+    try:
+        asyncio.run(run_load(config, logger, apm_client, agent_ids, share))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_metrics()
+        shutdown_bulk_sink()
+        shutdown_writers()
+
+
+def main_load(config):
+    settings = load_settings(config)
+    log_file = config.get("log_file", "agent.log")
+    prefix = settings["agent_id_prefix"]
+    agent_ids = [f"{prefix}-{i:02d}" for i in range(1, int(settings["agents"]) + 1)]
+    processes = max(1, min(int(settings["processes"]), len(agent_ids)))
+
+    print(f"[INFO] Atomic Agent load mode: agents={len(agent_ids)} processes={processes} "
+          f"target={settings['target_eps']}/s ramp={settings['ramp_seconds']}s", flush=True)
+
+    if processes == 1:
+        _load_process(config, log_file, agent_ids, 1.0)
+        return
+
+    # One log file per process: RotatingFileHandler is not safe across processes.
+    root, ext = os.path.splitext(log_file)
+    procs = []
+    for p in range(processes):
+        ids = agent_ids[p::processes]
+        proc = multiprocessing.Process(
+            target=_load_process,
+            args=(config, f"{root}-p{p}{ext}", ids, len(ids) / len(agent_ids)),
+        )
+        proc.start()
+        procs.append(proc)
+    for proc in procs:
+        proc.join()
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Atomic Agent telemetry generator.")
+    ap.add_argument("--config", default="config.yaml")
+    ap.add_argument("--load", action="store_true", help="Run the multi-agent load generator")
+    ap.add_argument("--duration", type=float, default=None, help="Load mode run time in seconds (0 = forever)")
+    return ap.parse_args(argv)
 
 
 def main():
-    config = load_config()
+    args = parse_args()
+    config = load_config(args.config)
+    if args.load or (config.get("load") or {}).get("enabled"):
+        if args.duration is not None:
+            config.setdefault("load", {})["duration_seconds"] = args.duration
+        try:
+            main_load(config)
+        except KeyboardInterrupt:
+            print("[INFO] Atomic Agent load generator stopped by user.")
+        return
+
     log_file = config.get("log_file", "agent.log")
     interval = int(config.get("interval_seconds", 2))
 
-    logger = configure_logging(log_file)
-    apm_client = configure_apm()
+    logger = configure_logging(log_file, config)
+    apm_client = configure_apm(config)
+    configure_bulk_sink(config)
+    configure_metrics(config)
 
     print(f"[INFO] Atomic Agent starting. log_file={log_file}, interval={interval}s")
     try:
@@ -138,6 +450,10 @@ def main():
             time.sleep(interval)
     except KeyboardInterrupt:
         print("[INFO] Atomic Agent stopped by user.")
+    finally:
+        shutdown_metrics()
+        shutdown_bulk_sink()
+        shutdown_writers()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,239 @@
+"""
+Direct bulk shipping of Atomic Agent events to an Elasticsearch data stream.
+
+Events are buffered already structured (the `atomic.*` fields plus the
+enrichments the ingest pipeline would add), so there is no file to tail and
+no `json` processor re-parse. A background thread flushes on size or time,
+retries retryable failures with exponential backoff, and spools anything it
+cannot deliver to NDJSON files that are replayed after the next good flush.
+"""
+import os
+import json
+import time
+import queue
+import random
+import threading
+from pathlib import Path
+
+
+SINK_DEFAULTS = {
+    "enabled": False,
+    "write_file": True,         # keep writing agent.log alongside the bulk sink
+    "data_stream": "",          # default: elastic.logs_index
+    "pipeline": "",             # optional ingest pipeline; docs are already structured
+    "batch_size": 1000,
+    "flush_interval_seconds": 1.0,
+    "max_buffer": 50_000,
+    "on_full": "drop",          # drop | block
+    "max_retries": 5,
+    "backoff_seconds": 0.5,
+    "backoff_max_seconds": 30.0,
+    "spool_dir": "spool",
+    "request_timeout_seconds": 30,
+}
+
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+
+def sink_settings(config):
+    settings = dict(SINK_DEFAULTS)
+    settings.update(config.get("bulk_sink") or {})
+    if not settings["data_stream"]:
+        settings["data_stream"] = (config.get("elastic") or {}).get("logs_index", "atomic-agent-logs")
+    return settings
+
+
+def _configured(value):
+    return bool(value) and not str(value).startswith("<")
+
+
+def create_bulk_client(config):
+    from elasticsearch import Elasticsearch
+
+    elastic = config.get("elastic") or {}
+    url = os.getenv("ELASTIC_CLOUD_URL") or os.getenv("ES_ENDPOINT")
+    api_key = os.getenv("ELASTIC_API_KEY") or os.getenv("ES_API_KEY") or elastic.get("api_key")
+    if not _configured(api_key):
+        raise RuntimeError("Bulk sink needs ELASTIC_API_KEY (or elastic.api_key in config.yaml).")
+    if url:
+        return Elasticsearch(url, api_key=api_key)
+    if _configured(elastic.get("cloud_id")):
+        return Elasticsearch(cloud_id=elastic["cloud_id"], api_key=api_key)
+    raise RuntimeError("Bulk sink needs ELASTIC_CLOUD_URL (or elastic.cloud_id in config.yaml).")
+
+
+def to_document(entry, service_name="atomic-agent-service", env="dev"):
+    """Shape an agent log entry the way the ingest pipeline would have."""
+    return {
+        "@timestamp": entry["timestamp"],
+        "atomic": entry,
+        "service": {"name": service_name},
+        "env": env,
+    }
+
+
+class BulkSink:
+    def __init__(self, client, data_stream, batch_size=1000, flush_interval_seconds=1.0,
+                 max_buffer=50_000, on_full="drop", max_retries=5, backoff_seconds=0.5,
+                 backoff_max_seconds=30.0, spool_dir="spool", pipeline="",
+                 request_timeout_seconds=30, service_name="atomic-agent-service", env="dev"):
+        self.client = client
+        self.data_stream = data_stream
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval_seconds)
+        self.block_when_full = on_full == "block"
+        self.max_retries = int(max_retries)
+        self.backoff = float(backoff_seconds)
+        self.backoff_max = float(backoff_max_seconds)
+        self.spool_dir = Path(spool_dir)
+        self.pipeline = pipeline or None
+        self.request_timeout = request_timeout_seconds
+        self.service_name = service_name
+        self.env = env
+
+        self._queue = queue.Queue(maxsize=int(max_buffer))
+        self._stop = threading.Event()
+        self.stats = {"submitted": 0, "sent": 0, "dropped": 0, "spooled": 0, "replayed": 0, "retries": 0}
+        self._thread = threading.Thread(target=self._run, name="atomic-bulk-sink", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_config(cls, config, client=None):
+        s = sink_settings(config)
+        return cls(
+            client or create_bulk_client(config),
+            s["data_stream"],
+            batch_size=s["batch_size"],
+            flush_interval_seconds=s["flush_interval_seconds"],
+            max_buffer=s["max_buffer"],
+            on_full=s["on_full"],
+            max_retries=s["max_retries"],
+            backoff_seconds=s["backoff_seconds"],
+            backoff_max_seconds=s["backoff_max_seconds"],
+            spool_dir=s["spool_dir"],
+            pipeline=s["pipeline"],
+            request_timeout_seconds=s["request_timeout_seconds"],
+            service_name=os.getenv("ELASTIC_APM_SERVICE_NAME", "atomic-agent-service"),
+            env=os.getenv("ELASTIC_APM_ENVIRONMENT", "dev"),
+        )
+
+    def submit(self, entry):
+        """Buffer one event; never blocks the caller unless on_full is 'block'."""
+        return self.submit_document(to_document(entry, self.service_name, self.env))
+
+    def submit_document(self, doc):
+        """Buffer an already-shaped document (e.g. a metrics rollup)."""
+        try:
+            if self.block_when_full:
+                self._queue.put(doc)
+            else:
+                self._queue.put_nowait(doc)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+        self.stats["submitted"] += 1
+        return True
+
+    def close(self, timeout=30.0):
+        """Stop accepting events, flush what is buffered and join the sender thread."""
+        self._stop.set()
+        self._thread.join(timeout)
+
+    # ---- sender thread ----
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+                # Drain whatever is already waiting without another wakeup.
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            stopping = self._stop.is_set()
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline or stopping:
+                if batch:
+                    if self._deliver(batch):
+                        self._replay_spool()
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+            if stopping and self._queue.empty():
+                return
+
+    def _deliver(self, docs):
+        """Send with retries; spool what still fails. Returns True if everything was indexed."""
+        pending = docs
+        for attempt in range(self.max_retries + 1):
+            try:
+                pending = self._send(pending)
+            except Exception as exc:
+                print(f"[WARN] Bulk request failed ({exc}); attempt {attempt + 1}/{self.max_retries + 1}.")
+            if not pending:
+                return True
+            if attempt < self.max_retries:
+                self.stats["retries"] += 1
+                delay = min(self.backoff_max, self.backoff * (2 ** attempt))
+                if self._stop.wait(delay * random.uniform(0.5, 1.0)):
+                    # Shutting down: do not sit in backoff, spool instead.
+                    break
+        self._spool(pending)
+        return False
+
+    def _send(self, docs):
+        """One bulk call. Returns the docs that should be retried."""
+        operations = []
+        for doc in docs:
+            operations.append({"create": {}})
+            operations.append(doc)
+        kwargs = {"index": self.data_stream, "operations": operations}
+        if self.pipeline:
+            kwargs["pipeline"] = self.pipeline
+        resp = self.client.options(request_timeout=self.request_timeout).bulk(**kwargs)
+        if not resp.get("errors"):
+            self.stats["sent"] += len(docs)
+            return []
+
+        retry, rejected = [], []
+        for doc, item in zip(docs, resp.get("items", [])):
+            result = item.get("create", {})
+            status = int(result.get("status", 500))
+            if status < 300:
+                self.stats["sent"] += 1
+            elif status in RETRYABLE_STATUS:
+                retry.append(doc)
+            else:
+                rejected.append(doc)
+        if rejected:
+            # Mapping or validation errors will not succeed on retry.
+            print(f"[WARN] {len(rejected)} docs rejected by Elasticsearch; spooling for inspection.")
+            self._spool(rejected, prefix="rejected")
+        return retry
+
+    def _spool(self, docs, prefix="spool"):
+        if not docs:
+            return
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        path = self.spool_dir / f"{prefix}-{time.time_ns()}.ndjson"
+        with open(path, "w", encoding="utf-8") as f:
+            for doc in docs:
+                f.write(json.dumps(doc) + "\n")
+        self.stats["spooled"] += len(docs)
+        print(f"[WARN] Spooled {len(docs)} events to {path}")
+
+    def _replay_spool(self):
+        if not self.spool_dir.exists():
+            return
+        spooled = sorted(self.spool_dir.glob("spool-*.ndjson"))
+        if not spooled:
+            return
+        # One file per successful flush keeps replay from starving live traffic.
+        path = spooled[0]
+        with open(path, "r", encoding="utf-8") as f:
+            docs = [json.loads(line) for line in f if line.strip()]
+        path.unlink()
+        if self._deliver(docs):
+            self.stats["replayed"] += len(docs)
@@ -0,0 +1,188 @@
+"""
+Buffered, off-thread log writing for the Atomic Agent.
+
+The action path only enqueues a pre-serialised line (QueueHandler); a
+QueueListener thread hands records to BatchingRotatingFileHandler, which
+writes them without a per-line flush and flushes every `batch_size` lines or
+`flush_interval_ms`, whichever comes first. Rotation keeps the same
+maxBytes/backupCount semantics the Elastic Agent tailer already expects.
+"""
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+
+
+WRITER_DEFAULTS = {
+    "mode": "queue",            # sync | queue
+    "serializer": "auto",       # json | orjson | auto
+    "batch_size": 256,
+    "flush_interval_ms": 200,
+    "fsync": False,
+    "queue_size": 100_000,      # 0 = unbounded
+    "on_full": "block",         # block | drop
+    "max_bytes": 5_000_000,
+    "backup_count": 3,
+}
+
+
+def writer_settings(config):
+    settings = dict(WRITER_DEFAULTS)
+    settings.update(config.get("log_writer") or {})
+    return settings
+
+
+def get_serializer(name="auto"):
+    """Return a dict -> str serializer. orjson is used when requested or, for `auto`, when installed."""
+    if name in ("orjson", "auto"):
+        try:
+            import orjson
+            return lambda obj: orjson.dumps(obj).decode("utf-8")
+        except ImportError:
+            if name == "orjson":
+                raise RuntimeError("log_writer.serializer is 'orjson' but orjson is not installed.")
+    return json.dumps
+
+
+class BatchingRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler that defers flushes. Size is tracked in memory so the
+    per-record rollover check does not seek/tell the file.
+    """
+
+    def __init__(self, filename, maxBytes=0, backupCount=0, batch_size=256,
+                 flush_interval_ms=200, fsync=False, encoding="utf-8"):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding)
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_interval_ms) / 1000.0)
+        self.fsync = bool(fsync)
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._size = self._current_size()
+        self._stop_flusher = threading.Event()
+        self._flusher = None
+        if self.flush_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name="atomic-log-flusher", daemon=True)
+            self._flusher.start()
+
+    def _current_size(self):
+        try:
+            return os.path.getsize(self.baseFilename)
+        except OSError:
+            return 0
+
+    def shouldRollover(self, record):
+        if self.maxBytes <= 0:
+            return False
+        return self._size + len(record.getMessage()) + 1 >= self.maxBytes
+
+    def doRollover(self):
+        self._flush_locked()
+        super().doRollover()
+        self._size = 0
+
+    def emit(self, record):
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            line = self.format(record) + self.terminator
+            self.stream.write(line)
+            self._size += len(line)
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self._flush_locked()
+        except Exception:
+            self.handleError(record)
+
+    def _flush_locked(self):
+        if self.stream is None or not self._pending:
+            return
+        self.stream.flush()
+        if self.fsync:
+            os.fsync(self.stream.fileno())
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        self.acquire()
+        try:
+            self._flush_locked()
+        finally:
+            self.release()
+
+    def _flush_loop(self):
+        while not self._stop_flusher.wait(self.flush_interval):
+            if self._pending and time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+    def close(self):
+        self._stop_flusher.set()
+        self.flush()
+        super().close()
+
+
+class _AgentQueueHandler(QueueHandler):
+    """QueueHandler for pre-serialised lines: no record copy, optional drop-on-full."""
+
+    def __init__(self, log_queue, drop_when_full=False):
+        super().__init__(log_queue)
+        self.drop_when_full = drop_when_full
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        if self.drop_when_full:
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+        else:
+            self.queue.put(record)
+
+
+_LISTENERS = []
+
+
+def build_handlers(log_file, settings):
+    """Return (handler to attach to the logger, listener or None)."""
+    formatter = logging.Formatter("%(message)s")
+    if settings["mode"] == "sync":
+        handler = RotatingFileHandler(log_file, maxBytes=int(settings["max_bytes"]),
+                                      backupCount=int(settings["backup_count"]))
+        handler.setFormatter(formatter)
+        return handler, None
+
+    file_handler = BatchingRotatingFileHandler(
+        log_file,
+        maxBytes=int(settings["max_bytes"]),
+        backupCount=int(settings["backup_count"]),
+        batch_size=settings["batch_size"],
+        flush_interval_ms=settings["flush_interval_ms"],
+        fsync=settings["fsync"],
+    )
+    file_handler.setFormatter(formatter)
+    log_queue = queue.Queue(maxsize=int(settings["queue_size"]))
+    handler = _AgentQueueHandler(log_queue, drop_when_full=settings["on_full"] == "drop")
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=False)
+    listener.start()
+    _LISTENERS.append((listener, file_handler))
+    return handler, listener
+
+
+def shutdown_writers():
+    """Drain queued lines and flush/close files. Safe to call more than once."""
+    while _LISTENERS:
+        listener, file_handler = _LISTENERS.pop()
+        listener.stop()
+        file_handler.close()
+
+
+atexit.register(shutdown_writers)
@@ -0,0 +1,356 @@
+"""
+Streaming log-to-metrics aggregation for Atomic Agent events.
+
+Events come either in-process (the agent calls `observe` for each event) or
+from tailing agent.log across rotations. They are counted per
+(action, status) in fixed time buckets with a mergeable latency sketch per
+bucket. Every emit interval the buckets inside the sliding window are merged
+into compact rollup documents, so dashboards read a handful of rollups
+instead of scanning raw events.
+
+LatencySketch is a DDSketch-style log-bucketed histogram: quantiles have a
+bounded relative error (`relative_accuracy`) and two sketches merge by adding
+bucket counts, so rollups can be re-aggregated across agents and windows.
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import datetime
+import threading
+from pathlib import Path
+
+
+METRICS_DEFAULTS = {
+    "enabled": False,
+    "window_seconds": 60,
+    "bucket_seconds": 10,
+    "emit_interval_seconds": 10,
+    "relative_accuracy": 0.01,
+    "output": "rollups.ndjson",     # empty = do not write a file
+    "ship_to_bulk": False,          # also send rollups through the bulk sink
+    "rollup_data_stream": "atomic-agent-rollups",
+}
+
+
+def metrics_settings(config):
+    settings = dict(METRICS_DEFAULTS)
+    settings.update(config.get("metrics") or {})
+    return settings
+
+
+class LatencySketch:
+    def __init__(self, relative_accuracy=0.01):
+        self.alpha = float(relative_accuracy)
+        self._log_gamma = math.log((1.0 + self.alpha) / (1.0 - self.alpha))
+        self.bins = {}
+        self.zero = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        value = float(value)
+        if value <= 0:
+            self.zero += 1
+        else:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[key] = self.bins.get(key, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        if other.alpha != self.alpha:
+            raise ValueError("Cannot merge sketches with different relative accuracy.")
+        for key, n in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + n
+        self.zero += other.zero
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                # Midpoint of the bucket (gamma^(k-1), gamma^k] in log space.
+                value = 2.0 * math.exp(key * self._log_gamma) / (1.0 + math.exp(self._log_gamma))
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "alpha": self.alpha,
+            "zero": self.zero,
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "bins": {str(k): n for k, n in sorted(self.bins.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["alpha"])
+        sketch.bins = {int(k): int(n) for k, n in data.get("bins", {}).items()}
+        sketch.zero = int(data.get("zero", 0))
+        sketch.count = int(data.get("count", 0))
+        sketch.total = float(data.get("sum", 0.0))
+        if sketch.count:
+            sketch.min = float(data["min"])
+            sketch.max = float(data["max"])
+        return sketch
+
+
+def _event_time(entry, default):
+    ts = entry.get("timestamp")
+    if not ts:
+        return default
+    try:
+        if ts.endswith("Z"):
+            ts = ts[:-1] + "+00:00"
+        return datetime.datetime.fromisoformat(ts).timestamp()
+    except ValueError:
+        return default
+
+
+def _iso(epoch):
+    return datetime.datetime.fromtimestamp(epoch, tz=datetime.timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+class SlidingWindowAggregator:
+    def __init__(self, window_seconds=60, bucket_seconds=10, relative_accuracy=0.01):
+        self.window = int(window_seconds)
+        self.bucket = max(1, int(bucket_seconds))
+        self.alpha = float(relative_accuracy)
+        # bucket start (epoch seconds) -> {(action, status): LatencySketch}
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.late_events = 0
+
+    def observe(self, entry, now=None):
+        now = time.time() if now is None else now
+        ts = _event_time(entry, now)
+        start = int(ts // self.bucket) * self.bucket
+        if start < now - self.window - self.bucket:
+            # Older than the window; it would never be emitted.
+            self.late_events += 1
+            return
+        key = (entry.get("action", "unknown"), entry.get("status", "unknown"))
+        with self._lock:
+            series = self._buckets.setdefault(start, {})
+            sketch = series.get(key)
+            if sketch is None:
+                sketch = series[key] = LatencySketch(self.alpha)
+            sketch.add(entry.get("latency_ms", 0))
+
+    def rollup(self, now=None, source=None):
+        """Merge buckets inside the window into one doc per (action, status); drop expired buckets."""
+        now = time.time() if now is None else now
+        cutoff = now - self.window
+        merged = {}
+        with self._lock:
+            for start in list(self._buckets):
+                if start + self.bucket <= cutoff:
+                    del self._buckets[start]
+                    continue
+                for key, sketch in self._buckets[start].items():
+                    acc = merged.get(key)
+                    if acc is None:
+                        acc = merged[key] = LatencySketch(self.alpha)
+                    acc.merge(sketch)
+
+        totals = {}
+        errors = {}
+        for (action, status), sketch in merged.items():
+            totals[action] = totals.get(action, 0) + sketch.count
+            if status != "OK":
+                errors[action] = errors.get(action, 0) + sketch.count
+
+        docs = []
+        for (action, status), sketch in sorted(merged.items()):
+            doc = {
+                "@timestamp": _iso(now),
+                "rollup": {
+                    "window_seconds": self.window,
+                    "action": action,
+                    "status": status,
+                    "count": sketch.count,
+                    "rate_per_s": round(sketch.count / self.window, 3),
+                    "action_error_rate": round(errors.get(action, 0) / totals[action], 4),
+                    "latency_ms": {
+                        "mean": round(sketch.total / sketch.count, 2),
+                        "p50": round(sketch.quantile(0.50), 2),
+                        "p90": round(sketch.quantile(0.90), 2),
+                        "p99": round(sketch.quantile(0.99), 2),
+                        "max": sketch.max,
+                    },
+                    "sketch": sketch.to_dict(),
+                },
+            }
+            if source:
+                doc["rollup"]["source"] = source
+            docs.append(doc)
+        return docs
+
+
+class RollupEmitter:
+    """Background thread that emits rollups every interval to a file and/or a bulk sink."""
+
+    def __init__(self, aggregator, interval_seconds=10, output="", sink=None, source=None):
+        self.aggregator = aggregator
+        self.interval = float(interval_seconds)
+        self.output = Path(output) if output else None
+        self.sink = sink
+        self.source = source
+        self.emitted = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="atomic-rollups", daemon=True)
+        self._thread.start()
+
+    def emit(self):
+        docs = self.aggregator.rollup(source=self.source)
+        if not docs:
+            return 0
+        if self.output:
+            with open(self.output, "a", encoding="utf-8") as f:
+                for doc in docs:
+                    f.write(json.dumps(doc) + "\n")
+        if self.sink is not None:
+            for doc in docs:
+                self.sink.submit_document(doc)
+        self.emitted += len(docs)
+        return len(docs)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.emit()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(self.interval + 5)
+        self.emit()
+
+
+class LogTailer:
+    """
+    Follow a log file across RotatingFileHandler rotations. When the path
+    points at a new inode (or the file shrank), the old handle is read to EOF
+    first so no lines written just before rotation are lost.
+    """
+
+    def __init__(self, path, from_start=False, poll_seconds=0.2):
+        self.path = Path(path)
+        self.poll = poll_seconds
+        self._f = None
+        self._inode = None
+        self._open(seek_end=not from_start)
+
+    def _open(self, seek_end=False):
+        try:
+            f = open(self.path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            self._f, self._inode = None, None
+            return
+        st = os.fstat(f.fileno())
+        if seek_end:
+            f.seek(0, os.SEEK_END)
+        self._f, self._inode = f, st.st_ino
+
+    def _rotated(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return st.st_ino != self._inode or st.st_size < self._f.tell()
+
+    def lines(self, stop=None):
+        partial = ""
+        while stop is None or not stop.is_set():
+            if self._f is None:
+                self._open()
+                if self._f is None:
+                    time.sleep(self.poll)
+                    continue
+            chunk = self._f.readline()
+            if chunk:
+                partial += chunk
+                if partial.endswith("\n"):
+                    yield partial.rstrip("\n")
+                    partial = ""
+                continue
+            if self._rotated():
+                self._f.close()
+                self._open()
+                continue
+            time.sleep(self.poll)
+
+
+def tail_and_aggregate(log_file, settings, from_start=False, sink=None):
+    aggregator = SlidingWindowAggregator(settings["window_seconds"], settings["bucket_seconds"],
+                                         settings["relative_accuracy"])
+    emitter = RollupEmitter(aggregator, settings["emit_interval_seconds"], settings["output"], sink)
+    parsed = 0
+    try:
+        for line in LogTailer(log_file, from_start=from_start).lines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            aggregator.observe(entry)
+            parsed += 1
+    except KeyboardInterrupt:
+        print(f"[INFO] Aggregator stopped. events={parsed} rollups={emitter.emitted} late={aggregator.late_events}")
+    finally:
+        emitter.close()
+
+
+def main():
+    import yaml
+
+    ap = argparse.ArgumentParser(description="Tail agent.log and emit windowed latency/error rollups.")
+    ap.add_argument("--config", default="config.yaml")
+    ap.add_argument("--log_file", default=None, help="Log to tail (default: log_file from config)")
+    ap.add_argument("--from_start", action="store_true", help="Read the existing file before following it")
+    ap.add_argument("--output", default=None, help="NDJSON rollup output (default: metrics.output)")
+    args = ap.parse_args()
+
+    config = {}
+    if os.path.exists(args.config):
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+    settings = metrics_settings(config)
+    if args.output is not None:
+        settings["output"] = args.output
+
+    sink = None
+    if settings["ship_to_bulk"]:
+        from bulk_sink import BulkSink
+        config.setdefault("bulk_sink", {})["data_stream"] = settings["rollup_data_stream"]
+        sink = BulkSink.from_config(config)
+
+    log_file = args.log_file or config.get("log_file", "agent.log")
+    print(f"[INFO] Aggregating {log_file}: window={settings['window_seconds']}s "
+          f"bucket={settings['bucket_seconds']}s emit every {settings['emit_interval_seconds']}s", file=sys.stderr)
+    try:
+        tail_and_aggregate(log_file, settings, from_start=args.from_start, sink=sink)
+    finally:
+        if sink is not None:
+            sink.close()
+
+
+if __name__ == "__main__":
+    main()
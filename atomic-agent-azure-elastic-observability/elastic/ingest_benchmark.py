@@ -0,0 +1,471 @@
+"""
+Ingest throughput benchmark for the Atomic Agent pipeline and index template.
+
+Synthetic atomic_agent events are run through a local simulation of the
+ingest pipeline processors and of the per-field indexing work implied by the
+template mapping (keyword/text/date/numeric parsing, dense_vector checks).
+It reports docs/sec and nanoseconds per doc per processor, so pipeline and
+template variants can be compared before rollout:
+
+    python elastic/ingest_benchmark.py \
+        --pipeline elastic/ingest_pipeline.json --pipeline my_pipeline.json \
+        --template elastic/index_template.json --docs 200000 --out bench.json
+
+With --live the same docs are also bulk-indexed into a throwaway index on
+the cluster in ES_ENDPOINT / ES_API_KEY, for an end-to-end docs/sec number.
+"""
+import os
+import re
+import sys
+import copy
+import json
+import math
+import time
+import random
+import argparse
+import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+
+HERE = Path(__file__).resolve().parent
+ACTIONS = ["fetch_data", "process_order", "run_batch", "send_notification"]
+ERROR_DETAILS = [
+    "timeout while calling downstream API",
+    "database connection failure",
+    "invalid input payload",
+    "permission denied on resource",
+]
+_TOKEN_RE = re.compile(r"\w+")
+_MUSTACHE_RE = re.compile(r"\{\{\{?\s*([\w.@]+)\s*\}?\}\}")
+
+
+def get_env(name, default=""):
+    value = os.getenv(name)
+    return value if value else default
+
+
+# ---- synthetic input ----
+
+def synthetic_events(n: int, agents: int = 10, vector_dims: int = 0, seed: int = 7) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    now = datetime.datetime.utcnow()
+    events = []
+    for i in range(n):
+        action = rng.choice(ACTIONS)
+        ok = rng.random() <= 0.8
+        detail = "completed successfully" if ok else rng.choice(ERROR_DETAILS)
+        ts = now - datetime.timedelta(milliseconds=(n - i) * 10)
+        entry = {
+            "timestamp": ts.isoformat(timespec="milliseconds") + "Z",
+            "agent_id": f"agent-{rng.randint(1, agents):02d}",
+            "action": action,
+            "status": "OK" if ok else "ERROR",
+            "message": f"{action} {detail}.",
+            "latency_ms": rng.randint(100, 800),
+        }
+        events.append(entry)
+    return events
+
+
+def to_input_doc(entry: Dict[str, Any], shape: str, vector: Optional[List[float]] = None) -> Dict[str, Any]:
+    """
+    raw:    what a plain file tailer sends (the JSON line in `message`), which
+            is what the pipeline's json processor expects.
+    ndjson: what the Elastic Agent ndjson parser with overwrite_keys sends
+            (keys already decoded at the edge).
+    """
+    if shape == "ndjson":
+        doc = dict(entry)
+    else:
+        doc = {"@timestamp": entry["timestamp"], "message": json.dumps(entry)}
+    if vector is not None:
+        doc["log_vector"] = vector
+    return doc
+
+
+def paced(docs: List[Dict[str, Any]], rate: float):
+    """Yield docs at `rate` docs/sec (0 = as fast as possible)."""
+    if rate <= 0:
+        yield from docs
+        return
+    start = time.perf_counter()
+    for i, doc in enumerate(docs):
+        due = start + i / rate
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        yield doc
+
+
+# ---- field helpers ----
+
+def _get(doc: Dict[str, Any], path: str):
+    if path in doc:
+        return doc[path]
+    cur: Any = doc
+    for part in path.split("."):
+        if not isinstance(cur, dict) or part not in cur:
+            return None
+        cur = cur[part]
+    return cur
+
+
+def _set(doc: Dict[str, Any], path: str, value):
+    cur = doc
+    parts = path.split(".")
+    for part in parts[:-1]:
+        cur = cur.setdefault(part, {})
+    cur[parts[-1]] = value
+
+
+def _remove(doc: Dict[str, Any], path: str) -> bool:
+    cur = doc
+    parts = path.split(".")
+    for part in parts[:-1]:
+        if not isinstance(cur, dict) or part not in cur:
+            return False
+        cur = cur[part]
+    return cur.pop(parts[-1], None) is not None
+
+
+def _render(template, doc):
+    if not isinstance(template, str) or "{{" not in template:
+        return template
+    return _MUSTACHE_RE.sub(lambda m: str(_get(doc, m.group(1)) or ""), template)
+
+
+def _parse_date(value):
+    if isinstance(value, (int, float)):
+        return value
+    text = str(value)
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    return datetime.datetime.fromisoformat(text)
+
+
+# ---- processor simulation ----
+
+class ProcessorError(Exception):
+    pass
+
+
+def _proc_json(doc, cfg):
+    raw = _get(doc, cfg["field"])
+    if not isinstance(raw, str):
+        raise ProcessorError("field is not a string")
+    try:
+        parsed = json.loads(raw)
+    except ValueError as exc:
+        raise ProcessorError(str(exc))
+    if cfg.get("add_to_root"):
+        doc.update(parsed)
+    else:
+        _set(doc, cfg.get("target_field", cfg["field"]), parsed)
+
+
+def _proc_set(doc, cfg):
+    if not cfg.get("override", True) and _get(doc, cfg["field"]) is not None:
+        return
+    if "copy_from" in cfg:
+        _set(doc, cfg["field"], copy.deepcopy(_get(doc, cfg["copy_from"])))
+    else:
+        _set(doc, cfg["field"], _render(cfg.get("value"), doc))
+
+
+def _proc_rename(doc, cfg):
+    value = _get(doc, cfg["field"])
+    if value is None:
+        raise ProcessorError("field missing")
+    _remove(doc, cfg["field"])
+    _set(doc, cfg["target_field"], value)
+
+
+def _proc_remove(doc, cfg):
+    fields = cfg["field"] if isinstance(cfg["field"], list) else [cfg["field"]]
+    for f in fields:
+        if not _remove(doc, f) and not cfg.get("ignore_missing"):
+            raise ProcessorError(f"{f} missing")
+
+
+def _proc_case(fn):
+    def run(doc, cfg):
+        value = _get(doc, cfg["field"])
+        if not isinstance(value, str):
+            raise ProcessorError("field is not a string")
+        _set(doc, cfg.get("target_field", cfg["field"]), fn(value))
+    return run
+
+
+def _proc_convert(doc, cfg):
+    value = _get(doc, cfg["field"])
+    kind = cfg["type"]
+    try:
+        if kind in ("integer", "long"):
+            value = int(value)
+        elif kind in ("float", "double"):
+            value = float(value)
+        elif kind == "boolean":
+            value = str(value).lower() == "true"
+        elif kind == "string":
+            value = str(value)
+    except (TypeError, ValueError) as exc:
+        raise ProcessorError(str(exc))
+    _set(doc, cfg.get("target_field", cfg["field"]), value)
+
+
+def _proc_date(doc, cfg):
+    value = _get(doc, cfg["field"])
+    try:
+        parsed = _parse_date(value)
+    except (TypeError, ValueError) as exc:
+        raise ProcessorError(str(exc))
+    _set(doc, cfg.get("target_field", "@timestamp"), parsed.isoformat() if hasattr(parsed, "isoformat") else parsed)
+
+
+PROCESSORS = {
+    "json": _proc_json,
+    "set": _proc_set,
+    "rename": _proc_rename,
+    "remove": _proc_remove,
+    "lowercase": _proc_case(str.lower),
+    "uppercase": _proc_case(str.upper),
+    "trim": _proc_case(str.strip),
+    "convert": _proc_convert,
+    "date": _proc_date,
+}
+
+
+def compile_pipeline(pipeline: Dict[str, Any]) -> List[Tuple[str, Any, Dict[str, Any]]]:
+    steps = []
+    for i, proc in enumerate(pipeline.get("processors", [])):
+        (kind, cfg), = proc.items()
+        label = cfg.get("tag") or f"{i}:{kind}"
+        fn = PROCESSORS.get(kind)
+        if fn is None:
+            print(f"[WARN] Processor {kind!r} is not simulated; it is skipped and not timed.", file=sys.stderr)
+            continue
+        if "if" in cfg:
+            print(f"[WARN] Condition on {label} is ignored; the processor always runs.", file=sys.stderr)
+        steps.append((label, fn, cfg))
+    return steps
+
+
+# ---- mapping simulation ----
+
+def compile_mapping(template: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Flatten template mappings into {dotted.path: field mapping}."""
+    flat: Dict[str, Dict[str, Any]] = {}
+
+    def walk(props, prefix):
+        for name, spec in props.items():
+            path = f"{prefix}{name}"
+            if "properties" in spec:
+                walk(spec["properties"], path + ".")
+            else:
+                flat[path] = spec
+
+    walk(template.get("template", {}).get("mappings", {}).get("properties", {}), "")
+    return flat
+
+
+def _index_value(spec, value):
+    kind = spec.get("type", "object")
+    if kind == "keyword":
+        return str(value)
+    if kind in ("text", "match_only_text"):
+        return _TOKEN_RE.findall(str(value).lower())
+    if kind == "date":
+        return _parse_date(value)
+    if kind in ("integer", "long", "short", "byte"):
+        return int(value)
+    if kind in ("float", "double", "half_float", "scaled_float"):
+        return float(value)
+    if kind == "dense_vector":
+        if len(value) != spec.get("dims", len(value)):
+            raise ValueError("dense_vector dims mismatch")
+        norm = math.sqrt(sum(x * x for x in value))
+        if spec.get("similarity") == "cosine" and norm == 0:
+            raise ValueError("zero vector with cosine similarity")
+        return norm
+    return value
+
+
+def _dynamic_value(value):
+    # Dynamic mapping: type inference + index as keyword/number.
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return value[:256]
+    return value
+
+
+def index_document(doc: Dict[str, Any], mapping: Dict[str, Dict[str, Any]], stats: Dict[str, int]):
+    def walk(obj, prefix):
+        for key, value in obj.items():
+            path = f"{prefix}{key}"
+            spec = mapping.get(path)
+            if spec is not None:
+                try:
+                    _index_value(spec, value)
+                    stats["mapped_fields"] += 1
+                except (TypeError, ValueError):
+                    stats["mapping_errors"] += 1
+            elif isinstance(value, dict):
+                walk(value, path + ".")
+            else:
+                _dynamic_value(value)
+                stats["dynamic_fields"] += 1
+    walk(doc, "")
+
+
+# ---- runs ----
+
+def run_variant(name: str, pipeline: Dict[str, Any], template: Dict[str, Any],
+                docs: List[Dict[str, Any]], rate: float) -> Dict[str, Any]:
+    steps = compile_pipeline(pipeline)
+    mapping = compile_mapping(template)
+    proc_ns = [0] * len(steps)
+    proc_fail = [0] * len(steps)
+    map_ns = 0
+    map_stats = {"mapped_fields": 0, "dynamic_fields": 0, "mapping_errors": 0}
+    bytes_in = 0
+
+    started = time.perf_counter()
+    for src in paced(docs, rate):
+        doc = copy.deepcopy(src)
+        bytes_in += len(json.dumps(doc))
+        for i, (label, fn, cfg) in enumerate(steps):
+            t = time.perf_counter_ns()
+            try:
+                fn(doc, cfg)
+            except ProcessorError:
+                proc_fail[i] += 1
+            proc_ns[i] += time.perf_counter_ns() - t
+        t = time.perf_counter_ns()
+        index_document(doc, mapping, map_stats)
+        map_ns += time.perf_counter_ns() - t
+    elapsed = time.perf_counter() - started
+
+    n = max(1, len(docs))
+    return {
+        "variant": name,
+        "docs": len(docs),
+        "docs_per_s": round(len(docs) / elapsed, 1) if elapsed else None,
+        "pipeline_ns_per_doc": round(sum(proc_ns) / n, 1),
+        "mapping_ns_per_doc": round(map_ns / n, 1),
+        "avg_doc_bytes": round(bytes_in / n, 1),
+        "processors": [
+            {"processor": label, "ns_per_doc": round(proc_ns[i] / n, 1), "failures": proc_fail[i]}
+            for i, (label, _, _) in enumerate(steps)
+        ],
+        "mapping": {k: round(v / n, 2) for k, v in map_stats.items()},
+    }
+
+
+def run_live(name: str, pipeline: Dict[str, Any], template: Dict[str, Any],
+             docs: List[Dict[str, Any]], batch_size: int) -> Dict[str, Any]:
+    from elasticsearch import Elasticsearch
+
+    endpoint = get_env("ES_ENDPOINT")
+    api_key = get_env("ES_API_KEY")
+    if not endpoint or not api_key:
+        raise RuntimeError("ES_ENDPOINT and ES_API_KEY must be set for --live.")
+    es = Elasticsearch(endpoint, api_key=api_key, verify_certs=True)
+
+    suffix = f"{int(time.time())}-{re.sub(r'[^a-z0-9]+', '-', name.lower())}"
+    pipeline_id = f"atomic-bench-{suffix}"
+    index = f"atomic-bench-{suffix}"
+    tpl = template.get("template", {})
+    es.ingest.put_pipeline(id=pipeline_id, body=pipeline)
+    es.indices.create(index=index, mappings=tpl.get("mappings"), settings=tpl.get("settings"))
+    try:
+        started = time.perf_counter()
+        errors = 0
+        for i in range(0, len(docs), batch_size):
+            ops = []
+            for doc in docs[i:i + batch_size]:
+                ops.append({"create": {}})
+                ops.append(doc)
+            resp = es.bulk(index=index, operations=ops, pipeline=pipeline_id)
+            if resp.get("errors"):
+                errors += sum(1 for it in resp["items"] if it.get("create", {}).get("status", 500) >= 300)
+        es.indices.refresh(index=index)
+        elapsed = time.perf_counter() - started
+        return {"docs": len(docs), "docs_per_s": round(len(docs) / elapsed, 1), "errors": errors,
+                "batch_size": batch_size}
+    finally:
+        es.indices.delete(index=index, ignore_unavailable=True)
+        es.ingest.delete_pipeline(id=pipeline_id)
+
+
+def print_table(results: List[Dict[str, Any]]):
+    base = results[0]
+    print(f"{'variant':40s} {'docs/s':>10s} {'pipeline ns':>12s} {'mapping ns':>11s} {'vs base':>8s}")
+    for r in results:
+        delta = (r["docs_per_s"] / base["docs_per_s"] - 1.0) * 100 if base["docs_per_s"] else 0.0
+        print(f"{r['variant'][:40]:40s} {r['docs_per_s']:>10.0f} {r['pipeline_ns_per_doc']:>12.0f} "
+              f"{r['mapping_ns_per_doc']:>11.0f} {delta:>+7.1f}%")
+        for p in r["processors"]:
+            print(f"    {p['processor'][:36]:36s} {p['ns_per_doc']:>10.0f} ns/doc  failures={p['failures']}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark ingest pipeline / index template variants locally.")
+    ap.add_argument("--pipeline", action="append", help="Pipeline JSON (repeatable; default: ingest_pipeline.json)")
+    ap.add_argument("--template", action="append", help="Index template JSON (repeatable; default: index_template.json)")
+    ap.add_argument("--docs", type=int, default=100_000)
+    ap.add_argument("--rate", type=float, default=0, help="Generate docs at this rate (docs/sec); 0 = unthrottled")
+    ap.add_argument("--input", choices=["raw", "ndjson"], default="raw", help="Shape of docs entering the pipeline")
+    ap.add_argument("--vector_dims", type=int, default=0, help="Attach a log_vector of this size to every doc")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--live", action="store_true", help="Also bulk-index into a throwaway index on ES_ENDPOINT")
+    ap.add_argument("--bulk_size", type=int, default=1000)
+    ap.add_argument("--out", default=None, help="Write JSON report here")
+    args = ap.parse_args()
+
+    pipelines = args.pipeline or [str(HERE / "ingest_pipeline.json")]
+    templates = args.template or [str(HERE / "index_template.json")]
+
+    rng = random.Random(args.seed)
+    events = synthetic_events(args.docs, seed=args.seed)
+    docs = []
+    for e in events:
+        vec = [rng.uniform(-1, 1) for _ in range(args.vector_dims)] if args.vector_dims else None
+        docs.append(to_input_doc(e, args.input, vec))
+
+    results = []
+    for p_path in pipelines:
+        pipeline = json.loads(Path(p_path).read_text(encoding="utf-8"))
+        for t_path in templates:
+            template = json.loads(Path(t_path).read_text(encoding="utf-8"))
+            name = f"{Path(p_path).stem} + {Path(t_path).stem}"
+            print(f"[INFO] Running {name} on {len(docs)} docs", file=sys.stderr)
+            result = run_variant(name, pipeline, template, docs, args.rate)
+            result.update({"pipeline": p_path, "template": t_path, "input": args.input})
+            if args.live:
+                result["live"] = run_live(name, pipeline, template, docs, args.bulk_size)
+            results.append(result)
+
+    print_table(results)
+    if args.out:
+        report = {
+            "generated_at": datetime.datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": sys.version.split()[0],
+            "docs": args.docs, "input": args.input, "vector_dims": args.vector_dims, "seed": args.seed,
+            "results": results,
+        }
+        Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\n[INFO] Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
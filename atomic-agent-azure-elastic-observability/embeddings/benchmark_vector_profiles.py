@@ -0,0 +1,168 @@
+"""
+Local benchmark for vector profiles: recall@k and latency of each profile's
+dims + quantization against an exact full-precision baseline.
+
+The harness scans vectors exhaustively (no HNSW graph), so latency reflects
+the bytes touched per query, which is what quantization and truncation change.
+Memory estimates include the HNSW level-0 graph (2 * m neighbour ids per doc).
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, Any, List
+
+import numpy as np
+
+from vector_profiles import PROFILES, get_profile
+
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def synthetic_corpus(n: int, dims: int, n_clusters: int, seed: int) -> np.ndarray:
+    # Decaying per-dimension variance mimics Matryoshka embeddings, where the
+    # leading dimensions carry most of the signal.
+    rng = np.random.default_rng(seed)
+    scale = (1.0 / np.sqrt(1.0 + np.arange(dims) / 64.0)).astype(np.float32)
+    centers = rng.standard_normal((n_clusters, dims)).astype(np.float32) * scale
+    labels = rng.integers(0, n_clusters, size=n)
+    x = centers[labels] + 0.35 * rng.standard_normal((n, dims)).astype(np.float32) * scale
+    return normalize(x)
+
+
+def normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (x / norms).astype(np.float32)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, scores.shape[0])
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+def quantize_int8(x: np.ndarray, quantile: float = 0.99):
+    # Elasticsearch int8_hnsw clips at a confidence interval and maps linearly to int8.
+    lo, hi = np.quantile(x, [1.0 - quantile, quantile])
+    scale = (hi - lo) / 255.0 if hi > lo else 1.0
+    q = np.clip(np.round((x - lo) / scale) - 128, -128, 127).astype(np.int8)
+    return q, float(lo), float(scale)
+
+
+def memory_bytes_per_vector(profile: Dict[str, Any]) -> float:
+    d = profile["dims"]
+    graph = 2 * profile["m"] * 4
+    if profile["type"] == "int8_hnsw":
+        return d + 4 + graph
+    if profile["type"] == "bbq_hnsw":
+        return d / 8.0 + 14 + graph
+    return 4 * d + graph
+
+
+class ProfileIndex:
+    def __init__(self, corpus: np.ndarray, profile: Dict[str, Any]):
+        self.profile = profile
+        self.dims = profile["dims"]
+        self.float_vecs = normalize(corpus[:, :self.dims])
+        kind = profile["type"]
+        if kind == "int8_hnsw":
+            self.codes, self.lo, self.scale = quantize_int8(self.float_vecs)
+            self.codes_f = self.codes.astype(np.float32)
+        elif kind == "bbq_hnsw":
+            self.bits = np.packbits(self.float_vecs > 0, axis=1)
+
+    def search(self, query: np.ndarray, k: int, num_candidates: int) -> np.ndarray:
+        q = query[:self.dims]
+        q = q / (np.linalg.norm(q) or 1.0)
+        kind = self.profile["type"]
+        if kind == "hnsw":
+            return top_k(self.float_vecs @ q, k)
+
+        pool = max(k, int(num_candidates * self.profile.get("oversample", 1.0)))
+        if kind == "int8_hnsw":
+            approx = self.codes_f @ q
+        else:
+            qbits = np.packbits(q > 0)
+            approx = -_POPCOUNT[np.bitwise_xor(self.bits, qbits)].sum(axis=1, dtype=np.int32)
+        candidates = top_k(approx.astype(np.float32), pool)
+        # Rescore the candidate pool with the stored float vectors.
+        exact = self.float_vecs[candidates] @ q
+        return candidates[top_k(exact, k)]
+
+
+def run(args) -> Dict[str, Any]:
+    corpus = synthetic_corpus(args.docs, args.dims, args.clusters, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    q_src = corpus[rng.integers(0, args.docs, size=args.queries)]
+    queries = normalize(q_src + 0.05 * rng.standard_normal(q_src.shape).astype(np.float32))
+
+    truth = [set(top_k(corpus @ q, args.k).tolist()) for q in queries]
+
+    names: List[str] = args.profiles or list(PROFILES)
+    results = []
+    for name in names:
+        profile = get_profile(name)
+        t0 = time.perf_counter()
+        index = ProfileIndex(corpus, profile)
+        build_s = time.perf_counter() - t0
+
+        latencies = []
+        hits = 0
+        for q, gt in zip(queries, truth):
+            t = time.perf_counter()
+            found = index.search(q, args.k, args.num_candidates)
+            latencies.append((time.perf_counter() - t) * 1000.0)
+            hits += len(gt & set(found.tolist()))
+
+        lat = np.array(latencies)
+        per_vec = memory_bytes_per_vector(profile)
+        results.append({
+            "profile": name,
+            "dims": profile["dims"],
+            "type": profile["type"],
+            f"recall@{args.k}": round(hits / (len(queries) * args.k), 4),
+            "latency_ms_p50": round(float(np.percentile(lat, 50)), 3),
+            "latency_ms_p99": round(float(np.percentile(lat, 99)), 3),
+            "build_s": round(build_s, 3),
+            "bytes_per_vector": round(per_vec, 1),
+            "gb_at_scale": round(per_vec * args.scale_docs / 1e9, 2),
+        })
+        print(f"[INFO] {name:12s} recall@{args.k}={results[-1][f'recall@{args.k}']:.3f} "
+              f"p50={results[-1]['latency_ms_p50']:.2f}ms "
+              f"mem@{args.scale_docs:,}={results[-1]['gb_at_scale']}GB", file=sys.stderr)
+
+    return {
+        "docs": args.docs, "queries": args.queries, "k": args.k,
+        "num_candidates": args.num_candidates, "scale_docs": args.scale_docs,
+        "results": results,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare recall/latency/memory across vector profiles.")
+    ap.add_argument("--profiles", nargs="*", help=f"Profiles to compare (default: all of {sorted(PROFILES)})")
+    ap.add_argument("--docs", type=int, default=20000)
+    ap.add_argument("--dims", type=int, default=1536)
+    ap.add_argument("--clusters", type=int, default=64)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--num_candidates", type=int, default=25)
+    ap.add_argument("--scale_docs", type=int, default=100_000_000, help="Doc count for memory projection")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", default=None, help="Write JSON report to this path")
+    args = ap.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+        print(f"[INFO] Report written to {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
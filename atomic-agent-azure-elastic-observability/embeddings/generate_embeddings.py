@@ -1,9 +1,12 @@
 import os
+import time
+import argparse
 from typing import List, Dict, Any
 
-from elasticsearch import Elasticsearch
 import requests
 
+from vector_profiles import get_profile, reduce_vector
+
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -17,6 +20,10 @@ def get_env(name, default=""):
 
 
 def create_es_client():
+    if get_env("SEARCH_BACKEND", "elasticsearch") == "local":
+        from local_store import LocalLogStore
+        return LocalLogStore(get_env("LOCAL_STORE_DIR", "local_store"))
+    from elasticsearch import Elasticsearch
     endpoint = get_env("ES_ENDPOINT")
     api_key = get_env("ES_API_KEY")
     if not endpoint or not api_key:
@@ -57,6 +64,14 @@ def get_azure_openai_embedding(text: str) -> List[float]:
     return data["data"][0]["embedding"]
 
 
+def get_embedding(text: str) -> List[float]:
+    default = "hash" if get_env("SEARCH_BACKEND") == "local" else "azure"
+    if get_env("EMBED_BACKEND", default) == "hash":
+        from local_store import hash_embedding
+        return hash_embedding(text)
+    return get_azure_openai_embedding(text)
+
+
 def update_doc_vector(es, index, doc_id, vector):
     es.update(
         index=index,
@@ -65,26 +80,61 @@ def update_doc_vector(es, index, doc_id, vector):
     )
 
 
-def main():
-    es = create_es_client()
-    docs = fetch_docs_without_vectors(es)
-    if not docs:
-        print("[INFO] No docs without log_vector found.")
-        return
-
-    print(f"[INFO] Generating embeddings for {len(docs)} documents.")
+def backfill(es, docs, profile, seen, verbose=True):
+    updated = 0
     for hit in docs:
+        key = (hit["_index"], hit["_id"])
+        if key in seen:
+            continue
+        seen.add(key)
         source = hit.get("_source", {})
         atomic = source.get("atomic", {})
         text = f"{atomic.get('action', '')} - {atomic.get('message', '')}".strip()
         if not text:
             continue
         try:
-            emb = get_azure_openai_embedding(text)
+            emb = reduce_vector(get_embedding(text), profile["dims"])
             update_doc_vector(es, hit["_index"], hit["_id"], emb)
-            print(f"[OK] Updated {hit['_id']} with vector of length {len(emb)}.")
+            updated += 1
+            if verbose:
+                print(f"[OK] Updated {hit['_id']} with vector of length {len(emb)}.")
         except Exception as exc:
             print(f"[ERROR] Failed to update {hit['_id']}: {exc}")
+    return updated
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Backfill log_vector for Atomic Agent logs.")
+    ap.add_argument("--batch_size", type=int, default=50)
+    ap.add_argument("--all", action="store_true", help="Keep fetching batches until no docs are left")
+    ap.add_argument("--quiet", action="store_true", help="Only print batch totals")
+    args = ap.parse_args()
+
+    es = create_es_client()
+    profile = get_profile()
+    seen = set()
+    total = 0
+    started = time.time()
+    while True:
+        docs = fetch_docs_without_vectors(es, size=args.batch_size)
+        if not docs:
+            if not total:
+                print("[INFO] No docs without log_vector found.")
+            break
+
+        print(f"[INFO] Generating embeddings for {len(docs)} documents (profile={profile['name']}, dims={profile['dims']}).")
+        updated = backfill(es, docs, profile, seen, verbose=not args.quiet)
+        total += updated
+        # Updates may not be searchable until the next refresh; stop once a
+        # batch only returns docs we have already handled.
+        if not args.all or not updated:
+            break
+
+    if total:
+        elapsed = time.time() - started
+        print(f"[INFO] Backfilled {total} documents in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} docs/s).")
+    if get_env("SEARCH_BACKEND") == "local":
+        es.flush()
 
 
 if __name__ == "__main__":
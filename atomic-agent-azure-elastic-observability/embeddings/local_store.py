@@ -0,0 +1,460 @@
+"""
+Local, offline stand-in for the Elasticsearch log index.
+
+LocalLogStore implements the subset of the Elasticsearch client used by
+generate_embeddings.py and semantic_search_demo.py (`search` and `update`),
+so the backfill, search and ranking paths run unchanged without a cluster.
+
+Layout of a store directory (all columns are .npy files, memory-mapped):
+    meta.json        count, dims and the vocabularies of categorical columns
+    timestamp.npy    int64 epoch milliseconds
+    agent_id.npy     uint16 codes into vocab["agent_id"]
+    action.npy       uint16 codes into vocab["action"]
+    status.npy       uint16 codes into vocab["status"]
+    message.npy      uint32 codes into vocab["message"]
+    latency_ms.npy   int32
+    vectors.npy      float32 (count, dims), L2-normalised
+    has_vector.npy   bool
+
+Messages are stored as categorical codes: atomic_agent emits a small set of
+message templates, so BM25 is scored once per distinct message and gathered.
+"""
+import os
+import re
+import sys
+import json
+import math
+import hashlib
+import argparse
+import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable
+
+import numpy as np
+
+from vector_profiles import get_profile
+
+
+LOCAL_INDEX = "local-atomic-agent"
+CATEGORICAL = {"agent_id": np.uint16, "action": np.uint16, "status": np.uint16, "message": np.uint32}
+SCAN_BLOCK = 262_144
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+ERROR_DETAILS = [
+    "timeout while calling downstream API",
+    "database connection failure",
+    "invalid input payload",
+    "permission denied on resource",
+]
+DEFAULT_ACTIONS = ["fetch_data", "process_order", "run_batch", "send_notification"]
+
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+
+
+def get_env(name, default=""):
+    value = os.getenv(name)
+    return value if value else default
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def _hash_features(text: str) -> List[str]:
+    tokens = tokenize(text)
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+@lru_cache(maxsize=65536)
+def _hash_embedding_cached(text: str, dims: int) -> tuple:
+    vec = [0.0] * dims
+    for feat in _hash_features(text):
+        digest = hashlib.blake2b(feat.encode("utf-8"), digest_size=8).digest()
+        h = int.from_bytes(digest, "little")
+        vec[h % dims] += 1.0 if (h >> 63) & 1 else -1.0
+    norm = math.sqrt(sum(x * x for x in vec)) or 1.0
+    return tuple(x / norm for x in vec)
+
+
+def hash_embedding(text: str, dims: Optional[int] = None) -> List[float]:
+    """
+    Deterministic feature-hashing embedding (unigrams + bigrams, signed).
+    Stand-in for Azure OpenAI when running offline; identical text always
+    maps to the identical vector, across processes and machines.
+    """
+    dims = dims or get_profile()["dims"]
+    return list(_hash_embedding_cached(text, dims))
+
+
+def parse_es_date(value, now: Optional[datetime.datetime] = None) -> int:
+    """Parse ISO timestamps and simple date math (now, now-24h, now-7d) to epoch ms."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip()
+    m = re.fullmatch(r"now(?:([+-])(\d+)([smhdw]))?", text)
+    if m:
+        ts = now
+        if m.group(1):
+            unit = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days", "w": "weeks"}[m.group(3)]
+            delta = datetime.timedelta(**{unit: int(m.group(2))})
+            ts = now + delta if m.group(1) == "+" else now - delta
+        return int(ts.timestamp() * 1000)
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    ts = datetime.datetime.fromisoformat(text)
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=datetime.timezone.utc)
+    return int(ts.timestamp() * 1000)
+
+
+def _iso_ms(ms: int) -> str:
+    ts = datetime.datetime.fromtimestamp(ms / 1000.0, tz=datetime.timezone.utc)
+    return ts.strftime("%Y-%m-%dT%H:%M:%S.") + f"{ts.microsecond // 1000:03d}Z"
+
+
+def _top_k(scores: np.ndarray, rows: np.ndarray, k: int):
+    if scores.size <= k:
+        order = np.argsort(-scores, kind="stable")
+    else:
+        part = np.argpartition(-scores, k - 1)[:k]
+        order = part[np.argsort(-scores[part], kind="stable")]
+    return scores[order], rows[order]
+
+
+class LocalLogStore:
+    def __init__(self, path: str):
+        self.path = Path(path)
+        meta_path = self.path / "meta.json"
+        if not meta_path.exists():
+            raise RuntimeError(f"No local store at {self.path}; run `python local_store.py synthesize` first.")
+        self.meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        self.count = int(self.meta["count"])
+        self.dims = int(self.meta["dims"])
+        self.vocab: Dict[str, List[str]] = self.meta["vocab"]
+        self._codes = {field: {v: i for i, v in enumerate(vals)} for field, vals in self.vocab.items()}
+        self.columns = {
+            name: np.load(self.path / f"{name}.npy", mmap_mode="r")
+            for name in ["timestamp", "latency_ms", *CATEGORICAL]
+        }
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r+")
+        self.has_vector = np.load(self.path / "has_vector.npy", mmap_mode="r+")
+        self._bm25_stats = None
+
+    # ---- Elasticsearch client surface ----
+
+    def search(self, index: str = LOCAL_INDEX, body: Optional[Dict[str, Any]] = None,
+               size: Optional[int] = None, **_):
+        body = body or {}
+        size = size if size is not None else int(body.get("size", 10))
+        if "retriever" in body:
+            raise NotImplementedError("LocalLogStore does not implement retrievers; use --fusion client.")
+        if "knn" in body:
+            knn = body["knn"]
+            mask = self._filter_mask(knn.get("filter")) & np.asarray(self.has_vector)
+            hits = self._knn(np.asarray(knn["query_vector"], dtype=np.float32), mask, int(knn.get("k", size)))
+        else:
+            hits = self._query(body.get("query", {"match_all": {}}), size)
+        return {"hits": {"total": {"value": len(hits)}, "hits": hits[:size]}}
+
+    def update(self, index: str = LOCAL_INDEX, id: str = "", body: Optional[Dict[str, Any]] = None, **_):
+        vec = (body or {}).get("doc", {}).get("log_vector")
+        if vec is None:
+            return {"result": "noop"}
+        self.update_vectors([int(id)], np.asarray([vec], dtype=np.float32))
+        return {"result": "updated", "_id": id}
+
+    def update_vectors(self, rows: List[int], vectors: np.ndarray):
+        if vectors.shape[1] != self.dims:
+            raise ValueError(f"Vector dims {vectors.shape[1]} do not match store dims {self.dims}.")
+        self.vectors[rows] = vectors
+        self.has_vector[rows] = True
+
+    def flush(self):
+        self.vectors.flush()
+        self.has_vector.flush()
+
+    # ---- query evaluation ----
+
+    def _filter_mask(self, clause) -> np.ndarray:
+        mask = np.ones(self.count, dtype=bool)
+        if not clause:
+            return mask
+        clauses = clause if isinstance(clause, list) else [clause]
+        for c in clauses:
+            mask &= self._clause_mask(c)
+        return mask
+
+    def _clause_mask(self, clause: Dict[str, Any]) -> np.ndarray:
+        (kind, spec), = clause.items()
+        if kind == "match_all":
+            return np.ones(self.count, dtype=bool)
+        if kind == "bool":
+            mask = np.ones(self.count, dtype=bool)
+            for key in ("must", "filter"):
+                for c in _as_list(spec.get(key)):
+                    mask &= self._clause_mask(c)
+            for c in _as_list(spec.get("must_not")):
+                mask &= ~self._clause_mask(c)
+            return mask
+        if kind == "exists":
+            if spec["field"] == "log_vector":
+                return np.asarray(self.has_vector).copy()
+            return np.ones(self.count, dtype=bool)
+        if kind == "range":
+            (field, bounds), = spec.items()
+            col = np.asarray(self.columns[_column(field)])
+            conv = parse_es_date if _column(field) == "timestamp" else (lambda v: v)
+            mask = np.ones(self.count, dtype=bool)
+            for op, value in bounds.items():
+                v = conv(value)
+                if op == "gte":
+                    mask &= col >= v
+                elif op == "gt":
+                    mask &= col > v
+                elif op == "lte":
+                    mask &= col <= v
+                elif op == "lt":
+                    mask &= col < v
+            return mask
+        if kind in ("term", "terms"):
+            (field, values), = spec.items()
+            name = _column(field)
+            values = values if isinstance(values, list) else [values.get("value") if isinstance(values, dict) else values]
+            if name in self._codes:
+                codes = [self._codes[name][v] for v in values if v in self._codes[name]]
+                return np.isin(np.asarray(self.columns[name]), codes)
+            return np.isin(np.asarray(self.columns[name]), values)
+        if kind == "match":
+            return self._bm25_scores(spec) > 0
+        raise NotImplementedError(f"LocalLogStore does not support {kind!r} clauses.")
+
+    def _knn(self, query: np.ndarray, mask: np.ndarray, k: int) -> List[Dict[str, Any]]:
+        if query.shape[0] != self.dims:
+            raise ValueError(f"Query dims {query.shape[0]} do not match store dims {self.dims}.")
+        query = query / (np.linalg.norm(query) or 1.0)
+        best_s = np.empty(0, dtype=np.float32)
+        best_r = np.empty(0, dtype=np.int64)
+        # Exact scan over candidate rows in blocks, so memory stays flat for
+        # stores far larger than RAM.
+        for start in range(0, self.count, SCAN_BLOCK):
+            rows = np.flatnonzero(mask[start:start + SCAN_BLOCK]) + start
+            if rows.size == 0:
+                continue
+            scores = self.vectors[rows] @ query
+            best_s, best_r = _top_k(np.concatenate([best_s, scores]), np.concatenate([best_r, rows]), k)
+        # Elasticsearch reports cosine similarity as (1 + cos) / 2.
+        return [self._hit(int(r), float((1.0 + s) / 2.0)) for s, r in zip(best_s, best_r)]
+
+    def _query(self, query: Dict[str, Any], size: int) -> List[Dict[str, Any]]:
+        mask = self._clause_mask(query)
+        match = _find_match(query)
+        if match is None:
+            rows = np.flatnonzero(mask)[:size]
+            return [self._hit(int(r), 1.0) for r in rows]
+        scores = self._bm25_scores(match)
+        rows = np.flatnonzero(mask & (scores > 0))
+        top_s, top_r = _top_k(scores[rows], rows, size)
+        return [self._hit(int(r), float(s)) for s, r in zip(top_s, top_r)]
+
+    def _bm25_scores(self, match: Dict[str, Any]) -> np.ndarray:
+        (field, spec), = match.items()
+        if _column(field) != "message":
+            raise NotImplementedError("Local BM25 is only available on atomic.message.")
+        text = spec.get("query", "") if isinstance(spec, dict) else spec
+        if self._bm25_stats is None:
+            self._bm25_stats = self._build_bm25_stats()
+        msg_tokens, msg_len, df, avg_len = self._bm25_stats
+
+        per_message = np.zeros(len(msg_tokens), dtype=np.float32)
+        for term in set(tokenize(text)):
+            n_t = df.get(term, 0)
+            if not n_t:
+                continue
+            idf = math.log(1.0 + (self.count - n_t + 0.5) / (n_t + 0.5))
+            for i, toks in enumerate(msg_tokens):
+                tf = toks.count(term)
+                if tf:
+                    norm = BM25_K1 * (1.0 - BM25_B + BM25_B * msg_len[i] / avg_len)
+                    per_message[i] += idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+        return per_message[np.asarray(self.columns["message"])]
+
+    def _build_bm25_stats(self):
+        msg_tokens = [tokenize(m) for m in self.vocab["message"]]
+        msg_len = np.array([len(t) for t in msg_tokens], dtype=np.float32)
+        freq = np.bincount(np.asarray(self.columns["message"]), minlength=len(msg_tokens))
+        df: Dict[str, int] = {}
+        for toks, n in zip(msg_tokens, freq):
+            for t in set(toks):
+                df[t] = df.get(t, 0) + int(n)
+        avg_len = float((msg_len * freq).sum() / max(1, freq.sum())) or 1.0
+        return msg_tokens, msg_len, df, avg_len
+
+    def _hit(self, row: int, score: float) -> Dict[str, Any]:
+        c = self.columns
+        return {
+            "_index": LOCAL_INDEX,
+            "_id": str(row),
+            "_score": score,
+            "_source": {
+                "atomic": {
+                    "timestamp": _iso_ms(int(c["timestamp"][row])),
+                    "agent_id": self.vocab["agent_id"][int(c["agent_id"][row])],
+                    "action": self.vocab["action"][int(c["action"][row])],
+                    "status": self.vocab["status"][int(c["status"][row])],
+                    "message": self.vocab["message"][int(c["message"][row])],
+                    "latency_ms": int(c["latency_ms"][row]),
+                }
+            },
+        }
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _column(field: str) -> str:
+    return field.split(".", 1)[1] if field.startswith("atomic.") else field
+
+
+def _find_match(clause: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    (kind, spec), = clause.items()
+    if kind == "match":
+        return spec
+    if kind == "bool":
+        for c in _as_list(spec.get("must")) + _as_list(spec.get("should")):
+            found = _find_match(c)
+            if found is not None:
+                return found
+    return None
+
+
+# ---- building stores ----
+
+def write_store(path: str, columns: Dict[str, np.ndarray], vocab: Dict[str, List[str]], dims: int) -> LocalLogStore:
+    out = Path(path)
+    out.mkdir(parents=True, exist_ok=True)
+    count = int(columns["timestamp"].shape[0])
+    for name, arr in columns.items():
+        np.save(out / f"{name}.npy", arr)
+    vectors = np.lib.format.open_memmap(out / "vectors.npy", mode="w+", dtype=np.float32, shape=(count, dims))
+    del vectors
+    np.save(out / "has_vector.npy", np.zeros(count, dtype=bool))
+    meta = {"count": count, "dims": dims, "vocab": vocab}
+    (out / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    return LocalLogStore(path)
+
+
+def synthesize(path: str, n: int, dims: int, agents: int = 10, days: int = 7,
+               success_rate: float = 0.8, actions: Optional[List[str]] = None,
+               seed: int = 7) -> LocalLogStore:
+    """Generate `n` atomic_agent-shaped events with vectorised NumPy (millions in seconds)."""
+    rng = np.random.default_rng(seed)
+    actions = actions or DEFAULT_ACTIONS
+    agent_ids = [f"agent-{i:02d}" for i in range(1, agents + 1)]
+    messages = [f"{a} completed successfully." for a in actions]
+    messages += [f"{a} {d}." for a in actions for d in ERROR_DETAILS]
+
+    action = rng.integers(0, len(actions), size=n).astype(np.uint16)
+    ok = rng.random(n) <= success_rate
+    detail = rng.integers(0, len(ERROR_DETAILS), size=n)
+    message = np.where(ok, action, len(actions) + action * len(ERROR_DETAILS) + detail).astype(np.uint32)
+
+    now_ms = int(datetime.datetime.now(datetime.timezone.utc).timestamp() * 1000)
+    timestamp = np.sort(now_ms - rng.integers(0, days * 86_400_000, size=n)).astype(np.int64)
+
+    columns = {
+        "timestamp": timestamp,
+        "agent_id": rng.integers(0, agents, size=n).astype(np.uint16),
+        "action": action,
+        "status": np.where(ok, 0, 1).astype(np.uint16),
+        "message": message,
+        "latency_ms": rng.integers(100, 800, size=n).astype(np.int32),
+    }
+    vocab = {"agent_id": agent_ids, "action": list(actions), "status": ["OK", "ERROR"], "message": messages}
+    return write_store(path, columns, vocab, dims)
+
+
+def import_agent_log(path: str, log_files: Iterable[str], dims: int) -> LocalLogStore:
+    """Build a store from atomic_agent NDJSON log lines."""
+    vocab: Dict[str, List[str]] = {name: [] for name in CATEGORICAL}
+    index: Dict[str, Dict[str, int]] = {name: {} for name in CATEGORICAL}
+    rows: Dict[str, list] = {name: [] for name in ["timestamp", "latency_ms", *CATEGORICAL]}
+    for log_file in log_files:
+        with open(log_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    ev = json.loads(line)
+                except ValueError:
+                    continue
+                rows["timestamp"].append(parse_es_date(ev.get("timestamp", "now")))
+                rows["latency_ms"].append(int(ev.get("latency_ms", 0)))
+                for name in CATEGORICAL:
+                    value = str(ev.get(name, ""))
+                    if value not in index[name]:
+                        index[name][value] = len(vocab[name])
+                        vocab[name].append(value)
+                    rows[name].append(index[name][value])
+    columns = {
+        "timestamp": np.asarray(rows["timestamp"], dtype=np.int64),
+        "latency_ms": np.asarray(rows["latency_ms"], dtype=np.int32),
+    }
+    for name, dtype in CATEGORICAL.items():
+        columns[name] = np.asarray(rows[name], dtype=dtype)
+    return write_store(path, columns, vocab, dims)
+
+
+def embed_all(store: LocalLogStore, embed_fn=hash_embedding):
+    """Vector backfill shortcut: embed each distinct message once and scatter by code."""
+    action = np.asarray(store.columns["action"])
+    message = np.asarray(store.columns["message"])
+    pairs = action.astype(np.uint64) << np.uint64(32) | message.astype(np.uint64)
+    uniq, inverse = np.unique(pairs, return_inverse=True)
+    table = np.zeros((len(uniq), store.dims), dtype=np.float32)
+    for i, key in enumerate(uniq):
+        a, m = int(key) >> 32, int(key) & 0xFFFFFFFF
+        text = f"{store.vocab['action'][a]} - {store.vocab['message'][m]}"
+        table[i] = embed_fn(text, store.dims)
+    for start in range(0, store.count, SCAN_BLOCK):
+        stop = min(store.count, start + SCAN_BLOCK)
+        store.vectors[start:stop] = table[inverse[start:stop]]
+    store.has_vector[:] = True
+    store.flush()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build a local offline Atomic Agent log store.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    syn = sub.add_parser("synthesize", help="Generate synthetic atomic_agent events")
+    syn.add_argument("--n", type=int, default=1_000_000)
+    syn.add_argument("--agents", type=int, default=10)
+    syn.add_argument("--days", type=int, default=7)
+    syn.add_argument("--seed", type=int, default=7)
+
+    imp = sub.add_parser("import-log", help="Load events from atomic_agent log files")
+    imp.add_argument("log_files", nargs="+")
+
+    for p in (syn, imp):
+        p.add_argument("--out", default=get_env("LOCAL_STORE_DIR", "local_store"))
+        p.add_argument("--dims", type=int, default=None, help="Vector dims (default: active vector profile)")
+        p.add_argument("--with_vectors", action="store_true", help="Embed all rows with the hashing embedder")
+
+    args = ap.parse_args()
+    dims = args.dims or get_profile()["dims"]
+    if args.cmd == "synthesize":
+        store = synthesize(args.out, args.n, dims, agents=args.agents, days=args.days, seed=args.seed)
+    else:
+        store = import_agent_log(args.out, args.log_files, dims)
+    if args.with_vectors:
+        embed_all(store)
+    print(f"[INFO] Local store at {args.out}: {store.count} events, dims={store.dims}, "
+          f"vectors={'yes' if args.with_vectors else 'no'}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 import os
 import sys
-from typing import List
+import argparse
+from typing import List, Dict, Any, Optional
 
-from elasticsearch import Elasticsearch
 import requests
 
+from vector_profiles import get_profile, reduce_vector, num_candidates_for
+
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -12,12 +14,20 @@ except Exception:
     pass
 
 
+INDEX_PATTERN = "atomic-agent-*"
+RRF_RANK_CONSTANT = 60
+
+
 def get_env(name, default=""):
     value = os.getenv(name)
     return value if value else default
 
 
 def create_es_client():
+    if get_env("SEARCH_BACKEND", "elasticsearch") == "local":
+        from local_store import LocalLogStore
+        return LocalLogStore(get_env("LOCAL_STORE_DIR", "local_store"))
+    from elasticsearch import Elasticsearch
     endpoint = get_env("ES_ENDPOINT")
     api_key = get_env("ES_API_KEY")
     if not endpoint or not api_key:
@@ -44,27 +54,171 @@ def get_azure_openai_embedding(text: str) -> List[float]:
     return data["data"][0]["embedding"]
 
 
+def get_embedding(text: str) -> List[float]:
+    default = "hash" if get_env("SEARCH_BACKEND") == "local" else "azure"
+    if get_env("EMBED_BACKEND", default) == "hash":
+        from local_store import hash_embedding
+        return hash_embedding(text)
+    return get_azure_openai_embedding(text)
+
+
+def build_filters(since: Optional[str] = None,
+                  until: Optional[str] = None,
+                  agent_ids: Optional[List[str]] = None,
+                  actions: Optional[List[str]] = None,
+                  statuses: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Build the shared pre-filter clauses. They are applied inside the kNN
+    `filter` (so HNSW only visits matching docs) and to the BM25 leg.
+    Dates accept ISO timestamps or Elasticsearch date math (e.g. now-24h).
+    """
+    filters: List[Dict[str, Any]] = []
+    time_range = {}
+    if since:
+        time_range["gte"] = since
+    if until:
+        time_range["lte"] = until
+    if time_range:
+        filters.append({"range": {"atomic.timestamp": time_range}})
+    if agent_ids:
+        filters.append({"terms": {"atomic.agent_id": agent_ids}})
+    if actions:
+        filters.append({"terms": {"atomic.action": actions}})
+    if statuses:
+        filters.append({"terms": {"atomic.status": statuses}})
+    return filters
+
+
+def build_knn_body(query_vector: List[float], filters: List[Dict[str, Any]],
+                   k: int = 5, num_candidates: int = 25) -> Dict[str, Any]:
+    knn = {
+        "field": "log_vector",
+        "query_vector": query_vector,
+        "k": k,
+        "num_candidates": max(num_candidates, k),
+    }
+    if filters:
+        knn["filter"] = {"bool": {"filter": filters}}
+    return {"knn": knn, "size": k, "_source": ["atomic"]}
+
+
+def build_bm25_body(query_text: str, filters: List[Dict[str, Any]], size: int = 5) -> Dict[str, Any]:
+    return {
+        "query": {
+            "bool": {
+                "must": [{"match": {"atomic.message": query_text}}],
+                "filter": filters,
+            }
+        },
+        "size": size,
+        "_source": ["atomic"],
+    }
+
+
+def build_rrf_retriever_body(query_text: str, query_vector: List[float],
+                             filters: List[Dict[str, Any]], k: int = 5,
+                             num_candidates: int = 25) -> Dict[str, Any]:
+    """
+    Server-side fusion using the `rrf` retriever (Elasticsearch 8.14+).
+    Saves a round trip compared to fusing on the client.
+    """
+    knn = build_knn_body(query_vector, filters, k=k, num_candidates=num_candidates)["knn"]
+    bm25 = build_bm25_body(query_text, filters, size=num_candidates)["query"]
+    return {
+        "retriever": {
+            "rrf": {
+                "retrievers": [
+                    {"standard": {"query": bm25}},
+                    {"knn": knn},
+                ],
+                "rank_constant": RRF_RANK_CONSTANT,
+                "rank_window_size": max(num_candidates, k),
+            }
+        },
+        "size": k,
+        "_source": ["atomic"],
+    }
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], size: int = 5,
+                           rank_constant: int = RRF_RANK_CONSTANT) -> List[Dict[str, Any]]:
+    """
+    Fuse ranked hit lists: score(d) = sum(1 / (rank_constant + rank)).
+    Raw BM25 and cosine scores are not comparable, ranks are.
+    """
+    fused: Dict[tuple, Dict[str, Any]] = {}
+    for hits in result_lists:
+        for rank, hit in enumerate(hits, 1):
+            key = (hit.get("_index"), hit.get("_id"))
+            entry = fused.setdefault(key, {"hit": hit, "score": 0.0})
+            entry["score"] += 1.0 / (rank_constant + rank)
+    ranked = sorted(fused.values(), key=lambda e: e["score"], reverse=True)[:size]
+    return [dict(e["hit"], _score=e["score"]) for e in ranked]
+
+
+def search(es, query_text: str, mode: str = "hybrid", filters: Optional[List[Dict[str, Any]]] = None,
+           k: int = 5, num_candidates: int = 25, fusion: str = "client",
+           embed_fn=get_embedding) -> List[Dict[str, Any]]:
+    filters = filters or []
+    profile = get_profile()
+    # Query vectors must match the stored dims; quantized profiles widen the candidate pool.
+    num_candidates = num_candidates_for(profile, k, num_candidates)
+
+    if mode == "bm25":
+        resp = es.search(index=INDEX_PATTERN, body=build_bm25_body(query_text, filters, size=k))
+        return resp.get("hits", {}).get("hits", [])
+
+    query_vector = reduce_vector(embed_fn(query_text), profile["dims"])
+    if mode == "knn":
+        resp = es.search(index=INDEX_PATTERN, body=build_knn_body(query_vector, filters, k, num_candidates))
+        return resp.get("hits", {}).get("hits", [])
+
+    if fusion == "server":
+        body = build_rrf_retriever_body(query_text, query_vector, filters, k, num_candidates)
+        resp = es.search(index=INDEX_PATTERN, body=body)
+        return resp.get("hits", {}).get("hits", [])
+
+    # Each leg fetches a deeper window than k so fusion has overlap to work with.
+    window = max(num_candidates, k)
+    knn_resp = es.search(index=INDEX_PATTERN, body=build_knn_body(query_vector, filters, window, num_candidates))
+    bm25_resp = es.search(index=INDEX_PATTERN, body=build_bm25_body(query_text, filters, size=window))
+    return reciprocal_rank_fusion([
+        knn_resp.get("hits", {}).get("hits", []),
+        bm25_resp.get("hits", {}).get("hits", []),
+    ], size=k)
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Semantic / hybrid search over Atomic Agent logs.")
+    ap.add_argument("query", help="Query text")
+    ap.add_argument("--mode", choices=["knn", "bm25", "hybrid"], default="hybrid")
+    ap.add_argument("--fusion", choices=["client", "server"], default="client",
+                    help="Hybrid fusion: client-side RRF or the Elasticsearch rrf retriever")
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--num_candidates", type=int, default=25)
+    ap.add_argument("--since", help="Lower bound on atomic.timestamp (e.g. now-24h)")
+    ap.add_argument("--until", help="Upper bound on atomic.timestamp")
+    ap.add_argument("--agent", action="append", dest="agents", help="Filter by agent_id (repeatable)")
+    ap.add_argument("--action", action="append", dest="actions", help="Filter by action (repeatable)")
+    ap.add_argument("--status", action="append", dest="statuses", help="Filter by status (repeatable)")
+    return ap.parse_args(argv)
+
+
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python semantic_search_demo.py 'your query text'")
+        print("Usage: python semantic_search_demo.py 'your query text' [--mode hybrid] [--status ERROR] [--since now-24h]")
         sys.exit(1)
 
-    query_text = sys.argv[1]
-    print(f"[INFO] Semantic search for: {query_text!r}")
+    args = parse_args()
+    print(f"[INFO] {args.mode} search for: {args.query!r}")
+
+    filters = build_filters(args.since, args.until, args.agents, args.actions, args.statuses)
+    if filters:
+        print(f"[INFO] Pre-filters: {filters}")
 
     es = create_es_client()
-    query_vector = get_azure_openai_embedding(query_text)
-
-    body = {
-        "knn": {
-            "field": "log_vector",
-            "query_vector": query_vector,
-            "k": 5,
-            "num_candidates": 25
-        }
-    }
-    resp = es.search(index="atomic-agent-*", body=body)
-    hits = resp.get("hits", {}).get("hits", [])
+    hits = search(es, args.query, mode=args.mode, filters=filters, k=args.k,
+                  num_candidates=args.num_candidates, fusion=args.fusion)
     print(f"[INFO] Got {len(hits)} hits.")
     for hit in hits:
         src = hit.get("_source", {})
@@ -0,0 +1,119 @@
+import os
+import sys
+import copy
+import json
+import math
+import argparse
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+
+# Vector storage profiles for the log_vector field.
+#   dims       - stored dimensionality (embeddings are truncated + re-normalised to this size)
+#   type       - dense_vector index_options type (hnsw, int8_hnsw, bbq_hnsw)
+#   m / ef_construction - HNSW graph parameters
+#   oversample - multiplier on num_candidates at query time; quantized graphs
+#                need a wider candidate pool to keep recall
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "float_1536": {"dims": 1536, "type": "hnsw", "m": 16, "ef_construction": 100, "oversample": 1.0},
+    "int8_1536": {"dims": 1536, "type": "int8_hnsw", "m": 16, "ef_construction": 100, "oversample": 1.5},
+    "int8_768": {"dims": 768, "type": "int8_hnsw", "m": 16, "ef_construction": 100, "oversample": 2.0},
+    "int8_512": {"dims": 512, "type": "int8_hnsw", "m": 16, "ef_construction": 100, "oversample": 2.0},
+    "bbq_1536": {"dims": 1536, "type": "bbq_hnsw", "m": 16, "ef_construction": 100, "oversample": 3.0},
+    "bbq_768": {"dims": 768, "type": "bbq_hnsw", "m": 16, "ef_construction": 100, "oversample": 3.0},
+}
+
+DEFAULT_PROFILE = "float_1536"
+DEFAULT_TEMPLATE = Path(__file__).resolve().parents[1] / "elastic" / "index_template.json"
+
+
+def get_env(name, default=""):
+    value = os.getenv(name)
+    return value if value else default
+
+
+def get_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Resolve a profile by name (default: VECTOR_PROFILE env var), then apply
+    VECTOR_DIMS / VECTOR_HNSW_M / VECTOR_HNSW_EF_CONSTRUCTION overrides.
+    """
+    name = name or get_env("VECTOR_PROFILE", DEFAULT_PROFILE)
+    if name not in PROFILES:
+        raise ValueError(f"Unknown vector profile {name!r}; choose from {sorted(PROFILES)}")
+    profile = dict(PROFILES[name], name=name)
+    for env_name, key in (("VECTOR_DIMS", "dims"), ("VECTOR_HNSW_M", "m"),
+                          ("VECTOR_HNSW_EF_CONSTRUCTION", "ef_construction")):
+        if get_env(env_name):
+            profile[key] = int(get_env(env_name))
+    if profile["type"] == "bbq_hnsw" and profile["dims"] < 64:
+        raise ValueError("bbq_hnsw requires at least 64 dims.")
+    return profile
+
+
+def vector_mapping(profile: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "dense_vector",
+        "dims": profile["dims"],
+        "index": True,
+        "similarity": "cosine",
+        "index_options": {
+            "type": profile["type"],
+            "m": profile["m"],
+            "ef_construction": profile["ef_construction"],
+        },
+    }
+
+
+def render_index_template(template: Dict[str, Any], profile: Dict[str, Any],
+                          shards: Optional[int] = None) -> Dict[str, Any]:
+    rendered = copy.deepcopy(template)
+    props = rendered.setdefault("template", {}).setdefault("mappings", {}).setdefault("properties", {})
+    props["log_vector"] = vector_mapping(profile)
+    if shards:
+        rendered["template"].setdefault("settings", {})["number_of_shards"] = shards
+    return rendered
+
+
+def reduce_vector(vector: List[float], dims: int) -> List[float]:
+    """
+    Truncate to `dims` and L2 re-normalise. Matryoshka-trained models
+    (text-embedding-3-*) keep most of their quality when truncated; older
+    models such as ada-002 should stay on a full-size profile.
+    """
+    if len(vector) <= dims:
+        return list(vector)
+    head = vector[:dims]
+    norm = math.sqrt(sum(x * x for x in head)) or 1.0
+    return [x / norm for x in head]
+
+
+def num_candidates_for(profile: Dict[str, Any], k: int, num_candidates: int) -> int:
+    return max(k, int(math.ceil(num_candidates * profile.get("oversample", 1.0))))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Render the Atomic Agent index template for a vector profile.")
+    ap.add_argument("--profile", default=None, help="Profile name (default: VECTOR_PROFILE or float_1536)")
+    ap.add_argument("--template", default=str(DEFAULT_TEMPLATE))
+    ap.add_argument("--shards", type=int, default=None, help="Override number_of_shards")
+    ap.add_argument("--out", default=None, help="Write to file instead of stdout")
+    ap.add_argument("--list", action="store_true", help="List available profiles")
+    args = ap.parse_args()
+
+    if args.list:
+        for name, p in PROFILES.items():
+            print(f"{name:12s} dims={p['dims']:<5d} type={p['type']:<10s} m={p['m']} "
+                  f"ef_construction={p['ef_construction']} oversample={p['oversample']}")
+        return
+
+    template = json.loads(Path(args.template).read_text(encoding="utf-8"))
+    rendered = json.dumps(render_index_template(template, get_profile(args.profile), args.shards), indent=2)
+    if args.out:
+        Path(args.out).write_text(rendered + "\n", encoding="utf-8")
+        print(f"[INFO] Wrote {args.out}", file=sys.stderr)
+    else:
+        print(rendered)
+
+
+if __name__ == "__main__":
+    main()